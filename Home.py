@@ -1,9 +1,10 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime, date, timedelta
-import gspread
+from datetime import datetime
 import os
 import base64
+from shared.sheets import get_repository, sheet_versions, render_data_age
+from shared.dashboard import DASHBOARD_COLUMNS, EMPTY_STATS, compute_dashboard_stats
+from shared import profiling
 
 # =========================================================
 # 0) 系統設定
@@ -14,6 +15,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded" 
 )
+profiling.start_run("home")
 
 # =========================================================
 # 1) CSS 樣式 (V31.0 數據儀表板版)
@@ -126,135 +128,26 @@ section[data-testid="stSidebar"] button:hover {
 # =========================================================
 # 2) 邏輯處理：資料讀取與計算
 # =========================================================
-SHEET_ID = "1A3-VwCBYjnWdcEiL6VwbV5-UECcgX7TqKH94sKe8P90"
-
-@st.cache_resource
-def get_client():
-    return gspread.service_account_from_dict(st.secrets["gcp_service_account"])
-
-def calculate_age(dob_str):
-    try:
-        b_date = datetime.strptime(str(dob_str).strip(), "%Y-%m-%d").date()
-        today = date.today()
-        return today.year - b_date.year - ((today.month, today.day) < (b_date.month, b_date.day))
-    except: return 0
-
-# 🔥 新增：檢查是否已完全退役的函數
-def check_is_fully_retired(row):
-    """
-    邏輯：
-    1. 檢查四個組別 (祥和, 週二, 週三, 環保)
-    2. 如果有加入日期，但沒有退出日期，視為 Active (在職)
-    3. 如果完全沒填加入日期，視為 Active (可能是新人)
-    4. 只有當「所有曾加入的組別」都填了「退出日期」，才視為 Retired (退役)
-    """
-    roles = [
-        ('祥和_加入日期', '祥和_退出日期'), 
-        ('據點週二_加入日期', '據點週二_退出日期'), 
-        ('據點週三_加入日期', '據點週三_退出日期'), 
-        ('環保_加入日期', '環保_退出日期')
-    ]
-    has_any = False # 是否有參加過任何一組
-    is_active = False # 是否目前仍在職
-    
-    for join_col, exit_col in roles:
-        # 使用 .get 避免欄位不存在報錯
-        join_val = str(row.get(join_col, '')).strip()
-        if join_val:
-            has_any = True
-            exit_val = str(row.get(exit_col, '')).strip()
-            # 有加入且沒退出 -> Active
-            if not exit_val: 
-                is_active = True
-    
-    # 如果完全沒參加過 (或是資料空白)，預設為 Active
-    if not has_any: return False 
-    
-    # 如果有參加過，且 is_active 仍為 False (代表所有參加的都退了) -> Retired
-    return not is_active
-
-def calculate_year_hours(logs_df):
-    """計算當年度志工總時數"""
+# 以各分頁的快取版本為 key：只有這五張表有變動時才重算，其他分頁寫入不影響
+@st.cache_data(ttl=60, max_entries=4)
+def _dashboard_stats(versions):
+    profiling.mark_miss("dashboard_stats")
     try:
-        cur_year = datetime.now().year
-        logs_df['dt'] = pd.to_datetime(logs_df['日期'] + ' ' + logs_df['時間'], errors='coerce')
-        logs_df = logs_df.dropna(subset=['dt'])
-        year_logs = logs_df[logs_df['dt'].dt.year == cur_year].sort_values(['姓名', 'dt'])
-        
-        total_seconds = 0
-        for (name, d), group in year_logs.groupby(['姓名', '日期']):
-            actions = group['動作'].tolist()
-            times = group['dt'].tolist()
-            i = 0
-            while i < len(actions):
-                if actions[i] == '簽到':
-                    for j in range(i + 1, len(actions)):
-                        if actions[j] == '簽退':
-                            total_seconds += (times[j] - times[i]).total_seconds()
-                            i = j
-                            break
-                    i += 1
-                else: i += 1
-        return int(total_seconds // 3600)
-    except: return 0
+        # 統計邏輯見 shared.dashboard
+        return compute_dashboard_stats(get_repository().batch_columns(DASHBOARD_COLUMNS))
+    except Exception as e:
+        # 不快取失敗的結果，交給 load_dashboard_stats 沿用上一次的數字
+        print(f"Stats Error: {e}")
+        raise
 
-@st.cache_data(ttl=60) # 緩存 60 秒
 def load_dashboard_stats():
-    client = get_client()
-    sh = client.open_by_key(SHEET_ID)
-    
-    stats = {
-        "vol_count": 0, "vol_age": 0, "vol_hours": 0,
-        "eld_count": 0, "eld_age": 0,
-        "care_count": 0, "care_items": 0
-    }
-    
+    # 讀取失敗 (例如 API 配額用完) 時沿用上一次成功的數字，不顯示一片 0
     try:
-        # 1. 志工數據
-        df_v = pd.DataFrame(sh.worksheet("members").get_all_records()).astype(str)
-        df_vl = pd.DataFrame(sh.worksheet("logs").get_all_records()).astype(str)
-        
-        if not df_v.empty:
-            # 🔥 關鍵修改：過濾掉已退役的志工
-            # apply(axis=1) 會對每一列執行 check_is_fully_retired
-            # 我們保留那些 return False (即 check_is_fully_retired 為假，代表還在職) 的人
-            active_volunteers = df_v[~df_v.apply(check_is_fully_retired, axis=1)]
-            
-            stats["vol_count"] = len(active_volunteers)
-            
-            # 計算平均年齡 (只算在職的)
-            active_volunteers['age'] = active_volunteers['生日'].apply(calculate_age)
-            valid_ages = active_volunteers[active_volunteers['age'] > 0]['age']
-            stats["vol_age"] = round(valid_ages.mean(), 1) if not valid_ages.empty else 0
-            
-        if not df_vl.empty:
-            stats["vol_hours"] = calculate_year_hours(df_vl)
-
-        # 2. 長輩數據
-        df_e = pd.DataFrame(sh.worksheet("elderly_members").get_all_records()).astype(str)
-        if not df_e.empty:
-            stats["eld_count"] = len(df_e)
-            df_e['age'] = df_e['出生年月日'].apply(calculate_age)
-            valid_ages = df_e[df_e['age'] > 0]['age']
-            stats["eld_age"] = round(valid_ages.mean(), 1) if not valid_ages.empty else 0
-
-        # 3. 關懷戶數據
-        df_c = pd.DataFrame(sh.worksheet("care_members").get_all_records()).astype(str)
-        df_cl = pd.DataFrame(sh.worksheet("care_logs").get_all_records()).astype(str)
-        
-        if not df_c.empty:
-            stats["care_count"] = len(df_c)
-            
-        if not df_cl.empty:
-            cur_year = datetime.now().year
-            df_cl['dt'] = pd.to_datetime(df_cl['發放日期'], errors='coerce')
-            df_cl['qty'] = pd.to_numeric(df_cl['發放數量'], errors='coerce').fillna(0)
-            stats["care_items"] = int(df_cl[df_cl['dt'].dt.year == cur_year]['qty'].sum())
-
-    except Exception as e:
-        print(f"Stats Error: {e}")
-    
-    return stats
+        with profiling.cache_lookup("dashboard_stats"):
+            st.session_state.dashboard_stats = _dashboard_stats(sheet_versions(*DASHBOARD_COLUMNS))
+    except Exception:
+        pass
+    return st.session_state.get("dashboard_stats", EMPTY_STATS)
 
 def get_image_as_base64(path):
     try:
@@ -280,7 +173,9 @@ st.markdown(f'<div class="hero-subtitle">志工調度．長輩照護．弱勢關
 st.markdown("---")
 
 # 讀取數據
+profiling.section("dashboard_stats")
 data = load_dashboard_stats()
+profiling.section("render")
 
 # 定義服務內容與對應數據
 services = [
@@ -348,3 +243,6 @@ for svc in services:
 """, unsafe_allow_html=True)
 
 st.markdown("<br>", unsafe_allow_html=True)
+
+with st.sidebar: render_data_age(*DASHBOARD_COLUMNS)
+profiling.render_panel()
@@ -0,0 +1,16 @@
+"""
+效能量測 (benchmarks)
+
+用合成資料 (synthetic) 量測各頁面的熱點函式，結果寫成 JSON，之後可與基準比較是否退步。
+
+    # 量測並存成基準
+    python -m benchmarks.run --sizes 1000 10000 100000 --out benchmarks/baseline.json
+
+    # 改完程式後與基準比較 (慢超過 25% 即回傳非 0)
+    python -m benchmarks.run --sizes 1000 10000 100000 --check benchmarks/baseline.json
+
+    # 只跑部分項目、加上 1M 筆
+    python -m benchmarks.run --only coverage_seconds year_hours --sizes 1000000
+
+size 指紀錄表 (logs / elderly_logs / care_logs) 的筆數，名冊與庫存依比例縮放 (見 synthetic.scale)。
+"""
@@ -0,0 +1,139 @@
+"""
+執行各項量測，輸出 JSON；指定 --check 時與基準比較，有退步就回傳 1
+(用法見 benchmarks/__init__.py)
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate
+from shared.care import compute_stock, suggest_recipients
+from shared.dashboard import DASHBOARD_COLUMNS, compute_dashboard_stats
+from shared.fake_sheets import FakeClient
+from shared.report_rollup import ReportCube
+from shared.sheets import SHEET_ID, SheetRepository
+from shared.volunteers import (TW_TZ, calculate_coverage_seconds, calculate_year_hours,
+                               get_present_volunteers, retired_mask, tenure_summary, tenure_table)
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+TIME_BUDGET = 60.0   # 秒：某項在某個大小超過這個時間，就不再跑更大的資料
+TOLERANCE = 0.25     # 比基準慢超過 25% 視為退步
+NOISE_FLOOR = 0.005  # 秒：差距小於此值不算退步 (避免小資料量的計時雜訊)
+
+
+def _last_day(logs):
+    return datetime.strptime(logs["日期"].max(), "%Y-%m-%d").replace(hour=12, tzinfo=TW_TZ)
+
+
+def _dashboard(data):
+    """每次都用新的 repository (冷快取)，量測 batch_columns + 統計計算"""
+    client = FakeClient()
+    client.load(SHEET_ID, {name: [list(df.columns)] + df.values.tolist() for name, df in data.items()})
+
+    def run():
+        repo = SheetRepository(lambda: client, background=False)
+        return compute_dashboard_stats(repo.batch_columns(DASHBOARD_COLUMNS))
+    return run
+
+
+# 名稱 -> setup(data)，回傳要計時的函式 (資料準備不計入時間)
+BENCHMARKS = {
+    "coverage_seconds": lambda d: lambda: calculate_coverage_seconds(d["logs"]),
+    "year_hours": lambda d: (lambda year: lambda: calculate_year_hours(d["logs"], year))(int(d["logs"]["日期"].max()[:4])),
+    "present_volunteers": lambda d: (lambda now: lambda: get_present_volunteers(d["logs"], now))(_last_day(d["logs"])),
+    "retired_check": lambda d: lambda: retired_mask(d["members"]),
+    "tenure_table": lambda d: lambda: tenure_summary(tenure_table(d["members"])),
+    "report_cube": lambda d: lambda: ReportCube.build(d["logs"]),
+    "care_stock": lambda d: lambda: compute_stock(d["care_inventory"], d["care_logs"]),
+    "care_suggestions": lambda d: (lambda item: lambda: suggest_recipients(d["care_members"], d["care_logs"], item))(
+        d["care_logs"]["物資內容"].iloc[0]),
+    "dashboard_stats": _dashboard,
+}
+
+
+def measure(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(names, sizes, repeat, budget=TIME_BUDGET, log=print):
+    results = {name: {} for name in names}
+    over_budget = set()
+    for size in sizes:
+        t0 = time.perf_counter()
+        data = generate(size)
+        log(f"[size={size:,}] 產生資料 {time.perf_counter() - t0:.1f}s")
+        for name in names:
+            if name in over_budget:
+                results[name][str(size)] = None
+                log(f"  {name:<20} 略過 (較小資料已超過 {budget:.0f}s)")
+                continue
+            fn = BENCHMARKS[name](data)
+            seconds = measure(fn, repeat if size < 1_000_000 else 1)
+            results[name][str(size)] = seconds
+            log(f"  {name:<20} {seconds * 1000:10.2f} ms")
+            if seconds > budget: over_budget.add(name)
+    return results
+
+
+def compare(current, baseline, tolerance=TOLERANCE, noise=NOISE_FLOOR):
+    """回傳退步項目 [(名稱, 大小, 基準秒數, 目前秒數)]"""
+    regressions = []
+    for name, by_size in current.items():
+        for size, now in by_size.items():
+            base = baseline.get(name, {}).get(size)
+            if now is None or base is None:
+                continue
+            if now > base * (1 + tolerance) and now - base > noise:
+                regressions.append((name, size, base, now))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="福德里系統效能量測")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3, help="每項重複次數，取最快的一次")
+    parser.add_argument("--out", help="結果寫入的 JSON 檔")
+    parser.add_argument("--check", help="與此基準 JSON 比較，有退步就回傳 1")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.sizes, args.repeat)
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "machine": platform.machine(), "sizes": args.sizes, "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"已寫入 {args.out}")
+
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, size, base, now in regressions:
+            print(f"❌ {name} @ {size}: {base * 1000:.2f} ms -> {now * 1000:.2f} ms (+{(now / base - 1) * 100:.0f}%)")
+        if regressions:
+            return 1
+        print("✅ 沒有超過容許範圍的退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+合成資料：產生與正式試算表欄位相同、分布大致合理的 DataFrame (全部為字串，與 load_data 讀回的一致)
+
+同一個 (size, seed) 每次產生的資料完全相同，前後量測才有可比性。
+"""
+import numpy as np
+import pandas as pd
+
+from shared.schema import (VOL_MEM_COLS, VOL_LOG_COLS, ELDER_MEM_COLS, ELDER_LOG_COLS,
+                           CARE_MEM_COLS, CARE_INV_COLS, CARE_LOG_COLS)
+
+SURNAMES = list("陳林黃張李王吳劉蔡楊許鄭謝郭洪曾邱廖賴周")
+GIVEN = list("志明美玲淑芬家豪雅婷俊傑怡君宗翰冠宇佳穎建國秀英")
+VOL_CATEGORIES = ["祥和志工", "關懷據點週二志工", "關懷據點週三志工", "環保志工", "臨時志工"]
+ACTIVITIES = ["關懷據點週二活動", "關懷據點週三活動", "環保清潔", "專案活動：社區清掃", "教育訓練：CPR"]
+COURSES = [("健康促進-運動", "肌力訓練"), ("健康促進-講座", "用藥安全"), ("文康休閒-手作", "香包製作"), ("文康休閒-歌唱", "卡拉OK")]
+CARE_TAGS = ["低收", "中低收", "中低老人", "身障", "獨居", "獨居有子女", "一般戶"]
+REFUSALS = ["", "", "", "海鮮", "牛肉", "豬肉, 堅果", "辣"]
+ITEM_TYPES = {"食物": ["白米", "鯖魚罐頭", "泡麵", "牛肉麵", "花生醬", "奶粉"], "日用品": ["衛生紙", "洗衣精", "牙膏"],
+              "輔具": ["拐杖", "助行器"], "服務": ["居家清潔"]}
+DONORS = ["福德宮", "善心人士", "里辦公處", "慈善會", "超市"]
+START = np.datetime64("2023-01-01")
+DAYS = 3 * 365
+
+
+def scale(size):
+    """紀錄筆數 -> (名冊人數, 庫存品項數)"""
+    return int(np.clip(size // 20, 50, 50_000)), int(np.clip(size // 200, 10, 2_000))
+
+
+def _names(rng, n):
+    s = rng.choice(SURNAMES, n)
+    g1, g2 = rng.choice(GIVEN, n), rng.choice(GIVEN, n)
+    return np.char.add(np.char.add(s, g1), g2)
+
+
+def _pids(n, prefix="A"):
+    return np.array([f"{prefix}{100000000 + i}" for i in range(n)])
+
+
+def _dates(rng, n, start=START, days=DAYS):
+    return np.datetime_as_string(start + rng.integers(0, days, n).astype("timedelta64[D]"), unit="D")
+
+
+def _blank(rng, values, p):
+    """隨機把比例 p 的值清成空白"""
+    values = np.asarray(values, dtype=object)
+    values[rng.random(len(values)) < p] = ""
+    return values
+
+
+def _frame(data, cols):
+    return pd.DataFrame({c: data.get(c, np.full(len(next(iter(data.values()))), "", dtype=object)) for c in cols}).astype(str)
+
+
+def volunteer_members(rng, n):
+    data = {
+        "姓名": _names(rng, n), "身分證字號": _pids(n, "A"),
+        "性別": rng.choice(["男", "女"], n), "電話": np.array([f"09{x:08d}" for x in rng.integers(0, 10**8, n)]),
+        "志工分類": rng.choice(VOL_CATEGORIES, n),
+        "生日": _blank(rng, _dates(rng, n, np.datetime64("1940-01-01"), 60 * 365), 0.05),
+        "地址": rng.choice(["福德路1號", "中正路10號3樓", "民生街5巷2號"], n),
+    }
+    for role in ["祥和", "據點週二", "據點週三", "環保"]:
+        joined = rng.random(n) < 0.4
+        data[f"{role}_加入日期"] = np.where(joined, _dates(rng, n), "")
+        data[f"{role}_退出日期"] = np.where(joined & (rng.random(n) < 0.25), _dates(rng, n), "")
+    return _frame(data, VOL_MEM_COLS)
+
+
+def _session_rows(rng, n_rows, n_people):
+    """每段服務 = 簽到 + 簽退 兩列；少數只有簽到 (忘了簽退)"""
+    n_sessions = max(1, n_rows // 2)
+    who = rng.integers(0, n_people, n_sessions)
+    day = START + rng.integers(0, DAYS, n_sessions).astype("timedelta64[D]")
+    start = day.astype("datetime64[s]") + rng.integers(7 * 3600, 17 * 3600, n_sessions).astype("timedelta64[s]")
+    end = start + rng.integers(30 * 60, 5 * 3600, n_sessions).astype("timedelta64[s]")
+    who = np.repeat(who, 2)[:n_rows]
+    ts = np.stack([start, end], axis=1).ravel()[:n_rows]
+    action = np.tile(["簽到", "簽退"], n_sessions)[:n_rows]
+    forgot = (action == "簽退") & (rng.random(n_rows) < 0.03)
+    keep = ~forgot
+    order = np.argsort(ts[keep], kind="stable")  # 依時間先後 append
+    return who[keep][order], ts[keep][order], action[keep][order]
+
+
+def _split_ts(ts):
+    s = np.datetime_as_string(ts, unit="s")
+    return np.array([x[:10] for x in s]), np.array([x[11:] for x in s])
+
+
+def volunteer_logs(rng, n, members):
+    who, ts, action = _session_rows(rng, n, len(members))
+    day, tm = _split_ts(ts)
+    m = members.iloc[who]
+    data = {
+        "姓名": m["姓名"].to_numpy(), "身分證字號": m["身分證字號"].to_numpy(), "電話": m["電話"].to_numpy(),
+        "志工分類": m["志工分類"].to_numpy(), "動作": action, "時間": tm, "日期": day,
+        "活動內容": rng.choice(ACTIVITIES, len(who)),
+    }
+    return _frame(data, VOL_LOG_COLS)
+
+
+def elderly_members(rng, n):
+    data = {
+        "姓名": _names(rng, n), "身分證字號": _pids(n, "E"), "性別": rng.choice(["男", "女"], n),
+        "出生年月日": _blank(rng, _dates(rng, n, np.datetime64("1930-01-01"), 30 * 365), 0.05),
+        "電話": np.array([f"0{x:09d}" for x in rng.integers(0, 10**9, n)]),
+        "加入日期": _dates(rng, n),
+    }
+    return _frame(data, ELDER_MEM_COLS)
+
+
+def elderly_logs(rng, n, members):
+    who = rng.integers(0, len(members), n)
+    ts = np.sort(START.astype("datetime64[s]") + rng.integers(0, DAYS * 86400, n).astype("timedelta64[s]"))
+    day, tm = _split_ts(ts)
+    course = rng.integers(0, len(COURSES), n)
+    m = members.iloc[who]
+    data = {
+        "姓名": m["姓名"].to_numpy(), "身分證字號": m["身分證字號"].to_numpy(), "日期": day, "時間": tm,
+        "課程分類": np.array([COURSES[i][0] for i in course]), "課程名稱": np.array([COURSES[i][1] for i in course]),
+        "收縮壓": rng.integers(95, 180, n), "舒張壓": rng.integers(55, 110, n), "脈搏": rng.integers(55, 110, n),
+    }
+    return _frame(data, ELDER_LOG_COLS)
+
+
+def care_members(rng, n):
+    tags = [",".join(sorted(set(rng.choice(CARE_TAGS, k)))) for k in rng.integers(1, 3, n)]
+    data = {
+        "姓名": _names(rng, n), "身分證字號": _pids(n, "C"), "性別": rng.choice(["男", "女"], n),
+        "生日": _dates(rng, n, np.datetime64("1935-01-01"), 70 * 365), "地址": rng.choice(["福德路1號", "中正路10號3樓"], n),
+        "身分別": np.array(tags), "18歲以下子女": rng.integers(0, 5, n), "成人數量": rng.integers(1, 4, n),
+        "65歲以上長者": rng.integers(0, 3, n), "拒絕物資": rng.choice(REFUSALS, n),
+    }
+    return _frame(data, CARE_MEM_COLS)
+
+
+def care_health(rng, members):
+    n = len(members)
+    data = {
+        "姓名": members["姓名"].to_numpy(), "身分證字號": members["身分證字號"].to_numpy(), "評估日期": _dates(rng, n),
+        "收縮壓": rng.integers(95, 180, n), "舒張壓": rng.integers(55, 110, n), "心跳": rng.integers(55, 110, n),
+        "身高": rng.integers(145, 180, n), "體重": rng.integers(40, 90, n),
+    }
+    return _frame(data, list(data))
+
+
+def care_inventory(rng, n):
+    types = rng.choice(list(ITEM_TYPES), n)
+    data = {
+        "捐贈者": rng.choice(DONORS, n), "物資類型": types,
+        "物資內容": np.array([rng.choice(ITEM_TYPES[t]) for t in types]),
+        "總數量": rng.integers(10, 500, n), "捐贈日期": _dates(rng, n),
+    }
+    return _frame(data, CARE_INV_COLS)
+
+
+def care_logs(rng, n, members, inventory):
+    item = inventory.iloc[rng.integers(0, len(inventory), n)]
+    ts = np.sort(START + rng.integers(0, DAYS, n).astype("timedelta64[D]"))
+    data = {
+        "志工": rng.choice(["王小明", "陳美玲"], n), "發放日期": np.datetime_as_string(ts, unit="D"),
+        "關懷戶姓名": members["姓名"].to_numpy()[rng.integers(0, len(members), n)],
+        "物資內容": (item["物資內容"] + " (" + item["捐贈者"] + ")").to_numpy(),
+        "發放數量": rng.integers(1, 3, n), "訪視紀錄": rng.choice(["", "狀況良好", "需再追蹤"], n),
+    }
+    return _frame(data, CARE_LOG_COLS)
+
+
+def generate(size, seed=0):
+    """回傳 {分頁名稱: DataFrame}；size 為各紀錄表的筆數"""
+    rng = np.random.default_rng(seed)
+    n_members, n_items = scale(size)
+    members = volunteer_members(rng, n_members)
+    e_members = elderly_members(rng, n_members)
+    c_members = care_members(rng, n_members)
+    inventory = care_inventory(rng, n_items)
+    return {
+        "members": members,
+        "logs": volunteer_logs(rng, size, members),
+        "elderly_members": e_members,
+        "elderly_logs": elderly_logs(rng, size, e_members),
+        "care_members": c_members,
+        "care_health": care_health(rng, c_members),
+        "care_inventory": inventory,
+        "care_logs": care_logs(rng, size, c_members, inventory),
+    }
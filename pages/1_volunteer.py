@@ -1,10 +1,21 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta, timezone
-import gspread
 import time
 import os
 import streamlit.components.v1 as components
+from shared.sheets import (load_data, load_typed, append_data, batch_append_data, get_repository, render_data_age,
+                           load_window, save_window, ROW_NUMBER_COL)
+from shared.schema import VOL_MEM_COLS, VOL_LOG_COLS
+from shared.volunteers import calculate_coverage_seconds, get_present_volunteers, in_group, member_tenure
+from shared.volunteer_hours import volunteer_hours, badge_for
+from shared.kiosk import get_kiosk_index
+from shared.write_queue import queue_append, with_pending, get_write_queue, render_queue_status
+from shared.quota import KIOSK, priority
+from shared.archive import load_range, render_archive_status
+from shared.report_rollup import report_rollup
+from shared.card_list import render_cards
+from shared import profiling
 
 # =========================================================
 # 0) 系統設定
@@ -15,6 +26,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded",
 )
+profiling.start_run("volunteer")
 
 TW_TZ = timezone(timedelta(hours=8))
 PRIMARY = "#4A148C"
@@ -161,243 +173,61 @@ div[data-baseweb="calendar"] {{
 # =========================================================
 # 2) Logic & Helpers (高效能優化版)
 # =========================================================
-SHEET_ID = "1A3-VwCBYjnWdcEiL6VwbV5-UECcgX7TqKH94sKe8P90"
 ALL_CATEGORIES = ["祥和志工", "關懷據點週二志工", "關懷據點週三志工", "環保志工", "臨時志工"]
 DEFAULT_ACTIVITIES = ["關懷據點週二活動", "關懷據點週三活動", "環保清潔", "專案活動", "教育訓練"]
 
-# 🔥 定義固定欄位順序，確保 Append 時不會錯位
-MEM_COLS = ["姓名", "身分證字號", "性別", "電話", "志工分類", "生日", "地址", "備註", 
-            "祥和_加入日期", "祥和_退出日期", "據點週二_加入日期", "據點週二_退出日期", 
-            "據點週三_加入日期", "據點週三_退出日期", "環保_加入日期", "環保_退出日期"]
-
-LOG_COLS = ['姓名', '身分證字號', '電話', '志工分類', '動作', '時間', '日期', '活動內容']
-
-@st.cache_resource
-def get_google_sheet_client():
-    return gspread.service_account_from_dict(st.secrets["gcp_service_account"])
-
-# 🔥 優化 A：讀取加速 (get_all_values)
-@st.cache_data(ttl=60)
-def load_data_from_sheet(sheet_name):
-    try:
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        data = sheet.get_all_values()
-        
-        target_cols = MEM_COLS if sheet_name == 'members' else LOG_COLS
-        if not data: return pd.DataFrame(columns=target_cols)
-        
-        headers = data.pop(0)
-        df = pd.DataFrame(data, columns=headers)
-        
-        # 補齊可能缺少的欄位
-        for c in target_cols: 
-            if c not in df.columns: df[c] = ""
-        return df
-    except: return pd.DataFrame()
-
-# 維持原版 save (僅用於修改資料/DataEditor)
-def save_data_to_sheet(df, sheet_name):
-    try:
-        # 轉成字串避免 JSON 錯誤
-        df_fix = df.fillna("").astype(str)
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        sheet.clear()
-        sheet.update([df_fix.columns.values.tolist()] + df_fix.values.tolist())
-        load_data_from_sheet.clear()
-    except Exception as e: st.error(f"寫入失敗：{e}")
-
-# 🔥 優化 B：單筆秒速寫入 (用於打卡、新增志工)
-def append_data(sheet_name, row_dict, col_order):
-    try:
-        values = [str(row_dict.get(c, "")).strip() for c in col_order]
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        sheet.append_row(values)
-        load_data_from_sheet.clear() # 清除快取，讓介面更新
-        return True
-    except Exception as e:
-        st.error(f"新增失敗：{e}"); return False
-
-# 🔥 優化 C：批次極速寫入 (用於補登)
-def batch_append_data(sheet_name, rows_list, col_order):
-    try:
-        values_list = []
-        for r in rows_list:
-            values_list.append([str(r.get(c, "")).strip() for c in col_order])
-        
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        sheet.append_rows(values_list)
-        load_data_from_sheet.clear()
-        return True
-    except Exception as e:
-        st.error(f"批次失敗：{e}"); return False
+# 🔥 固定欄位順序 (定義在 shared.schema)，確保 Append 時不會錯位
+MEM_COLS = VOL_MEM_COLS
+LOG_COLS = VOL_LOG_COLS
+MAX_EDIT_ROWS = 2000  # 紀錄修改一次最多載入的筆數
+MAX_DETAIL_ROWS = 20000  # 報表明細/下載一次最多載入的筆數
 
 def get_tw_time(): return datetime.now(TW_TZ)
 
-def calculate_age(birthday_str):
-    try:
-        b_date = datetime.strptime(str(birthday_str).strip(), "%Y-%m-%d")
-        today = date.today()
-        return today.year - b_date.year - ((today.month, today.day) < (b_date.month, b_date.day))
-    except: return 0
-
-def check_is_fully_retired(row):
-    roles = [('祥和_加入日期', '祥和_退出日期'), ('據點週二_加入日期', '據點週二_退出日期'), ('據點週三_加入日期', '據點週三_退出日期'), ('環保_加入日期', '環保_退出日期')]
-    has_any = False
-    is_active = False
-    for join_col, exit_col in roles:
-        if join_col in row and str(row[join_col]).strip() != "":
-            has_any = True
-            if exit_col not in row or str(row[exit_col]).strip() == "": is_active = True
-    if not has_any: return False 
-    return not is_active
-
-def calculate_coverage_seconds(df_in):
-    """
-    通用版：計算傳入 DataFrame 的「不重疊」服務總秒數
-    適用於：首頁年度統計、報表活動統計
-    """
-    if df_in.empty: return 0
-    
-    # 確保有 dt 欄位
-    if 'dt' not in df_in.columns:
-        df_in = df_in.copy()
-        df_in['dt'] = pd.to_datetime(df_in['日期'] + ' ' + df_in['時間'], errors='coerce')
-    
-    df_in = df_in.dropna(subset=['dt']).sort_values(['姓名', 'dt'])
-    
-    all_intervals = []
-    # 擷取區間
-    for (name, date_val), group in df_in.groupby(['姓名', '日期']):
-        actions = group['動作'].tolist()
-        times = group['dt'].tolist()
-        i = 0
-        while i < len(actions):
-            if actions[i] == '簽到':
-                for j in range(i + 1, len(actions)):
-                    if actions[j] == '簽退':
-                        if times[j] > times[i]:
-                            all_intervals.append((times[i], times[j]))
-                        i = j
-                        break
-                else: i += 1
-            else: i += 1
-            
-    if not all_intervals: return 0
-
-    # 合併重疊
-    all_intervals.sort(key=lambda x: x[0])
-    merged = []
-    if all_intervals:
-        curr_start, curr_end = all_intervals[0]
-        for next_start, next_end in all_intervals[1:]:
-            if next_start < curr_end:
-                curr_end = max(curr_end, next_end)
-            else:
-                merged.append((curr_start, curr_end))
-                curr_start, curr_end = next_start, next_end
-        merged.append((curr_start, curr_end))
-        
-    return sum((end - start).total_seconds() for start, end in merged)
-
-def get_present_volunteers(logs_df):
-    if logs_df.empty: return pd.DataFrame()
-    today = get_tw_time()
-    today_str_dash = today.strftime("%Y-%m-%d") 
-    today_str_slash = today.strftime("%Y/%m/%d")
-    today_logs = logs_df[(logs_df['日期'] == today_str_dash) | (logs_df['日期'] == today_str_slash)].copy()
-    if today_logs.empty: return pd.DataFrame()
-    today_logs['dt'] = pd.to_datetime(today_logs['日期'] + ' ' + today_logs['時間'], errors='coerce')
-    today_logs = today_logs.dropna(subset=['dt'])
-    today_logs = today_logs.sort_values('dt')
-    latest_status = today_logs.groupby('身分證字號').last().reset_index()
-    present = latest_status[latest_status['動作'] == '簽到']
-    return present[['姓名', '時間', '活動內容']]
-
 # =========================================================
 # 🔄 同步功能：將志工時數同步到 App_Users (無照片/手機登入版)
 # =========================================================
 def sync_to_app_users():
     try:
         # 1. 讀取原始資料
-        members = load_data_from_sheet("members")
-        logs = load_data_from_sheet("logs")
+        members = load_data("members", MEM_COLS)
         
         if members.empty:
             st.warning("名冊空白，無法同步")
             return
 
-        # 2. 準備要寫入的資料
-        # 我們先讀取 App_Users 目前的資料，為了保留「點數」不被覆蓋
-        client = get_google_sheet_client()
+        # 2. 確認 App_Users 分頁存在
         try:
-            sh = client.open_by_key(SHEET_ID)
-            ws = sh.worksheet("App_Users")
+            get_repository().worksheet("App_Users")
         except:
             st.error("找不到 'App_Users' 分頁，請先在 Google Sheet 建立！")
             return
 
-        current_app_data = ws.get_all_records()
-        df_app = pd.DataFrame(current_app_data)
-        
-        # 轉成字典方便查詢：Key=手機, Value={環保點數:x, 樂活點數:y}
-        points_map = {}
-        if not df_app.empty and '手機' in df_app.columns:
-            # 強制轉字串，避免格式問題
-            df_app['手機'] = df_app['手機'].astype(str).str.replace(".0", "", regex=False)
-            for _, row in df_app.iterrows():
-                phone_key = str(row['手機']).strip()
-                points_map[phone_key] = {
-                    '環保': row.get('環保點數', 0),
-                    '樂活': row.get('樂活點數', 0)
-                }
-
-        # 3. 重新計算所有人的時數與等級
-        final_rows = []
-        progress_bar = st.progress(0)
-        
-        for idx, row in members.iterrows():
-            name = row['姓名']
-            pid = row['身分證字號']
-            raw_phone = str(row['電話']).strip()
-            
-            # 清理電話號碼 (移除 - 和空白)
-            phone = raw_phone.replace("-", "").replace(" ", "")
-            if not phone: continue # 沒電話就跳過
-            
-            # 計算時數
-            person_logs = logs[logs['身分證字號'] == pid] if '身分證字號' in logs.columns else logs[logs['姓名'] == name]
-            total_sec = calculate_coverage_seconds(person_logs)
-            total_hours = round(total_sec / 3600, 1)
-            
-            # 判斷等級
-            badge = "🌱 新手志工"
-            if total_hours >= 100: badge = "🥇 金牌志工"
-            elif total_hours >= 50: badge = "🥈 銀牌志工"
-            elif total_hours >= 20: badge = "🥉 銅牌志工"
-            
-            # 密碼 (身分證後4碼)
-            pwd = pid[-4:] if len(pid) >= 4 else "0000"
-            
-            # 取回舊點數 (如果有的話)
-            saved_points = points_map.get(phone, {'環保': 0, '樂活': 0})
-            
-            final_rows.append([
-                phone, pwd, name, 
-                saved_points['環保'], saved_points['樂活'], 
-                total_hours, badge
-            ])
-            progress_bar.progress((idx + 1) / len(members))
-
-        # 4. 寫回 Google Sheet (全量覆蓋，但保留了點數)
-        ws.clear()
-        ws.append_row(["手機", "密碼", "姓名", "環保點數", "樂活點數", "志工時數", "志工等級"])
-        ws.append_rows(final_rows)
-        
-        st.success(f"✅ 同步完成！已更新 {len(final_rows)} 筆資料到 App。")
+        # 3. 時數與等級直接查「志工時數表」(只增量處理新的打卡，見 shared.volunteer_hours)
+        hours = volunteer_hours()
+        m = members.copy()
+        # 清理電話號碼 (移除 - 和空白)，沒電話就跳過
+        m['手機'] = m['電話'].astype(str).str.strip().str.replace("-", "", regex=False).str.replace(" ", "", regex=False)
+        m = m[m['手機'] != ""]
+        found = hours.reindex(m['身分證字號'].astype(str))
+        m['志工時數'] = found['志工時數'].fillna(0.0).to_numpy()
+        m['志工等級'] = badge_for(m['志工時數']).to_numpy()
+        # 密碼 (身分證後4碼)
+        pid_str = m['身分證字號'].astype(str)
+        m['密碼'] = pid_str.str[-4:].where(pid_str.str.len() >= 4, "0000")
+
+        # 4. 依手機合併寫回 (一次 batch_update)：只改時數/等級等有變動的列，
+        #    點數欄位不在同步資料中，既有帳號的點數維持 App 端的值；新帳號點數從 0 開始
+        app_df = m[['手機', '密碼', '姓名', '志工時數', '志工等級']]
+        plan = get_repository().upsert_frame(
+            "App_Users", app_df, key='手機', delete_missing=True,
+            defaults={'環保點數': 0, '樂活點數': 0},
+        )
+        if plan is None:
+            st.success(f"✅ 同步完成！已寫入 {len(app_df)} 筆資料到 App。")
+        else:
+            changed = len({r for r, _, _ in plan.updates})
+            st.success(f"✅ 同步完成！更新 {changed} 筆、新增 {len(plan.appends)} 筆、移除 {len(plan.deletes)} 筆 (共 {len(app_df)} 位志工)。")
         
     except Exception as e:
         st.error(f"同步失敗：{e}")
@@ -447,18 +277,18 @@ def render_nav():
 # =========================================================
 # 4) Pages
 # =========================================================
+profiling.section(f"page:{st.session_state.page}")
 if st.session_state.page == 'home':
     render_nav()
     st.markdown(f"<h2 style='color: {PRIMARY};'>📊 {datetime.now().year} 年度志工概況</h2>", unsafe_allow_html=True)
     
-    logs = load_data_from_sheet("logs")
-    members = load_data_from_sheet("members")
+    logs = load_typed("logs", LOG_COLS)
+    members = load_typed("members", MEM_COLS)
     this_year = datetime.now().year
     
     # --- 🔥 修正開始：先篩選年度，再呼叫通用函式 ---
     if not logs.empty:
-        # 1. 建立時間欄位 (以利篩選年份)
-        logs['dt'] = pd.to_datetime(logs['日期'] + ' ' + logs['時間'], errors='coerce')
+        # 1. 時間欄位 dt 已在載入時轉好 (以利篩選年份)
         logs = logs.dropna(subset=['dt'])
         
         # 2. 篩選出今年的資料
@@ -483,13 +313,11 @@ if st.session_state.page == 'home':
     """, unsafe_allow_html=True)
     
     if not members.empty:
-        active_m = members[~members.apply(check_is_fully_retired, axis=1)].copy()
-        active_m['age'] = active_m['生日'].apply(calculate_age)
-        
         cols = st.columns(4)
         for idx, cat in enumerate(ALL_CATEGORIES):
             if cat == "臨時志工": continue
-            subset = active_m[active_m['志工分類'].astype(str).str.contains(cat, na=False)]
+            # 依該組別的加入/退出日期 (<組別>_在職)：只退出其中一組的志工不再算在該組
+            subset = members[in_group(members, cat)]
             count = len(subset)
             age_subset = subset[subset['age'] > 0]
             avg_age = round(age_subset['age'].mean(), 1) if not age_subset.empty else 0
@@ -542,24 +370,21 @@ elif st.session_state.page == 'checkin':
                 if last and (now - last).total_seconds() < 1: 
                     st.warning(f"⏳ 刷卡過快"); st.session_state.input_pid = ""; return
                 
-                load_data_from_sheet.clear()
-                df_m = load_data_from_sheet("members")
-                df_l = load_data_from_sheet("logs")
-                
-                if df_m.empty: st.error("❌ 無法讀取名單"); return
-                person = df_m[df_m['身分證字號'] == pid]
+                # 名冊與今日狀態查記憶體索引 (見 shared.kiosk)，刷卡只需一次寫入
+                kiosk = get_kiosk_index()
+                try:
+                    with priority(KIOSK): kiosk.refresh()
+                except Exception: pass
+                if not kiosk.member_count: st.error("❌ 無法讀取名單"); return
+                row = kiosk.member(pid)
                 
-                if not person.empty:
-                    row = person.iloc[0]
+                if row is not None:
                     name = row['姓名']
-                    if check_is_fully_retired(row): 
+                    if row['retired']: 
                         st.error(f"❌ {name} 已退出，無法打卡。")
                     else:
                         today = now.strftime("%Y-%m-%d")
-                        # 這裡原本會讀 logs 判斷簽到/簽退，這部分必須保留讀取，但寫入要改
-                        t_logs = df_l[(df_l['身分證字號'] == pid) & (df_l['日期'] == today)]
-                        action = "簽到"
-                        if not t_logs.empty and t_logs.iloc[-1]['動作'] == "簽到": action = "簽退"
+                        action = "簽退" if kiosk.last_action(pid, today) == "簽到" else "簽到"
                         
                         # --- 🔥 修改重點：改用 append_data ---
                         new_log_dict = {
@@ -569,8 +394,8 @@ elif st.session_state.page == 'checkin':
                             '活動內容': final_act
                         }
                         
-                        # 直接追加，不重寫整張表
-                        if append_data("logs", new_log_dict, LOG_COLS):
+                        # 先記在本機佇列馬上回覆，背景再合併寫入試算表 (見 shared.write_queue)
+                        if queue_append("logs", new_log_dict, LOG_COLS):
                             st.session_state['scan_cooldowns'][pid] = now
                             if action == "簽到": st.toast(f"👋 歡迎 {name} 簽到成功！", icon="✅")
                             else: st.toast(f"🏠 辛苦了 {name} 簽退成功！", icon="✅")
@@ -583,9 +408,11 @@ elif st.session_state.page == 'checkin':
 
         with col_status:
             st.markdown("#### 🟢 目前在場志工")
-            load_data_from_sheet.clear()
-            logs = load_data_from_sheet("logs")
+            logs = with_pending(load_data("logs", LOG_COLS), "logs")
             present_df = get_present_volunteers(logs)
+            n_queued = len(get_write_queue().pending())
+            if n_queued: st.caption(f"⏳ {n_queued} 筆打卡資料上傳中…")
+            render_queue_status()
             if not present_df.empty:
                 count = len(present_df)
                 st.markdown(f"<div style='font-size:2rem; font-weight:bold; color:#4A148C; margin-bottom:10px;'>共 {count} 人</div>", unsafe_allow_html=True)
@@ -602,9 +429,9 @@ elif st.session_state.page == 'checkin':
             else: st.info("目前無人簽到中")
 
     with tab2:
-        df_m = load_data_from_sheet("members")
+        df_m = load_typed("members", MEM_COLS)
         if not df_m.empty:
-            active_m = df_m[~df_m.apply(check_is_fully_retired, axis=1)]
+            active_m = df_m[~df_m['retired']]
             name_list = sorted(active_m['姓名'].tolist()) # Sort names for dropdown
             with st.form("manual_entry"):
                 st.markdown("### 🛠️ 補登操作")
@@ -635,15 +462,46 @@ elif st.session_state.page == 'checkin':
                     if batch_append_data("logs", new_rows, LOG_COLS):
                         st.success(f"已補登 {len(names)} 筆資料")
     with tab3:
-        logs = load_data_from_sheet("logs")
-        if not logs.empty:
-            edited = st.data_editor(logs, num_rows="dynamic", use_container_width=True)
-            if st.button("💾 儲存修改"): save_data_to_sheet(edited, "logs"); st.success("已更新")
+        # 只載入篩選範圍內的紀錄，儲存時只寫回修改/新增/刪除的列 (見 shared.sheets.load_window)
+        c1, c2 = st.columns([2, 1])
+        e_range = c1.date_input("📅 日期區間", value=(date.today() - timedelta(days=7), date.today()), key="edit_range")
+        with c2:
+            st.markdown("<br>", unsafe_allow_html=True) # spacer
+            e_bad = st.checkbox("含日期無法辨識的紀錄", key="edit_bad_dates")
+        edit_df = None
+        if isinstance(e_range, tuple) and len(e_range) == 2:
+            start, end = pd.Timestamp(e_range[0]), pd.Timestamp(e_range[1]) + pd.Timedelta(days=1)
+            def in_range(t):
+                if 'dt' not in t.columns: return pd.Series(True, index=t.index)
+                return ((t['dt'] >= start) & (t['dt'] < end)) | (t['dt'].isna() & e_bad)
+            try: edit_df, edit_base = load_window("logs", in_range)
+            except Exception: st.error("無法讀取打卡紀錄")
+
+        if edit_df is not None:
+            c3, c4 = st.columns(2)
+            e_name = c3.selectbox("志工", ["全部"] + sorted(edit_df['姓名'].astype(str).unique().tolist()), key="edit_name")
+            e_act = c4.selectbox("活動", ["全部"] + sorted(edit_df['活動內容'].astype(str).unique().tolist()), key="edit_act")
+            if e_name != "全部": edit_df = edit_df[edit_df['姓名'] == e_name]
+            if e_act != "全部": edit_df = edit_df[edit_df['活動內容'] == e_act]
+            edit_df = edit_df.reset_index(drop=True)
+
+            if len(edit_df) > MAX_EDIT_ROWS:
+                st.warning(f"此範圍共 {len(edit_df)} 筆，請縮小日期區間或指定志工/活動 (上限 {MAX_EDIT_ROWS} 筆)")
+            else:
+                st.caption(f"共 {len(edit_df)} 筆；「{ROW_NUMBER_COL}」為試算表上的列號，新增的列留空即可")
+                # 資料或篩選條件改變時換一個編輯器，避免未儲存的修改套到別的列上
+                lineage = get_repository().snapshot("logs")[1]
+                edited = st.data_editor(edit_df, num_rows="dynamic", use_container_width=True, hide_index=True,
+                                        disabled=[ROW_NUMBER_COL], key=f"log_editor_{lineage}_{e_range}_{e_bad}_{e_name}_{e_act}")
+                if st.button("💾 儲存修改"):
+                    plan = save_window("logs", edit_df, edited, edit_base)
+                    if plan is not None:
+                        st.success(f"已更新：修改 {len(plan.updates)} 處、新增 {len(plan.appends)} 筆、刪除 {len(plan.deletes)} 筆")
 
 elif st.session_state.page == 'members':
     render_nav()
     st.markdown("## 📋 志工名冊管理")
-    df = load_data_from_sheet("members")
+    df = load_typed("members", MEM_COLS)
     
     # 公開區域：新增志工
     with st.expander("➕ 新增志工 (展開填寫)", expanded=False):
@@ -712,12 +570,16 @@ elif st.session_state.page == 'members':
             st.rerun()
             
         if not df.empty:
-            df['狀態'] = df.apply(lambda r: '已退隊' if check_is_fully_retired(r) else '服務中', axis=1)
-            df['年齡'] = df['生日'].apply(calculate_age)
+            df['狀態'] = df['retired'].map({True: '已退隊', False: '服務中'})
+            df['年齡'] = df['age']
+            # 各組別加入/退出日期整理出的在職組別與年資 (名冊更新時才重算，見 shared.volunteers)
+            tenure = member_tenure()
+            df['在職組別'] = df['身分證字號'].astype(str).map(tenure['在職組別']).fillna("")
+            df['年資'] = df['身分證字號'].astype(str).map(tenure['年資'])
             # 🔥 自動依照姓名排序
             df = df.sort_values(by='姓名')
             
-            cols = ['姓名', '年齡', '電話', '地址', '志工分類'] + [c for c in df.columns if '日期' in c] + ['備註']
+            cols = ['姓名', '年齡', '電話', '地址', '志工分類', '在職組別', '年資'] + [c for c in df.columns if '日期' in c] + ['備註']
             cols = [c for c in cols if c in df.columns]
             tab_active, tab_retired = st.tabs(["🔥 服務中", "🍂 已退隊"])
             with tab_active:
@@ -730,7 +592,6 @@ elif st.session_state.page == 'members':
 elif st.session_state.page == 'report':
     render_nav()
     st.markdown("## 📊 數據分析與報表")
-    logs = load_data_from_sheet("logs")
     
     # 搜尋與篩選區塊
     st.markdown('<div style="background:white; padding:20px; border-radius:15px; border:1px solid #ddd; margin-bottom:20px;">', unsafe_allow_html=True)
@@ -738,121 +599,121 @@ elif st.session_state.page == 'report':
     with c_date: d_range = st.date_input("📅 選擇日期區間", value=(date(date.today().year, 1, 1), date.today()))
     with c_mode: report_mode = st.radio("分析模式", ["依活動查詢", "依志工查詢"], horizontal=True)
     st.markdown('</div>', unsafe_allow_html=True)
-    
-    if logs.empty: st.info("無打卡資料")
+    # 統計數字由每日彙總加總 (見 shared.report_rollup)；原始紀錄只在打開明細/下載時才讀取
+    if isinstance(d_range, tuple) and len(d_range) == 2:
+        start_d, end_d = d_range
+        cube = report_rollup(start_d, end_d)
     else:
-        logs['dt'] = pd.to_datetime(logs['日期'] + ' ' + logs['時間'], errors='coerce')
+        start_d = end_d = None
+        cube = report_rollup()
+
+    def load_details(select):
+        """區間內符合 select(logs) 的原始打卡；區間包含已封存的年度時，一併讀入該年度的封存分頁"""
+        if start_d is not None: logs = load_range("logs", start_d, end_d, LOG_COLS)
+        else: logs = load_typed("logs", LOG_COLS)
         logs = logs.dropna(subset=['dt'])
-        if isinstance(d_range, tuple) and len(d_range) == 2:
-            start_d, end_d = d_range
-            mask = (logs['dt'].dt.date >= start_d) & (logs['dt'].dt.date <= end_d)
-            filtered_logs = logs[mask].copy()
-        else: filtered_logs = logs.copy()
-        
-        if filtered_logs.empty: st.warning("此區間無資料")
-        else:
-            def calc_stats_display(df_in):
-                total_seconds = 0
-                total_sessions = 0
-                for (name, date_val), group in df_in.groupby(['姓名', '日期']):
-                    actions = group['動作'].tolist()
-                    times = group['dt'].tolist()
-                    i = 0
-                    while i < len(actions):
-                        if actions[i] == '簽到':
-                            for j in range(i + 1, len(actions)):
-                                if actions[j] == '簽退':
-                                    total_seconds += (times[j] - times[i]).total_seconds()
-                                    total_sessions += 1
-                                    i = j
-                                    break
-                            i += 1
-                        else: i += 1
-                h = int(total_seconds // 3600)
-                m = int((total_seconds % 3600) // 60)
-                return total_sessions, f"{h}小時 {m}分", round(total_seconds/3600, 2)
-
-            if report_mode == "依活動查詢":
-                all_acts = filtered_logs['活動內容'].unique().tolist()
-                target_act = st.selectbox("選擇活動", ["全部"] + all_acts)
-                view_df = filtered_logs if target_act == "全部" else filtered_logs[filtered_logs['活動內容'] == target_act]
-                
-                # 1. 計算團隊實際服務時數 (扣除重疊)
-                cov_seconds = calculate_coverage_seconds(view_df)
-                cov_h = int(cov_seconds // 3600)
-                cov_m = int((cov_seconds % 3600) // 60)
-                team_time_str = f"{cov_h}小時 {cov_m}分" # 🔥 這裡是定義 team_time_str
-
-                # 2. 計算總人次
-                tot_sess, _, _ = calc_stats_display(view_df) # 🔥 這裡的舊變數被 _ 取代了
-                
-                # 🔥 1. 卡片式統計指標
-                m1, m2, m3 = st.columns(3)
-                with m1: st.markdown(f"""<div class="metric-box"><div class="metric-label">總人次</div><div class="metric-value">{tot_sess}</div></div>""", unsafe_allow_html=True)
-                
-                # 🔥 修正點：這裡要用 team_time_str，且建議標籤改成「團隊服務時數」
-                with m2: st.markdown(f"""<div class="metric-box"><div class="metric-label">團隊服務時數</div><div class="metric-value">{team_time_str}</div></div>""", unsafe_allow_html=True)
-                
-                with m3: st.markdown(f"""<div class="metric-box"><div class="metric-label">參與志工數</div><div class="metric-value">{view_df['姓名'].nunique()}</div></div>""", unsafe_allow_html=True)
-                
+        if start_d is not None:
+            logs = logs[(logs['dt'].dt.date >= start_d) & (logs['dt'].dt.date <= end_d)]
+        return logs[select(logs)].copy()
+
+    def details_too_large(n_rows):
+        if n_rows > MAX_DETAIL_ROWS:
+            st.warning(f"此範圍共 {n_rows} 筆，請縮小日期區間或指定志工/活動 (上限 {MAX_DETAIL_ROWS} 筆)")
+            return True
+        return False
+
+    if cube.act.empty: st.info("此區間無打卡資料")
+    else:
+        def format_hm(total_seconds):
+            h = int(total_seconds // 3600)
+            m = int((total_seconds % 3600) // 60)
+            return f"{h}小時 {m}分"
+
+        if report_mode == "依活動查詢":
+            all_acts = cube.activities()
+            target_act = st.selectbox("選擇活動", ["全部"] + all_acts)
+            act = None if target_act == "全部" else target_act
+            
+            # 1. 團隊實際服務時數 (扣除重疊)、總人次與各人次數/秒數
+            tot_sess, cov_seconds, per_person = cube.activity_summary(act)
+            cov_h = int(cov_seconds // 3600)
+            cov_m = int((cov_seconds % 3600) // 60)
+            team_time_str = f"{cov_h}小時 {cov_m}分" # 🔥 這裡是定義 team_time_str
+            
+            # 🔥 1. 卡片式統計指標
+            m1, m2, m3 = st.columns(3)
+            with m1: st.markdown(f"""<div class="metric-box"><div class="metric-label">總人次</div><div class="metric-value">{tot_sess}</div></div>""", unsafe_allow_html=True)
+            
+            # 🔥 修正點：這裡要用 team_time_str，且建議標籤改成「團隊服務時數」
+            with m2: st.markdown(f"""<div class="metric-box"><div class="metric-label">團隊服務時數</div><div class="metric-value">{team_time_str}</div></div>""", unsafe_allow_html=True)
+            
+            with m3: st.markdown(f"""<div class="metric-box"><div class="metric-label">參與志工數</div><div class="metric-value">{len(per_person)}</div></div>""", unsafe_allow_html=True)
+            
+            n_rows = cube.row_count(activity=act)
+            if st.checkbox(f"📥 準備下載此報表 (CSV，{n_rows} 筆原始打卡)", key="report_act_csv") and not details_too_large(n_rows):
+                view_df = load_details(lambda l: l['活動內容'] == act if act else pd.Series(True, index=l.index))
                 csv = view_df.to_csv(index=False).encode('utf-8-sig')
                 st.download_button("📥 下載此報表 (CSV)", data=csv, file_name=f"志工報表_{date.today()}.csv", mime="text/csv")
-                
-                # 🔥 2. 卡片式志工明細 (Grid Layout)
-                st.markdown("### 📋 人員明細表")
-                summary = []
-                for name, g in view_df.groupby('姓名'):
-                    c, s_str, s_num = calc_stats_display(g)
-                    summary.append({'姓名': name, '次數': c, '時數': s_str, '排序用時數': s_num})
-                
-                summ_df = pd.DataFrame(summary).sort_values('排序用時數', ascending=False)
-                
-                # 每3個一列顯示卡片
-                for i in range(0, len(summ_df), 3):
-                    cols = st.columns(3)
-                    for j in range(3):
-                        if i + j < len(summ_df):
-                            row = summ_df.iloc[i+j]
-                            with cols[j]:
-                                st.markdown(f"""
-                                <div class="vol-card">
-                                    <div>
-                                        <div class="vol-card-name">{row['姓名']}</div>
-                                        <div style="color:#888; font-size:0.9rem;">共出勤 {row['次數']} 次</div>
-                                    </div>
-                                    <div class="vol-card-stats">
-                                        <div class="vol-card-tag">{row['時數']}</div>
-                                    </div>
-                                </div>
-                                """, unsafe_allow_html=True)
-
-            else: # 依志工查詢
-                all_names = sorted(filtered_logs['姓名'].unique().tolist())
-                target_name = st.selectbox("選擇志工", all_names)
-                view_df = filtered_logs[filtered_logs['姓名'] == target_name]
-                tot_sess, tot_time_str, _ = calc_stats_display(view_df)
-                
-                # 🔥 統計指標卡片
-                m1, m2 = st.columns(2)
-                with m1: st.markdown(f"""<div class="metric-box"><div class="metric-label">執勤次數</div><div class="metric-value">{tot_sess}</div></div>""", unsafe_allow_html=True)
-                with m2: st.markdown(f"""<div class="metric-box"><div class="metric-label">累積時數</div><div class="metric-value">{tot_time_str}</div></div>""", unsafe_allow_html=True)
-                
+            
+            # 🔥 2. 卡片式志工明細 (Grid Layout)
+            st.markdown("### 📋 人員明細表")
+            summ_df = pd.DataFrame({
+                '姓名': per_person.index,
+                '次數': per_person['次數'].astype(int).values,
+                '時數': [format_hm(x) for x in per_person['秒數']],
+                '排序用時數': (per_person['秒數'] / 3600).round(2).values,
+            }).sort_values('排序用時數', ascending=False)
+            
+            # 每3個一列顯示卡片 (分頁，每頁一次送出)
+            render_cards(summ_df, lambda row: f"""
+                <div class="vol-card">
+                    <div>
+                        <div class="vol-card-name">{row['姓名']}</div>
+                        <div style="color:#888; font-size:0.9rem;">共出勤 {row['次數']} 次</div>
+                    </div>
+                    <div class="vol-card-stats">
+                        <div class="vol-card-tag">{row['時數']}</div>
+                    </div>
+                </div>
+                """, key="report_people", columns=3, reset_on=(d_range, target_act))
+
+        else: # 依志工查詢
+            all_names = cube.names()
+            target_name = st.selectbox("選擇志工", all_names)
+            tot_sess, tot_seconds = cube.person_summary(target_name)
+            tot_time_str = format_hm(tot_seconds)
+            
+            # 🔥 統計指標卡片
+            m1, m2 = st.columns(2)
+            with m1: st.markdown(f"""<div class="metric-box"><div class="metric-label">執勤次數</div><div class="metric-value">{tot_sess}</div></div>""", unsafe_allow_html=True)
+            with m2: st.markdown(f"""<div class="metric-box"><div class="metric-label">累積時數</div><div class="metric-value">{tot_time_str}</div></div>""", unsafe_allow_html=True)
+            
+            # 🔥 卡片式打卡紀錄 (打開時才讀取原始紀錄)
+            n_rows = cube.row_count(name=target_name)
+            if st.checkbox(f"📋 顯示執勤紀錄明細與下載 ({n_rows} 筆)", key="report_person_logs") and not details_too_large(n_rows):
+                view_df = load_details(lambda l: l['姓名'] == target_name)
                 csv = view_df.to_csv(index=False).encode('utf-8-sig')
                 st.download_button("📥 下載個人紀錄 (CSV)", data=csv, file_name=f"個人報表_{target_name}_{date.today()}.csv", mime="text/csv")
                 
-                # 🔥 卡片式打卡紀錄
                 st.markdown("### 📋 執勤紀錄明細")
                 view_df = view_df.sort_values(['日期', '時間'], ascending=False)
                 
-                for idx, row in view_df.iterrows():
+                def log_card(row):
                     action_class = "action-in" if row['動作'] == "簽到" else "action-out"
-                    st.markdown(f"""
+                    return f"""
                     <div class="vol-log-card">
                         <div class="vol-log-date">{row['日期']} {row['時間']}</div>
                         <div style="flex-grow:1; margin-left:15px; color:#555;">{row['活動內容']}</div>
                         <div class="vol-log-action {action_class}">{row['動作']}</div>
                     </div>
-                    """, unsafe_allow_html=True)
+                    """
+                render_cards(view_df, log_card, key="report_logs", per_page=50, scroll_height=640,
+                             reset_on=(d_range, target_name))
 
         if st.button("🔄 同步資料到 App"):
             sync_to_app_users()
+
+with st.sidebar:
+    render_data_age("members", "logs")
+    render_archive_status()
+profiling.render_panel()
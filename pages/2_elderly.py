@@ -1,11 +1,15 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta, timezone
-import gspread
 import time
 import os
 import plotly.express as px
 import random
+from shared.sheets import load_data as _load_sheet, load_typed as _load_typed, save_data, append_data, batch_append_data, render_data_age
+from shared.write_queue import queue_append, pending_frame, render_queue_status
+from shared.schema import ELDER_MEM_COLS, ELDER_LOG_COLS
+from shared.archive import load_range, render_archive_status
+from shared import profiling
 
 # =========================================================
 # 0) 系統設定 (🎨 這裡可以調整全站基礎設定)
@@ -16,6 +20,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded", 
 )
+profiling.start_run("elderly")
 
 # 初始化頁面狀態
 if 'page' not in st.session_state: st.session_state.page = 'home'
@@ -204,93 +209,23 @@ div[data-baseweb="calendar"] {{
 # =========================================================
 # 2) Logic & Data (優化版)
 # =========================================================
-SHEET_ID = "1A3-VwCBYjnWdcEiL6VwbV5-UECcgX7TqKH94sKe8P90"
 COURSE_HIERARCHY = {
     "手作": ["藝術手作", "生活用品"], "講座": ["消防", "反詐", "道路安全", "環境", "心靈成長", "家庭關係", "健康"],
     "外出": ["觀摩", "出遊"], "延緩失能": ["手作", "料理", "運動", "健康講座"],
     "運動": ["有氧", "毛巾操", "其他運動"], "園藝療癒": ["手作"], "烹飪": ["甜品", "鹹食", "醃漬品"], "歌唱": ["歡唱"]
 }
-M_COLS = ["姓名", "身分證字號", "性別", "出生年月日", "電話", "地址", "備註", "加入日期"]
-L_COLS = ["姓名", "身分證字號", "日期", "時間", "課程分類", "課程名稱", "收縮壓", "舒張壓", "脈搏"]
+M_COLS = ELDER_MEM_COLS
+L_COLS = ELDER_LOG_COLS
 
-@st.cache_resource
-def get_google_sheet_client():
-    return gspread.service_account_from_dict(st.secrets["gcp_service_account"])
-
-# 🔥 優化 A: 讀取速度提升
-@st.cache_data(ttl=60)
+# 讀取/快取統一由 shared.sheets 處理，這裡只負責補齊欄位
 def load_data(sheet_name):
-    try:
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        # 改用 get_all_values (List of Lists) 讀取速度較快
-        data = sheet.get_all_values()
-        if not data: 
-            target_cols = M_COLS if sheet_name == 'elderly_members' else L_COLS
-            return pd.DataFrame(columns=target_cols)
-            
-        headers = data.pop(0)
-        df = pd.DataFrame(data, columns=headers)
-        
-        # 確保欄位存在
-        target_cols = M_COLS if sheet_name == 'elderly_members' else L_COLS
-        for c in target_cols: 
-            if c not in df.columns: df[c] = ""
-        return df
-    except: 
-        return pd.DataFrame(columns=M_COLS if sheet_name == 'elderly_members' else L_COLS)
-
-# 維持舊版 save_data (僅用於編輯修改資料)
-def save_data(df, sheet_name):
-    try:
-        df_to_save = df.copy()
-        df_to_save = df_to_save.replace(['nan', 'NaN', 'None', '<NA>'], "")
-        df_to_save = df_to_save.fillna("")
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        sheet.clear()
-        sheet.update([df_to_save.columns.values.tolist()] + df_to_save.values.tolist())
-        st.cache_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"寫入失敗：{e}"); return False
-
-# 🔥 優化 B: 單筆追加 (用於新增長輩、單人報到)
-def append_data(sheet_name, row_dict, col_order):
-    try:
-        values = [str(row_dict.get(c, "")).strip() for c in col_order]
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        sheet.append_row(values)
-        st.cache_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"新增失敗：{e}"); return False
-
-# 🔥 優化 C: 批次追加 (專用於批次補登，速度極快)
-def batch_append_data(sheet_name, rows_list, col_order):
-    try:
-        # rows_list 是一個包含多個字典的 list
-        values_to_write = []
-        for row in rows_list:
-            values_to_write.append([str(row.get(c, "")).strip() for c in col_order])
-            
-        client = get_google_sheet_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sheet_name)
-        sheet.append_rows(values_to_write)
-        st.cache_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"批次失敗：{e}"); return False
+    return _load_sheet(sheet_name, M_COLS if sheet_name == 'elderly_members' else L_COLS)
 
-def get_tw_time(): return datetime.now(TW_TZ)
+# 只讀的統計用：附帶載入時轉好的 dt、sbp (收縮壓) 等型別欄位
+def load_typed(sheet_name):
+    return _load_typed(sheet_name, M_COLS if sheet_name == 'elderly_members' else L_COLS)
 
-def calculate_age(dob_str):
-    try:
-        b_date = datetime.strptime(str(dob_str).strip(), "%Y-%m-%d").date()
-        today = date.today()
-        return today.year - b_date.year - ((today.month, today.day) < (b_date.month, b_date.day))
-    except: return 0
+def get_tw_time(): return datetime.now(TW_TZ)
 
 # =========================================================
 # 3) Navigation (側邊欄版)
@@ -342,27 +277,28 @@ def render_nav():
 # =========================================================
 
 # --- [分頁 0：首頁 (完全公開)] ---
+profiling.section(f"page:{st.session_state.page}")
 if st.session_state.page == 'home':
     render_nav()
     st.markdown(f"<h2 style='color: {PRIMARY};'>📊 據點關懷概況</h2>", unsafe_allow_html=True)
     
-    logs, members = load_data("elderly_logs"), load_data("elderly_members")
+    logs, members = load_typed("elderly_logs"), load_typed("elderly_members")
     this_year = get_tw_time().year
     today_str = get_tw_time().strftime("%Y-%m-%d")
     
-    year_count = len(logs[pd.to_datetime(logs['日期'], errors='coerce').dt.year == this_year]) if not logs.empty else 0
+    year_count = len(logs[logs['dt'].dt.year == this_year]) if not logs.empty else 0
     today_count = len(logs[logs['日期'] == today_str]) if not logs.empty else 0
     
     # 總體平均年齡
-    avg_age = round(members['出生年月日'].apply(calculate_age).mean(), 1) if not members.empty else 0
+    avg_age = round(members['age'].mean(), 1) if not members.empty else 0
     
     male_m = members[members['性別'] == '男']
     female_m = members[members['性別'] == '女']
     
     male_count = len(male_m)
     female_count = len(female_m)
-    male_avg_age = round(male_m['出生年月日'].apply(calculate_age).mean(), 1) if not male_m.empty else 0
-    female_avg_age = round(female_m['出生年月日'].apply(calculate_age).mean(), 1) if not female_m.empty else 0
+    male_avg_age = round(male_m['age'].mean(), 1) if not male_m.empty else 0
+    female_avg_age = round(female_m['age'].mean(), 1) if not female_m.empty else 0
     
     total_members = len(members)
 
@@ -482,7 +418,7 @@ elif st.session_state.page == 'members':
                     if append_data("elderly_archive", target_row, ARCHIVE_COLS):
                         # 5. 從原表中刪除 (透過篩選掉該身分證號)
                         df_new = df[df['身分證字號'] != target_pid]
-                        if save_data(df_new, "elderly_members"):
+                        if save_data(df_new, "elderly_members", base=df):
                             st.success(f"✅ 已將 {target_row['姓名']} 移至封存名單。")
                             time.sleep(1)
                             st.rerun()
@@ -523,8 +459,8 @@ elif st.session_state.page == 'checkin':
             "課程分類": final_course_cat, "課程名稱": final_course_name,
             "收縮壓": sbp, "舒張壓": dbp, "脈搏": pulse
         }
-        # --- 修改為 append_data (原本是 save_data) ---
-        append_data("elderly_logs", new_log, L_COLS)
+        # 先記在本機佇列馬上回覆，背景再合併寫入試算表 (見 shared.write_queue)
+        if not queue_append("elderly_logs", new_log, L_COLS): return
         
         if alerts:
             st.warning(f"✅ {name} 報到成功，但數值異常：{' / '.join(alerts)}")
@@ -577,6 +513,9 @@ elif st.session_state.page == 'checkin':
 
     st.markdown("---")
     st.write("📋 今日已報到名單 (您可以直接點擊下方格子修改內容)：")
+    queued = pending_frame("elderly_logs")
+    if not queued.empty: st.caption(f"⏳ 上傳中 (稍後會出現在下方名單)：{'、'.join(queued['姓名'])}")
+    render_queue_status()
     
     logs = load_data("elderly_logs")
     today_str = get_tw_time().strftime("%Y-%m-%d")
@@ -587,8 +526,9 @@ elif st.session_state.page == 'checkin':
             edited_df = st.data_editor(today_logs, column_order=['時間', '姓名', '收縮壓', '舒張壓', '脈搏', '課程名稱', '課程分類', '身分證字號'], use_container_width=True, num_rows="dynamic", key="today_checkin_editor")
             if st.button("💾 儲存名單修改"):
                 other_logs = logs[logs['日期'] != today_str]
-                final_logs = pd.concat([other_logs, edited_df], ignore_index=True)
-                if save_data(final_logs, "elderly_logs"):
+                # 保留原本的 index，存檔時才能只寫回有修改的列
+                final_logs = pd.concat([other_logs, edited_df])
+                if save_data(final_logs, "elderly_logs", base=logs):
                     st.success("✅ 名單已更新至雲端！"); time.sleep(1); st.rerun()
         else: st.info("今日尚無報到紀錄。")
     else: st.info("資料庫目前無任何紀錄。")
@@ -636,14 +576,15 @@ elif st.session_state.page == 'checkin':
 elif st.session_state.page == 'stats':
     render_nav()
     st.markdown("## 📊 統計數據")
-    members, logs = load_data("elderly_members"), load_data("elderly_logs")
+    members, logs = load_data("elderly_members"), load_typed("elderly_logs")
     if members.empty or logs.empty: st.info("尚無數據")
     else:
-        logs['dt'] = pd.to_datetime(logs['日期'], errors='coerce')
         st.markdown('<div class="dash-card">', unsafe_allow_html=True)
         d_range = st.date_input("📅 選擇統計區間", value=(date(date.today().year, date.today().month, 1), date.today()))
         st.markdown('</div>', unsafe_allow_html=True)
         if isinstance(d_range, tuple) and len(d_range) == 2:
+            # 區間包含已封存的年度時，一併讀入該年度的封存分頁
+            logs = load_range("elderly_logs", d_range[0], d_range[1], L_COLS)
             f_logs = logs[(logs['dt'].dt.date >= d_range[0]) & (logs['dt'].dt.date <= d_range[1])].copy()
             tab_c, tab_h = st.tabs(["📚 課程成效", "🏥 長輩健康"])
             with tab_c:
@@ -687,9 +628,14 @@ elif st.session_state.page == 'stats':
             with tab_h:
                 target_elder = st.selectbox("🔍 請選擇長輩", sorted(f_logs['姓名'].unique()), key="sel_elder_health")
                 e_logs = f_logs[f_logs['姓名']==target_elder].sort_values('dt')
-                e_logs['收縮壓'] = pd.to_numeric(e_logs['收縮壓'], errors='coerce')
+                e_logs['收縮壓'] = e_logs['sbp']
                 high_bp = len(e_logs[e_logs['收縮壓']>=140])
                 st.markdown(f"""<div class="dash-card" style="border-left:6px solid #E91E63"><div style="color:#666;">血壓異常次數</div><div style="font-size:1.8rem;color:{PRIMARY};font-weight:900;">{high_bp} 次</div></div>""", unsafe_allow_html=True)
                 fig = px.line(e_logs, x='dt', y=['收縮壓'], markers=True, title="收縮壓變化趨勢")
                 fig.add_hline(y=140, line_dash="dash", line_color="red")
                 st.plotly_chart(fig, use_container_width=True)
+
+with st.sidebar:
+    render_data_age("elderly_members", "elderly_logs")
+    render_archive_status()
+profiling.render_panel()
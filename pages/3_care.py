@@ -1,11 +1,16 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta, timezone
-import gspread
 import plotly.express as px
 import random
 import time
 import re  # 新增：用於正則表達式提取樓層
+from shared.sheets import load_data, load_typed, load_with_types, save_data, append_data as _append_data, render_data_age
+from shared.care import check_conflict, compute_stock, received_totals, suggest_recipients
+from shared.archive import archived_frame, archived_totals, render_archive_status
+from shared.schema import CARE_MEM_COLS, CARE_INV_COLS, CARE_LOG_COLS
+from shared.card_list import render_cards
+from shared import profiling
 
 # =========================================================
 # 0) 系統設定
@@ -16,6 +21,7 @@ st.set_page_config(
     layout="wide", 
     initial_sidebar_state="expanded" 
 )
+profiling.start_run("care")
 
 # 1. 初始化登入狀態
 if 'authenticated' not in st.session_state:
@@ -322,8 +328,7 @@ div[data-testid="stSlider"] {{
 # =========================================================
 # 2) 資料邏輯 (更新欄位定義)
 # =========================================================
-SHEET_ID = "1A3-VwCBYjnWdcEiL6VwbV5-UECcgX7TqKH94sKe8P90"
-COLS_MEM = ["姓名", "身分證字號", "性別", "生日", "地址", "電話", "緊急聯絡人", "緊急聯絡人電話", "身分別", "18歲以下子女", "成人數量", "65歲以上長者", "拒絕物資", "人際關係"] 
+COLS_MEM = CARE_MEM_COLS
 
 # 更新資料定義：包含 Word 檔所有題項
 # =========================================================
@@ -368,79 +373,12 @@ COLS_HEALTH = [
     "QOL_22_朋友支持", "QOL_23_住所", "QOL_24_醫療方便", "QOL_25_交通", "QOL_26_負面感受", "QOL_27_被尊重", "QOL_28_食物"
 ]
 
-COLS_INV = ["捐贈者", "物資類型", "物資內容", "總數量", "捐贈日期"]
-COLS_LOG = ["志工", "發放日期", "關懷戶姓名", "物資內容", "發放數量", "訪視紀錄"]
-# ==========================================
-# 🧠 智慧判讀字典：定義「類別」包含哪些「關鍵字」
-# ==========================================
-SMART_RULES = {
-    "海鮮": ["魚", "蝦", "蟹", "貝", "蛤", "魷", "透抽", "鯖", "鮪", "海苔", "XO醬"],
-    "甲殼": ["蝦", "蟹", "龍蝦"],
-    "牛肉": ["牛"],
-    "豬肉": ["豬", "培根", "火腿", "香腸"],
-    "堅果": ["花生", "杏仁", "核桃", "腰果", "芝麻"],
-}
-
-def check_conflict(refuse_str, item_name):
-    """
-    智慧比對函數：
-    1. refuse_str: 關懷戶拒絕的項目 (如 "海鮮, 辣")
-    2. item_name: 物資名稱 (如 "紅燒鯖魚罐頭")
-    回傳: (是否衝突, 衝突的原因關鍵字)
-    """
-    if not refuse_str: return False, None
-    
-    # 1. 整理拒絕清單
-    refuse_list = [k.strip() for k in refuse_str.split(',') if k.strip()]
-    
-    for r_key in refuse_list:
-        # A. 直接比對 (例如拒絕 "鯖魚"，物資是 "鯖魚罐頭" -> 中)
-        if r_key in item_name:
-            return True, r_key
-            
-        # B. 查字典比對 (例如拒絕 "海鮮"，系統去查海鮮包含什麼)
-        if r_key in SMART_RULES:
-            related_words = SMART_RULES[r_key]
-            for word in related_words:
-                if word in item_name:
-                    return True, f"{r_key}(含{word})"
-    
-    return False, None
-
+COLS_INV = CARE_INV_COLS
+COLS_LOG = CARE_LOG_COLS
 # =========================================================
 # 2) 資料邏輯 (優化版)
 # =========================================================
-# ... (保留原本的 SHEET_ID 與 COLS 定義) ...
-
-@st.cache_resource
-def get_client(): return gspread.service_account_from_dict(st.secrets["gcp_service_account"])
-
-# 優化 A：快取時間延長至 60 秒，減少切換頁面時的卡頓
-@st.cache_data(ttl=60)
-def load_data(sn, target_cols):
-    try:
-        client = get_client(); sheet = client.open_by_key(SHEET_ID).worksheet(sn)
-        # 這裡建議用 get_all_values 比較快，再轉 DataFrame
-        data = sheet.get_all_values()
-        if not data: return pd.DataFrame(columns=target_cols)
-        headers = data.pop(0)
-        df = pd.DataFrame(data, columns=headers)
-        # 補齊缺少的欄位
-        for c in target_cols:
-            if c not in df.columns: df[c] = ""
-        return df
-    except: return pd.DataFrame(columns=target_cols)
-
-# 維持原本的 save_data 用於「修改舊資料/編輯整張表」
-def save_data(df, sn):
-    try:
-        df_fix = df.fillna("").replace(['nan', 'NaN', 'nan.0', 'None', '<NA>'], "").astype(str)
-        client = get_client(); sheet = client.open_by_key(SHEET_ID).worksheet(sn)
-        sheet.clear(); sheet.update([df_fix.columns.values.tolist()] + df_fix.values.tolist())
-        st.cache_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"寫入失敗：{e}"); return False
+# 讀取/寫入統一由 shared.sheets 處理 (load_data / save_data / append_data)
 
 # 🔥 [新增] 卡片式標籤題目 (完全符合草圖需求)
 def ui_card_radio(label, options, key=None, help_text=None, index=None):
@@ -480,23 +418,7 @@ def append_data(sn, row_dict, col_order):
     row_dict: 要新增的資料字典
     col_order: 欄位順序列表 (如 COLS_LOG)
     """
-    try:
-        row_values = [str(row_dict.get(c, "")).strip() for c in col_order]
-
-        client = get_client()
-        sheet = client.open_by_key(SHEET_ID).worksheet(sn)
-
-        sheet.append_row(
-            row_values,
-            value_input_option="USER_ENTERED",
-            insert_data_option="INSERT_ROWS",
-        )
-
-        st.cache_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"新增失敗：{e}")
-        return False
+    return _append_data(sn, row_dict, col_order, value_input_option="USER_ENTERED")
 
 # 🔥 新增函數：從地址推斷樓層
 def extract_floor(address_str):
@@ -512,12 +434,6 @@ def extract_floor(address_str):
         return match.group(0) # 返回如 "3樓"
     return "1樓" # 預設
 
-def calculate_age(dob_str):
-    try:
-        bd = datetime.strptime(str(dob_str).strip(), "%Y-%m-%d").date()
-        today = date.today(); return today.year - bd.year - ((today.month, today.day) < (bd.month, bd.day))
-    except: return 0
-
 # =========================================================
 # 3) Navigation
 # =========================================================
@@ -559,24 +475,24 @@ def render_nav():
 # =========================================================
 
 # --- [分頁 0：首頁] ---
+profiling.section(f"page:{st.session_state.page}")
 if st.session_state.page == 'home':
     render_nav()
     st.markdown(f"<h2 style='color: {GREEN};'>📊 關懷戶概況看板</h2>", unsafe_allow_html=True)
-    mems, logs = load_data("care_members", COLS_MEM), load_data("care_logs", COLS_LOG)
+    mems, logs = load_typed("care_members", COLS_MEM), load_typed("care_logs", COLS_LOG)
     
     if not mems.empty:
-        mems['age'] = mems['生日'].apply(calculate_age)
         mems_display = mems[~mems['身分別'].str.contains("一般戶", na=False)]
         
         cur_y = datetime.now(TW_TZ).year
         prev_y = cur_y - 1
         
-        dist_df = logs.copy()
         if not logs.empty:
-            dist_df['dt'] = pd.to_datetime(dist_df['發放日期'], errors='coerce')
-            cur_val = dist_df[dist_df['dt'].dt.year == cur_y]['發放數量'].replace("","0").astype(float).sum()
-            prev_val = dist_df[dist_df['dt'].dt.year == prev_y]['發放數量'].replace("","0").astype(float).sum()
+            cur_val = logs[logs['dt'].dt.year == cur_y]['qty'].sum()
+            prev_val = logs[logs['dt'].dt.year == prev_y]['qty'].sum()
         else: cur_val = prev_val = 0
+        # 去年若已封存 (見 shared.archive)，改由年度統計補上
+        prev_val += archived_totals("care_logs", "發放數量", prev_y).sum()
         
         # ---原本的統計邏輯 (保留並微調)---
         dis_c = len(mems[mems['身分別'].str.contains("身障", na=False)])
@@ -613,7 +529,7 @@ if st.session_state.page == 'home':
 elif st.session_state.page == 'members':
     render_nav()
     st.markdown("## 📋 關懷戶名冊管理")
-    df = load_data("care_members", COLS_MEM)
+    df = load_typed("care_members", COLS_MEM)
     
     # === 🔥 修改開始：新增「最新 3 筆」卡片顯示區 ===
     st.markdown("### 🆕 最新建檔關懷戶")
@@ -635,7 +551,7 @@ elif st.session_state.page == 'members':
                     text-align: center;">
                     <div style="font-size: 1.2rem; font-weight: 900; color: #333;">{row['姓名']}</div>
                     <div style="font-size: 0.9rem; color: #666; margin-top: 5px;">
-                        {row.get('性別','')} / {calculate_age(row.get('生日',''))} 歲
+                        {row.get('性別','')} / {row['age']} 歲
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
@@ -685,7 +601,7 @@ elif st.session_state.page == 'members':
 elif st.session_state.page == 'health':
     render_nav()
     st.markdown("## 🏥 綜合健康評估")
-    h_df, m_df = load_data("care_health", COLS_HEALTH), load_data("care_members", COLS_MEM)
+    h_df, m_df = load_data("care_health", COLS_HEALTH), load_typed("care_members", COLS_MEM)
     
     with st.expander("➕ 新增/更新 評估紀錄 (請依序填寫)", expanded=True):
         sel_n = st.selectbox("選擇關懷戶", m_df['姓名'].tolist() if not m_df.empty else ["無名冊"], index=None, placeholder="請選擇...")
@@ -696,7 +612,7 @@ elif st.session_state.page == 'health':
             p_row = m_df[m_df['姓名'] == sel_n].iloc[0]
             p_info['gender'] = p_row['性別']
             p_info['dob'] = p_row['生日']
-            p_info['age'] = calculate_age(p_row['生日'])
+            p_info['age'] = p_row['age']
             p_info['floor'] = extract_floor(p_row['地址'])
             
             st.info(f"✅ 系統已自動帶入個案基本資料：{p_info['gender']}性 / {p_info['age']}歲 / {p_info['dob']} / 推測住 {p_info['floor']}")
@@ -1121,7 +1037,7 @@ elif st.session_state.page == 'health':
                     for k, v in qol_ans.items():
                         row_data[f"QOL_{k.replace('Q','')}"] = safe_str(v)
                     
-                    if save_data(pd.concat([h_df, pd.DataFrame([row_data])], ignore_index=True), "care_health"): 
+                    if save_data(pd.concat([h_df, pd.DataFrame([row_data])], ignore_index=True), "care_health", base=h_df): 
                         st.success("✅ 問卷儲存成功！"); st.rerun()
 
     # === 🔥 修改開始：直接抓取資料表「最下方」的 3 筆 ===
@@ -1215,13 +1131,11 @@ elif st.session_state.page == 'inventory':
     if not inv.empty:
         st.markdown("### 📊 庫存概況 (智慧卡片)")
         inv_summary = []
-        for (item_name, donor_name), group in inv.groupby(['物資內容', '捐贈者']):
-            total_in = group['總數量'].replace("","0").astype(float).sum()
-            composite_name = f"{item_name} ({donor_name})"
-            total_out = logs[logs['物資內容'] == composite_name]['發放數量'].replace("","0").astype(float).sum() if not logs.empty else 0
+        for item in compute_stock(inv, logs, archived_totals("care_logs", "發放數量")):
+            total_in, total_out = item["total_in"], item["total_out"]
             remain = total_in - total_out
             if remain > 0:
-                m_type = group.iloc[0]['物資類型']
+                m_type = item["type"]
                 icon_map = {"食物": "🍱", "日用品": "🧻", "輔具": "🦯", "急難救助金": "💰", "服務": "🧹"}
                 icon = icon_map.get(m_type, "📦")
                 pct = int((remain / total_in * 100)) if total_in > 0 else 0
@@ -1230,7 +1144,7 @@ elif st.session_state.page == 'inventory':
                 if remain <= 5: bar_color = "#D32F2F"
                 elif pct < 30: bar_color = "#FBC02D"
                 inv_summary.append({
-                    "name": item_name, "donor": donor_name, "type": m_type, "icon": icon,
+                    "name": item["name"], "donor": item["donor"], "type": m_type, "icon": icon,
                     "in": int(total_in), "out": int(total_out), "remain": int(remain),
                     "pct": pct, "bar_color": bar_color
                 })
@@ -1238,14 +1152,9 @@ elif st.session_state.page == 'inventory':
         if not inv_summary:
             st.info("💡 目前無庫存 (或已全數發放完畢)")
         else:
-            for i in range(0, len(inv_summary), 3):
-                cols = st.columns(3)
-                for j in range(3):
-                    if i + j < len(inv_summary):
-                        item = inv_summary[i + j]
-                        with cols[j]:
-                            warning_html = f'<div class="stock-warning">⚠️ 庫存告急！僅剩 {item["remain"]}</div>' if item["remain"] <= 5 else ""
-                            st.markdown(f"""
+            def stock_card(item):
+                warning_html = f'<div class="stock-warning">⚠️ 庫存告急！僅剩 {item["remain"]}</div>' if item["remain"] <= 5 else ""
+                return f"""
 <div class="stock-card">
 <div class="stock-top">
 <div class="stock-icon">{item['icon']}</div>
@@ -1266,11 +1175,12 @@ elif st.session_state.page == 'inventory':
 </div>
 {warning_html}
 </div>
-""", unsafe_allow_html=True)
+"""
+            render_cards(inv_summary, stock_card, key="stock_cards", columns=3)
 
         with st.expander("🛠️ 進階管理：編輯原始庫存資料 (點擊展開)"):
             ed_i = st.data_editor(inv, use_container_width=True, num_rows="dynamic", key="inv_ed")
-            if st.button("💾 儲存修改內容"): save_data(ed_i, "care_inventory")
+            if st.button("💾 儲存修改內容"): save_data(ed_i, "care_inventory", base=inv)
 
 # --- [插入位置：分頁 4：訪視] ---
 elif st.session_state.page == 'visit':
@@ -1279,18 +1189,14 @@ elif st.session_state.page == 'visit':
     
     # 1. 載入資料
     mems = load_data("care_members", COLS_MEM)
-    inv = load_data("care_inventory", COLS_INV)
-    logs = load_data("care_logs", COLS_LOG)
+    inv = load_typed("care_inventory", COLS_INV)
+    logs = load_typed("care_logs", COLS_LOG)
     
     # 2. 計算即時庫存
     stock_map = {}
-    if not inv.empty:
-        for (item_name, donor_name), group in inv.groupby(['物資內容', '捐贈者']):
-            total_in = group['總數量'].replace("","0").astype(float).sum()
-            composite_name = f"{item_name} ({donor_name})"
-            total_out = logs[logs['物資內容'] == composite_name]['發放數量'].replace("","0").astype(float).sum() if not logs.empty else 0
-            remain = int(total_in - total_out)
-            if remain > 0: stock_map[composite_name] = remain
+    for item in compute_stock(inv, logs, archived_totals("care_logs", "發放數量")):
+        remain = int(item["total_in"] - item["total_out"])
+        if remain > 0: stock_map[item["composite"]] = remain
 
     # =========================================================
     # ✨ 功能 A：智慧發放建議 (已找回並升級)
@@ -1303,37 +1209,7 @@ elif st.session_state.page == 'visit':
         else:
             suggest_item = st.selectbox("選擇要評估發放的物資：", list(stock_map.keys()))
             
-            suggestion_list = []
-            for index, row in mems.iterrows():
-                p_name = row['姓名']
-                p_tags = str(row['身分別'])
-                p_refuse = str(row.get('拒絕物資', '')) # 取得該人的拒絕清單
-                
-                # 1. 檢查是否拒收 (呼叫我們寫好的字典判讀)
-                is_conflict, _ = check_conflict(p_refuse, suggest_item)
-                if is_conflict: continue # 如果拒收，直接跳過這個人
-
-                # 2. 檢查是否領過
-                has_received = False
-                if not logs.empty:
-                    check_log = logs[(logs['關懷戶姓名'] == p_name) & (logs['物資內容'] == suggest_item)]
-                    if not check_log.empty:
-                        total_rec = pd.to_numeric(check_log['發放數量'], errors='coerce').sum()
-                        if total_rec > 0: has_received = True
-                
-                if not has_received:
-                    # 3. 計算弱勢積分
-                    score = 0
-                    if "獨居" in p_tags: score += 3
-                    if "低收" in p_tags: score += 3
-                    if "中低收" in p_tags: score += 2
-                    if "身障" in p_tags: score += 2
-                    if "老人" in p_tags or "65歲以上" in str(row): score += 1
-                    try:
-                        if int(row.get('18歲以下子女', 0)) > 2: score += 2
-                    except: pass
-                    
-                    suggestion_list.append({"姓名": p_name, "身分別": p_tags, "弱勢積分": score})
+            suggestion_list = suggest_recipients(mems, logs, suggest_item, received_totals(archived_frame("care_logs")))
             
             # 顯示結果
             if suggestion_list:
@@ -1380,8 +1256,9 @@ elif st.session_state.page == 'visit':
             c_edit, c_btn = st.columns([3, 1])
             new_refuse_input = c_edit.text_input("拒絕項目 (逗號隔開)", value=current_refuse)
             if c_btn.button("💾 更新"):
-                mems.at[p_row_idx, '拒絕物資'] = new_refuse_input
-                save_data(mems, "care_members")
+                edited = mems.copy()
+                edited.at[p_row_idx, '拒絕物資'] = new_refuse_input
+                save_data(edited, "care_members", base=mems)
                 st.toast("✅ 備註已更新！"); time.sleep(1); st.rerun()
 
     st.markdown("#### 2. 填寫訪視內容與物資")
@@ -1543,8 +1420,13 @@ elif st.session_state.page == 'visit':
 elif st.session_state.page == 'stats':
     render_nav()
     st.markdown("## 📊 數據統計與個案查詢")
-    logs, mems = load_data("care_logs", COLS_LOG), load_data("care_members", COLS_MEM)
+    logs = load_data("care_logs", COLS_LOG)
     h_df = load_data("care_health", COLS_HEALTH)
+    # mems 會寫回名冊 (人際關係)，不附加型別欄位；年齡取自同一份快取的型別欄位 (每天算一次)
+    mems, typed_mems = load_with_types("care_members", COLS_MEM)
+    mem_ages = typed_mems['age']
+    # 選單用的名單 (顯示: 姓名 + ID末四碼以防重複)
+    mem_labels = mems['姓名'].astype(str) + " (" + mems['身分證字號'].astype(str).str[-4:] + ")"
 
     # 修改：從 2 個分頁變成 3 個分頁
     tab1, tab2, tab3 = st.tabs(["👤 個案詳細檔案 (含警示)", "🔍 題項交叉篩選", "📈 整體物資統計"])
@@ -1553,8 +1435,7 @@ elif st.session_state.page == 'stats':
     with tab1:
         if mems.empty: st.info("無資料")
         else:
-            # 建立選單用的名單 (顯示: 姓名 + ID末四碼以防重複)
-            all_options = mems.apply(lambda x: f"{x['姓名']} ({str(x['身分證字號'])[-4:]})", axis=1).tolist()
+            all_options = mem_labels.tolist()
             
             # 選擇主要查看對象
             sel_label = st.selectbox("請選擇關懷戶", all_options)
@@ -1564,13 +1445,13 @@ elif st.session_state.page == 'stats':
                 target_name = sel_label.split(' (')[0]
                 
                 # 取得該個案資料列
-                p_row = mems[mems.apply(lambda x: f"{x['姓名']} ({str(x['身分證字號'])[-4:]})", axis=1) == sel_label].iloc[0]
+                p_row = mems[mem_labels == sel_label].iloc[0]
                 p_idx = p_row.name # 取得原始資料表的 index 方便寫入
                 
                 # 取得關鍵變數
                 my_id = str(p_row['身分證字號']).strip()
                 my_name = p_row['姓名']
-                age = calculate_age(p_row['生日'])
+                age = mem_ages[p_idx]
                 
                 # 2. 建立 ID 查找字典
                 id_to_name = mems.set_index('身分證字號')['姓名'].to_dict()
@@ -1720,9 +1601,8 @@ elif st.session_state.page == 'stats':
                     # --- 模式 A: 連結名冊 ---
                     with tab_link:
                         other_df = mems[mems['身分證字號'] != my_id].copy()
-                        other_df['label'] = other_df.apply(
-                            lambda x: f"{x['姓名']} ({calculate_age(x['生日'])}歲 / {str(x['地址'])[:6]}..)", axis=1
-                        )
+                        other_df['label'] = (other_df['姓名'].astype(str) + " (" + mem_ages[other_df.index].astype(str)
+                                             + "歲 / " + other_df['地址'].astype(str).str[:6] + "..)")
                         label_map = other_df.set_index('label')['身分證字號'].to_dict()
                         
                         c1, c2, c3 = st.columns([2, 1, 1])
@@ -1743,8 +1623,9 @@ elif st.session_state.page == 'stats':
                             else:
                                 new_val = f"{old_str},{new_entry}" if old_str else new_entry
                                 new_val = ",".join([x for x in new_val.split(',') if x.strip()])
-                                mems.at[p_idx, '人際關係'] = new_val
-                                save_data(mems, "care_members")
+                                edited = mems.copy()
+                                edited.at[p_idx, '人際關係'] = new_val
+                                save_data(edited, "care_members", base=mems)
                                 st.success(f"已連結：{sel_target.split(' (')[0]}")
                                 time.sleep(0.5); st.rerun()
 
@@ -1763,8 +1644,9 @@ elif st.session_state.page == 'stats':
                                 old_str = str(p_row.get('人際關係', ''))
                                 new_val = f"{old_str},{new_entry}" if old_str else new_entry
                                 new_val = ",".join([x for x in new_val.split(',') if x.strip()])
-                                mems.at[p_idx, '人際關係'] = new_val
-                                save_data(mems, "care_members")
+                                edited = mems.copy()
+                                edited.at[p_idx, '人際關係'] = new_val
+                                save_data(edited, "care_members", base=mems)
                                 st.rerun()
                 
                 # ... (原有的健康警示邏輯區塊，可接續在後) ...
@@ -1955,7 +1837,9 @@ elif st.session_state.page == 'stats':
         st.markdown("### 🤝 近五筆訪視紀錄")
         
         # 篩選該個案的紀錄 (這裡開始都要向左縮排，確保與 if target_name and not h_df.empty: 同層級)
-        p_logs = logs[logs['關懷戶姓名'] == target_name]
+        # 含已封存的年度 (見 shared.archive)，封存後仍看得到去年以前的訪視
+        history = pd.concat([archived_frame("care_logs"), logs], ignore_index=True)
+        p_logs = history[history['關懷戶姓名'] == target_name]
         
         if p_logs.empty: 
             st.info("💡 該個案尚無任何訪視或物資領取紀錄。")
@@ -1963,7 +1847,7 @@ elif st.session_state.page == 'stats':
             # 依日期排序並取前 5 筆
             p_logs = p_logs.sort_values("發放日期", ascending=False).head(5)
             
-            for idx, row in p_logs.iterrows():
+            def visit_card(row):
                 # --- 卡片樣式設定 ---
                 is_pure_visit = (row['物資內容'] == "(僅訪視)")
                 border_color = "#9E9E9E" if is_pure_visit else "#8E9775"
@@ -1980,7 +1864,7 @@ elif st.session_state.page == 'stats':
                 note_text = row['訪視紀錄'] if row['訪視紀錄'] and row['訪視紀錄'].strip() != "" else "(本次無詳細文字紀錄)"
 
                 # --- 渲染 HTML 卡片 ---
-                st.markdown(f"""
+                return f"""
                 <div style="
                     background-color: white;
                     border-radius: 12px;
@@ -2003,7 +1887,8 @@ elif st.session_state.page == 'stats':
                         {note_text}
                     </div>
                 </div>
-                """, unsafe_allow_html=True)
+                """
+            render_cards(p_logs, visit_card, key="visit_history", reset_on=target_name)
 
     # --- Tab 2: 跨問卷交叉篩選 (完全改寫) ---
     with tab2:
@@ -2016,11 +1901,9 @@ elif st.session_state.page == 'stats':
             # 1. 資料合併：將 健康問卷(h_df) 與 名冊(mems) 接在一起
             full_data = h_df.copy()
             if not mems.empty:
-                # 只取名冊的關鍵欄位
-                mems_mini = mems[['姓名', '電話', '地址', '身分別', '生日']]
+                # 只取名冊的關鍵欄位，「數值年齡」直接用型別欄位的 age 方便篩選
+                mems_mini = typed_mems[['姓名', '電話', '地址', '身分別', 'age']].rename(columns={'age': '數值年齡'})
                 full_data = full_data.merge(mems_mini, on='姓名', how='left')
-                # 增加「數值年齡」欄位方便篩選
-                full_data['數值年齡'] = full_data['生日'].apply(calculate_age) 
 
             # 2. 準備篩選欄位：問卷題項 + 年齡 + 身分別
             filter_cols = [c for c in COLS_HEALTH if c not in ['姓名', '身分證字號', '評估日期']] + ['數值年齡', '身分別']
@@ -2079,10 +1962,8 @@ elif st.session_state.page == 'stats':
 
     # --- Tab 3: 物資統計 (原有的) ---
     with tab3:
-        inv = load_data("care_inventory", COLS_INV)
+        inv = load_typed("care_inventory", COLS_INV)
         if not inv.empty:
-            inv['qty'] = pd.to_numeric(inv['總數量'], errors='coerce').fillna(0)
-            
             c1, c2 = st.columns(2)
             with c1:
                 st.markdown("#### 🏆 愛心捐贈芳名錄")
@@ -2094,6 +1975,11 @@ elif st.session_state.page == 'stats':
                 fig_sun = px.sunburst(inv, path=['物資類型', '物資內容'], values='qty', color='物資類型', color_discrete_sequence=px.colors.qualitative.Set3)
                 st.plotly_chart(fig_sun, use_container_width=True)
             
-            st.dataframe(inv, use_container_width=True)
+            st.dataframe(inv.drop(columns=['dt']), use_container_width=True)
         else:
             st.info("目前尚無庫存資料")
+
+with st.sidebar:
+    render_data_age("care_members", "care_inventory", "care_logs", "care_health")
+    render_archive_status()
+profiling.render_panel()
@@ -0,0 +1,3 @@
+"""
+福德里社區管理系統 - 各子系統 (首頁 / 志工 / 長輩 / 關懷戶) 共用的模組
+"""
@@ -0,0 +1,284 @@
+"""
+紀錄表年度封存 (rollover)
+
+logs / elderly_logs / care_logs 只會越來越長，但大部分畫面只看今年。每年年初執行一次：
+    python -m shared.archive                # 封存今年以前的所有年度
+    python -m shared.archive --before 2025 --sheets logs --dry-run
+
+每個已結束的年度：
+1. 把該年度的列搬到 <分頁名稱>_<年度> 分頁
+   (設定 archive_sheet_id 可放到另一份試算表，避免主試算表碰到 1000 萬格上限)
+2. 計算該年度的統計 (志工每人秒數、物資發放數量…) 寫入 log_rollups 分頁
+3. 從原分頁刪除這些列 (一次 batch_update)
+任一步失敗都可以直接重跑：已搬過的列不會重複寫入，統計會整年覆寫。
+
+封存會刪掉原分頁前面的列，正在執行的 app 快取裡仍是封存前的列與列數：
+增量讀取、追加、差異寫入都會發現列位置對不上，改為完整重讀或拒絕寫入 (SheetChangedError)，
+但在下一次重讀之前畫面仍是舊資料。請在人少的時段執行，完成後重新啟動 app：
+重新啟動後每張分頁第一次都完整重讀 (本機快照只用來先回應畫面)。
+
+平常的讀取只掃原分頁 (今年)；需要舊年度時用 archived_totals 取統計，或用 load_range 讀取封存分頁。
+"""
+import argparse
+import collections
+import sys
+import threading
+import time
+from datetime import datetime
+
+import gspread
+import pandas as pd
+import streamlit as st
+
+from shared import config
+from shared.ingest import add_types
+from shared.schema import ARCHIVE_DATE_COLS, ROLLUP_SHEET, ROLLUP_COLS, SHEET_COLUMNS
+from shared.sessions import pair_sessions, coverage_seconds
+from shared.sheets import (CACHE_TTL, SheetRepository, clean_frame, get_client, get_repository,
+                           load_typed)
+
+PERSON_COL = '身分證字號'
+APPEND_CHUNK = 5000  # 每次 append_rows 的列數
+# log_rollups 分頁不存在 (還沒封存過) 時多久再查一次；封存一年一次，完成後會重新啟動 app
+MISSING_RETRY = 3600  # 秒
+
+
+def archive_name(sheet_name, year):
+    return f"{sheet_name}_{year}"
+
+
+def row_years(df, sheet_name):
+    """每列的年度 (日期欄位開頭的 4 位數字，2024-01-02 與 2024/1/2 都可)；無法判斷為 NaN"""
+    col = ARCHIVE_DATE_COLS[sheet_name]
+    if df.empty or col not in df.columns:
+        return pd.Series(float("nan"), index=df.index)
+    return pd.to_numeric(df[col].astype(str).str.extract(r"^\s*(\d{4})", expand=False), errors="coerce")
+
+
+def _num(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def _trim(row):
+    """去掉尾端空白格 (讀回的列與要寫入的列用同樣方式比對)"""
+    row = tuple(str(v) for v in row)
+    end = len(row)
+    while end and row[end - 1] == "": end -= 1
+    return row[:end]
+
+
+def compute_rollups(sheet_name, rows, year):
+    """某分頁某年度的統計，回傳 ROLLUP_COLS 格式的 DataFrame"""
+    items = []
+    if sheet_name == "logs":
+        sessions = pair_sessions(rows, person_col=PERSON_COL)
+        per_person = coverage_seconds(sessions, by=[PERSON_COL, '日期']).groupby(level=0).sum()
+        items += [("志工秒數", pid, sec) for pid, sec in per_person.items()]
+        items.append(("團隊秒數", "", coverage_seconds(pair_sessions(rows))))
+        items.append(("打卡筆數", "", len(rows)))
+    elif sheet_name == "elderly_logs":
+        items.append(("人次", "", len(rows)))
+    elif sheet_name == "care_logs":
+        qty = pd.to_numeric(rows['發放數量'], errors='coerce').fillna(0)
+        items += [("發放數量", item, total) for item, total in qty.groupby(rows['物資內容']).sum().items()]
+    return pd.DataFrame([[sheet_name, str(year), item, str(key), _num(value)] for item, key, value in items],
+                        columns=ROLLUP_COLS)
+
+
+def _ensure_worksheet(book, title, header):
+    """取得分頁，不存在就建立；沒有標題列就寫入 header"""
+    try:
+        ws = book.worksheet(title)
+    except gspread.WorksheetNotFound:
+        ws = book.add_worksheet(title, rows=1000, cols=len(header))
+    if not ws.get("1:1"):
+        ws.update(values=[header], range_name="A1")
+    return ws
+
+
+class Archive:
+    """
+    repo: 主試算表的 SheetRepository；archive_id: 放封存分頁的試算表 (預設同一份)
+    封存分頁內容不會再變，讀過一次就一直留在記憶體 (rollover 後清掉)。
+    """
+
+    def __init__(self, repo, client_factory, archive_id=None):
+        self.repo = repo
+        self._client_factory = client_factory
+        self.archive_id = archive_id or repo.sheet_id
+        self._lock = threading.Lock()
+        self._book = None
+        self._partitions = {}
+        self._missing_until = 0.0
+        self.read_error = None  # 上次讀取 log_rollups 失敗的原因 (分頁不存在不算)；頁面用 render_archive_status 顯示
+
+    def book(self):
+        if self.archive_id == self.repo.sheet_id:
+            return self.repo.spreadsheet()
+        if self._book is None:
+            self._book = self._client_factory().open_by_key(self.archive_id)
+        return self._book
+
+    # --- 讀取 ---
+    def rollups(self):
+        """
+        log_rollups 的內容；還沒封存過 (分頁不存在) 或讀取失敗 (例如配額用完) 時回傳空表，
+        並暫時不再詢問。讀取失敗的原因記在 read_error：統計先不含已封存的年度，不讓整頁出錯。
+        """
+        if time.time() >= self._missing_until:
+            try:
+                df = self.repo.frame(ROLLUP_SHEET)
+                self.read_error = None
+                return df
+            except gspread.WorksheetNotFound:
+                self.read_error = None
+                self._missing_until = time.time() + MISSING_RETRY
+            except Exception as e:
+                self.read_error = e
+                self._missing_until = time.time() + CACHE_TTL
+        return pd.DataFrame(columns=ROLLUP_COLS)
+
+    def years(self, sheet_name):
+        r = self.rollups()
+        if r.empty or '分頁' not in r.columns:
+            return []
+        return sorted(int(y) for y in r.loc[r['分頁'] == sheet_name, '年度'].unique() if str(y).isdigit())
+
+    def partition(self, sheet_name, year):
+        """某年度封存分頁的內容 (附加型別欄位，唯讀)"""
+        key = (sheet_name, year)
+        with self._lock:
+            if key in self._partitions:
+                return self._partitions[key]
+        data = self.book().worksheet(archive_name(sheet_name, year)).get_all_values()
+        df = pd.DataFrame(data[1:], columns=data[0]) if data else pd.DataFrame(columns=SHEET_COLUMNS.get(sheet_name, []))
+        df = add_types(sheet_name, df)
+        with self._lock:
+            self._partitions[key] = df
+        return df
+
+    # --- 封存 ---
+    def _write_partition(self, sheet_name, year, rows):
+        """把 rows 寫入封存分頁；已在封存分頁裡的列 (上次執行到一半) 不重複寫入"""
+        ws = _ensure_worksheet(self.book(), archive_name(sheet_name, year), list(rows.columns))
+        existing = collections.Counter(_trim(r) for r in ws.get_all_values()[1:])
+        values = []
+        for r in rows.to_numpy(dtype=object).tolist():
+            key = _trim(r)
+            if existing[key] > 0:
+                existing[key] -= 1
+                continue
+            values.append([str(v) for v in r])
+        for i in range(0, len(values), APPEND_CHUNK):
+            ws.append_rows(values[i:i + APPEND_CHUNK], value_input_option="RAW")
+        return len(values)
+
+    def _write_rollups(self, new):
+        """覆寫 new 中各 (分頁, 年度) 的統計"""
+        _ensure_worksheet(self.repo.spreadsheet(), ROLLUP_SHEET, ROLLUP_COLS)
+        base = self.repo.reload(ROLLUP_SHEET)
+        if base.empty:
+            base = pd.DataFrame(columns=ROLLUP_COLS)
+        done = set(zip(new['分頁'], new['年度']))
+        kept = base[[(s, y) not in done for s, y in zip(base['分頁'], base['年度'])]]
+        new = new.set_axis(pd.RangeIndex(len(base), len(base) + len(new)))
+        self.repo.save_frame(ROLLUP_SHEET, clean_frame(pd.concat([kept, new])), base=base)
+        self._missing_until = 0.0
+        self.read_error = None
+
+    def rollover(self, sheet_name, before_year, dry_run=False, log=print):
+        """封存 sheet_name 中 before_year 以前的年度，回傳 {年度: 列數}"""
+        base = self.repo.reload(sheet_name)
+        years = row_years(base, sheet_name)
+        closed = sorted(int(y) for y in years.dropna().unique() if y < before_year)
+        moved = {}
+        rollups = []
+        for year in closed:
+            rows = base[years == year]
+            moved[year] = len(rows)
+            if dry_run:
+                log(f"  {sheet_name} {year}: {len(rows):,} 列 (dry run)")
+                continue
+            written = self._write_partition(sheet_name, year, rows)
+            rollups.append(compute_rollups(sheet_name, rows, year))
+            log(f"  {sheet_name} {year}: {len(rows):,} 列 -> {archive_name(sheet_name, year)} (新寫入 {written:,})")
+        if dry_run or not closed:
+            return moved
+        self._write_rollups(pd.concat(rollups, ignore_index=True))
+        # 以 reload 當下的內容為準 (期間別人追加的新列在後面，不受影響)
+        self.repo.save_frame(sheet_name, base[~years.isin(closed)], base=base)
+        with self._lock:
+            self._partitions = {k: v for k, v in self._partitions.items() if k[0] != sheet_name}
+        return moved
+
+
+@st.cache_resource
+def get_archive():
+    return Archive(get_repository(), get_client, config.get("archive_sheet_id"))
+
+
+def render_archive_status():
+    """已封存年度的統計讀取失敗時提醒 (放在使用舊年度資料的頁面側邊欄)"""
+    error = get_archive().read_error
+    if error is not None:
+        st.warning(f"⚠️ 目前無法讀取已封存年度的統計，統計數字暫不包含舊年度：{error}")
+
+
+def archived_totals(sheet_name, item, year=None):
+    """已封存年度的統計，依 鍵 加總 (year 指定時只取該年)；例如每位志工的歷年秒數"""
+    r = get_archive().rollups()
+    if r.empty:
+        return pd.Series(dtype=float)
+    mask = (r['分頁'] == sheet_name) & (r['項目'] == item)
+    if year is not None:
+        mask &= r['年度'] == str(year)
+    sel = r[mask]
+    return pd.to_numeric(sel['數值'], errors='coerce').fillna(0).groupby(sel['鍵']).sum()
+
+
+def archived_frame(sheet_name, date_from=None, date_to=None):
+    """
+    已封存年度的紀錄 (附加型別欄位，唯讀)；可只取 date_from ~ date_to 涵蓋的年度。
+    沒有封存過時回傳 None
+    """
+    archive = get_archive()
+    parts = [archive.partition(sheet_name, y) for y in archive.years(sheet_name)
+             if (date_from is None or date_from.year <= y) and (date_to is None or y <= date_to.year)]
+    return pd.concat(parts, ignore_index=True) if parts else None
+
+
+def load_range(sheet_name, date_from, date_to, target_cols=None):
+    """
+    同 load_typed，但日期區間涵蓋已封存的年度時，一併讀入那些年度的封存分頁
+    (只供顯示/統計，不要拿去 save_data)
+    """
+    df = load_typed(sheet_name, target_cols)
+    archived = archived_frame(sheet_name, date_from, date_to)
+    if archived is None:
+        return df
+    return pd.concat([archived, df], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="紀錄表年度封存")
+    parser.add_argument("--before", type=int, default=datetime.now().year, help="封存此年度以前的資料 (預設今年)")
+    parser.add_argument("--sheets", nargs="+", choices=list(ARCHIVE_DATE_COLS), default=list(ARCHIVE_DATE_COLS))
+    parser.add_argument("--dry-run", action="store_true", help="只列出會搬移的列數")
+    args = parser.parse_args(argv)
+
+    # 腳本執行：不開背景更新、不寫本機快照
+    repo = SheetRepository(get_client, background=False)
+    archive = Archive(repo, get_client, config.get("archive_sheet_id"))
+    for name in args.sheets:
+        print(f"[{name}]")
+        moved = archive.rollover(name, args.before, dry_run=args.dry_run)
+        if not moved:
+            print("  沒有需要封存的年度")
+    if not args.dry_run:
+        print("完成。請重新啟動 app，讓快取改用封存後的資料。")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
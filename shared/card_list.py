@@ -0,0 +1,67 @@
+"""
+卡片清單 (分頁 + 一次送出)
+
+報表的人員明細、執勤紀錄、庫存、訪視紀錄原本每張卡片各呼叫一次 st.markdown，
+紀錄一多 (資深志工上千筆打卡) 每次 rerun 就要送上千個元素到瀏覽器。
+render_cards 只格式化目前這一頁的卡片，整頁組成一段 HTML 用一次 st.markdown 送出：
+- 每頁筆數固定，伺服器與瀏覽器的成本不隨資料量增加
+- columns > 1 時用 CSS grid 排成多欄 (取代 st.columns 巢狀排版)
+- scroll_height: 固定高度的捲動區，畫面外的卡片由瀏覽器略過繪製 (content-visibility)
+"""
+import math
+
+import pandas as pd
+import streamlit as st
+
+PER_PAGE = 30
+
+
+def _compact(html):
+    """去掉縮排與空行：markdown 會把縮排 4 格的行當成程式碼、空行會中斷 HTML 區塊"""
+    return " ".join(line.strip() for line in html.splitlines() if line.strip())
+
+
+def _page_state(key, n_pages, reset_on):
+    page_key, sig_key = f"{key}_page", f"{key}_sig"
+    if st.session_state.get(sig_key) != reset_on:
+        st.session_state[sig_key] = reset_on
+        st.session_state[page_key] = 0
+    page = min(max(st.session_state.get(page_key, 0), 0), n_pages - 1)
+    st.session_state[page_key] = page
+    return page_key, page
+
+
+def _move(page_key, step):
+    st.session_state[page_key] += step
+
+
+def render_cards(items, render, key, per_page=PER_PAGE, columns=1, scroll_height=None, reset_on=None):
+    """
+    items: DataFrame 或 list；render(row) -> 一張卡片的 HTML (row 為 dict，可用 row['欄位'])
+    key: 分頁狀態的 session_state 前綴 (同一頁多個清單要不同)
+    reset_on: 這個值改變時回到第一頁 (例如目前選的志工)
+    """
+    total = len(items)
+    if not total:
+        return
+    n_pages = math.ceil(total / per_page)
+    page_key, page = _page_state(key, n_pages, reset_on)
+    start = page * per_page
+    chunk = items.iloc[start:start + per_page].to_dict("records") if isinstance(items, pd.DataFrame) \
+        else list(items[start:start + per_page])
+
+    card_style = "content-visibility:auto; contain-intrinsic-size:auto 120px;" if scroll_height else ""
+    cards = "".join(f'<div style="min-width:0; {card_style}">{_compact(render(row))}</div>' for row in chunk)
+    grid = f"display:grid; grid-template-columns:repeat({columns}, minmax(0, 1fr)); column-gap:16px;"
+    scroll = f"max-height:{scroll_height}px; overflow-y:auto; padding-right:6px;" if scroll_height else ""
+    st.markdown(f'<div style="{grid} {scroll}">{cards}</div>', unsafe_allow_html=True)
+
+    if n_pages > 1:
+        c_prev, c_info, c_next = st.columns([1, 2, 1])
+        c_prev.button("◀ 上一頁", key=f"{key}_prev", disabled=page == 0, on_click=_move, args=(page_key, -1),
+                      use_container_width=True)
+        c_info.markdown(f"<div style='text-align:center; color:#888; padding-top:8px;'>第 {page + 1} / {n_pages} 頁"
+                        f" (共 {total} 筆，第 {start + 1}–{min(start + per_page, total)} 筆)</div>",
+                        unsafe_allow_html=True)
+        c_next.button("下一頁 ▶", key=f"{key}_next", disabled=page >= n_pages - 1, on_click=_move,
+                      args=(page_key, 1), use_container_width=True)
@@ -0,0 +1,114 @@
+"""
+關懷戶系統的計算邏輯 (庫存、拒收判讀、智慧發放建議)，頁面與 benchmarks 共用
+"""
+import pandas as pd
+
+# ==========================================
+# 🧠 智慧判讀字典：定義「類別」包含哪些「關鍵字」
+# ==========================================
+SMART_RULES = {
+    "海鮮": ["魚", "蝦", "蟹", "貝", "蛤", "魷", "透抽", "鯖", "鮪", "海苔", "XO醬"],
+    "甲殼": ["蝦", "蟹", "龍蝦"],
+    "牛肉": ["牛"],
+    "豬肉": ["豬", "培根", "火腿", "香腸"],
+    "堅果": ["花生", "杏仁", "核桃", "腰果", "芝麻"],
+}
+
+
+def check_conflict(refuse_str, item_name):
+    """
+    智慧比對函數：
+    1. refuse_str: 關懷戶拒絕的項目 (如 "海鮮, 辣")
+    2. item_name: 物資名稱 (如 "紅燒鯖魚罐頭")
+    回傳: (是否衝突, 衝突的原因關鍵字)
+    """
+    if not refuse_str: return False, None
+
+    # 1. 整理拒絕清單
+    refuse_list = [k.strip() for k in refuse_str.split(',') if k.strip()]
+
+    for r_key in refuse_list:
+        # A. 直接比對 (例如拒絕 "鯖魚"，物資是 "鯖魚罐頭" -> 中)
+        if r_key in item_name:
+            return True, r_key
+
+        # B. 查字典比對 (例如拒絕 "海鮮"，系統去查海鮮包含什麼)
+        if r_key in SMART_RULES:
+            related_words = SMART_RULES[r_key]
+            for word in related_words:
+                if word in item_name:
+                    return True, f"{r_key}(含{word})"
+
+    return False, None
+
+
+def _qty(df, col):
+    """數量欄位轉 float (空白為 0)；已由 load_typed 轉好 qty 欄位時直接使用"""
+    if 'qty' in df.columns:
+        return df['qty']
+    return pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+
+def compute_stock(inv, logs, archived_out=None):
+    """
+    每個 (物資內容, 捐贈者) 的入庫與已發放數量
+    archived_out: 已封存年度的發放數量 (以物資內容為 index，見 shared.archive)，算進已發放
+    回傳 [{name, donor, type, composite, total_in, total_out}]，composite 即發放紀錄上的「物資 (捐贈者)」
+    """
+    stock = []
+    if inv.empty: return stock
+    for (item_name, donor_name), group in inv.groupby(['物資內容', '捐贈者']):
+        total_in = _qty(group, '總數量').sum()
+        composite_name = f"{item_name} ({donor_name})"
+        total_out = _qty(logs[logs['物資內容'] == composite_name], '發放數量').sum() if not logs.empty else 0
+        if archived_out is not None: total_out += archived_out.get(composite_name, 0)
+        stock.append({
+            "name": item_name, "donor": donor_name, "type": group.iloc[0]['物資類型'],
+            "composite": composite_name, "total_in": total_in, "total_out": total_out,
+        })
+    return stock
+
+
+def received_totals(logs):
+    """每位關懷戶各物資的累計領取數量，index 為 (關懷戶姓名, 物資內容)"""
+    if logs is None or logs.empty:
+        return pd.Series(dtype=float)
+    return _qty(logs, '發放數量').groupby([logs['關懷戶姓名'], logs['物資內容']]).sum()
+
+
+def suggest_recipients(mems, logs, suggest_item, archived_received=None):
+    """
+    智慧發放建議：排除拒收 / 已領過此物資的個案，其餘計算「弱勢積分」
+    archived_received: 已封存年度的 received_totals (見 shared.archive)，一併算進「已領過」
+    回傳 [{姓名, 身分別, 弱勢積分}] (未排序)
+    """
+    received = received_totals(logs)
+    if archived_received is not None and not archived_received.empty:
+        received = received.add(archived_received, fill_value=0)
+    suggestion_list = []
+    for index, row in mems.iterrows():
+        p_name = row['姓名']
+        p_tags = str(row['身分別'])
+        p_refuse = str(row.get('拒絕物資', '')) # 取得該人的拒絕清單
+
+        # 1. 檢查是否拒收 (呼叫我們寫好的字典判讀)
+        is_conflict, _ = check_conflict(p_refuse, suggest_item)
+        if is_conflict: continue # 如果拒收，直接跳過這個人
+
+        # 2. 檢查是否領過 (含已封存的年度)
+        has_received = received.get((p_name, suggest_item), 0) > 0
+
+        if not has_received:
+            # 3. 計算弱勢積分
+            score = 0
+            if "獨居" in p_tags: score += 3
+            if "低收" in p_tags: score += 3
+            if "中低收" in p_tags: score += 2
+            if "身障" in p_tags: score += 2
+            if "老人" in p_tags or "65歲以上" in str(row): score += 1
+            try:
+                if int(row.get('18歲以下子女', 0)) > 2: score += 2
+            except: pass
+
+            suggestion_list.append({"姓名": p_name, "身分別": p_tags, "弱勢積分": score})
+    return suggestion_list
@@ -0,0 +1,23 @@
+"""
+系統設定值：環境變數 FUDE_<KEY> 優先，其次 .streamlit/secrets.toml 的 key
+(例如 sheets_backend、fake_latency、profiling)
+"""
+import os
+
+import streamlit as st
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def get(key, default=None):
+    value = os.environ.get(f"FUDE_{key.upper()}")
+    if value is not None:
+        return value
+    try:
+        return st.secrets.get(key, default)
+    except Exception:  # 沒有 secrets.toml
+        return default
+
+
+def flag(key):
+    return str(get(key, "")).strip().lower() in TRUE_VALUES
@@ -0,0 +1,68 @@
+"""
+首頁儀表板的統計計算
+
+frames 為 {分頁名稱: DataFrame}，只需要 DASHBOARD_COLUMNS 列出的欄位
+(首頁用 SheetRepository.batch_columns 一次抓齊；benchmarks 直接餵假資料)。
+"""
+from datetime import datetime
+
+from shared.ingest import add_types
+from shared.volunteers import calculate_year_hours
+
+
+# 首頁實際用到的欄位：一次 batch get 抓齊 (已在其他頁面讀過的表直接用快取)
+DASHBOARD_COLUMNS = {
+    "members": ["生日", "祥和_加入日期", "祥和_退出日期", "據點週二_加入日期", "據點週二_退出日期",
+                "據點週三_加入日期", "據點週三_退出日期", "環保_加入日期", "環保_退出日期"],
+    "logs": ["姓名", "日期", "時間", "動作"],
+    "elderly_members": ["出生年月日"],
+    "care_members": ["姓名"],
+    "care_logs": ["發放日期", "發放數量"],
+}
+
+EMPTY_STATS = {
+    "vol_count": 0, "vol_age": 0, "vol_hours": 0,
+    "eld_count": 0, "eld_age": 0,
+    "care_count": 0, "care_items": 0
+}
+
+
+def compute_dashboard_stats(frames):
+    stats = dict(EMPTY_STATS)
+
+    # 1. 志工數據
+    df_v = add_types("members", frames["members"])
+    df_vl = frames["logs"].copy()
+    
+    if not df_v.empty:
+        # 🔥 關鍵修改：過濾掉已退役的志工 (整欄一次判斷，見 shared.ingest)
+        active_volunteers = df_v[~df_v['retired']]
+        
+        stats["vol_count"] = len(active_volunteers)
+        
+        # 計算平均年齡 (只算在職的)
+        valid_ages = active_volunteers[active_volunteers['age'] > 0]['age']
+        stats["vol_age"] = round(valid_ages.mean(), 1) if not valid_ages.empty else 0
+        
+    if not df_vl.empty:
+        stats["vol_hours"] = calculate_year_hours(df_vl)
+
+    # 2. 長輩數據
+    df_e = add_types("elderly_members", frames["elderly_members"])
+    if not df_e.empty:
+        stats["eld_count"] = len(df_e)
+        valid_ages = df_e[df_e['age'] > 0]['age']
+        stats["eld_age"] = round(valid_ages.mean(), 1) if not valid_ages.empty else 0
+
+    # 3. 關懷戶數據
+    df_c = frames["care_members"]
+    df_cl = add_types("care_logs", frames["care_logs"])
+    
+    if not df_c.empty:
+        stats["care_count"] = len(df_c)
+        
+    if not df_cl.empty:
+        cur_year = datetime.now().year
+        stats["care_items"] = int(df_cl[df_cl['dt'].dt.year == cur_year]['qty'].sum())
+
+    return stats
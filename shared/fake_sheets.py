@@ -0,0 +1,300 @@
+"""
+離線用的假 Google Sheets (in-memory)
+
+實作 app 用到的 gspread 介面子集，讓頁面與各項效能改善不需要 Google 帳號也能測試、量測：
+- client: open_by_key
+- spreadsheet: id, worksheet, worksheets, add_worksheet, batch_update (updateCells / appendCells /
+  deleteDimension), values_batch_get
+- worksheet: id, title, get_all_values, get_all_records, get, append_row, append_rows, update, clear
+
+每次 API 呼叫可加上人工延遲 (latency 秒)，模擬網路來回時間；calls 記錄各方法被呼叫的次數。
+
+啟用方式 (見 shared.sheets.get_client)：
+    環境變數 FUDE_SHEETS_BACKEND=fake (或 secrets 的 sheets_backend = "fake")
+    FUDE_FAKE_LATENCY=0.3   每次呼叫延遲秒數 (預設 0)
+    FUDE_FAKE_DATA=資料夾    啟動時載入資料夾內的 <分頁名稱>.csv
+"""
+import collections
+import csv
+import itertools
+import os
+import re
+import threading
+import time
+
+import gspread
+
+from shared.schema import SHEET_COLUMNS
+
+_A1 = re.compile(r"^\$?([A-Z]*)\$?(\d*)$")
+
+
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def _parse_range(range_name):
+    """'A5:H' / 'C:C' / 'A1' / "'logs'!A2:B3" -> (分頁名稱或 None, r0, c0, r1, c1)，0 起算、r1/c1 不含 (None 表示到底)"""
+    sheet = None
+    if "!" in range_name:
+        sheet, range_name = range_name.rsplit("!", 1)
+        sheet = sheet.strip("'")
+    start, _, end = range_name.upper().partition(":")
+    sc, sr = _A1.match(start).groups()
+    ec, er = _A1.match(end or start).groups()
+    r0 = int(sr) - 1 if sr else 0
+    c0 = _col_index(sc) - 1 if sc else 0
+    r1 = int(er) if er else None
+    c1 = _col_index(ec) if ec else None
+    return sheet, r0, c0, r1, c1
+
+
+def _text(value):
+    """寫入的值轉成 get_all_values 讀回的樣子 (數字 12.0 -> '12')"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _numericise(value):
+    if value == "":
+        return value
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _trim(rows):
+    """API 會省略每列尾端的空白格與尾端的空白列"""
+    rows = [list(r) for r in rows]
+    for r in rows:
+        while r and r[-1] == "": r.pop()
+    while rows and not rows[-1]: rows.pop()
+    return rows
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title, sheet_id, rows=None):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self._rows = [[_text(v) for v in r] for r in (rows or [])]
+
+    def _call(self, name):
+        self.spreadsheet.client._call(name)
+
+    @property
+    def row_count(self):
+        return len(self._rows)
+
+    def _width(self):
+        return max((len(r) for r in self._rows), default=0)
+
+    # --- 讀取 ---
+    def get_all_values(self):
+        self._call("get_all_values")
+        with self.spreadsheet.client.lock:
+            width = self._width()
+            return [r + [""] * (width - len(r)) for r in _trim(self._rows)]
+
+    def get_all_records(self, head=1, default_blank=""):
+        self._call("get_all_records")
+        with self.spreadsheet.client.lock:
+            rows = _trim(self._rows)
+        if len(rows) < head:
+            return []
+        keys = rows[head - 1]
+        records = []
+        for r in rows[head:]:
+            r = r + [""] * (len(keys) - len(r))
+            records.append({k: (_numericise(v) if v != "" else default_blank) for k, v in zip(keys, r)})
+        return records
+
+    def _get(self, r0, c0, r1, c1):
+        return _trim(r[c0:c1] for r in self._rows[r0:r1])
+
+    def get(self, range_name):
+        self._call("get")
+        _, r0, c0, r1, c1 = _parse_range(range_name)
+        with self.spreadsheet.client.lock:
+            return self._get(r0, c0, r1, c1)
+
+    # --- 寫入 ---
+    def _append(self, values_list):
+        with self.spreadsheet.client.lock:
+            start = len(_trim(self._rows)) + 1
+            del self._rows[start - 1:]
+            rows = [[_text(v) for v in r] for r in values_list]
+            self._rows.extend(rows)
+        width = max((len(r) for r in rows), default=1)
+        end_col = gspread.utils.rowcol_to_a1(1, width).rstrip("0123456789")
+        return {
+            "spreadsheetId": self.spreadsheet.id,
+            "updates": {
+                "updatedRange": f"'{self.title}'!A{start}:{end_col}{start + len(rows) - 1}",
+                "updatedRows": len(rows),
+                "updatedData": {"values": rows},
+            },
+        }
+
+    def append_row(self, values, value_input_option="RAW", insert_data_option=None,
+                   table_range=None, include_values_in_response=False):
+        self._call("append_row")
+        return self._append([values])
+
+    def append_rows(self, values, value_input_option="RAW", insert_data_option=None,
+                    table_range=None, include_values_in_response=False):
+        self._call("append_rows")
+        return self._append(values)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._call("update")
+        _, r0, c0, _, _ = _parse_range(range_name or "A1")
+        with self.spreadsheet.client.lock:
+            for i, row in enumerate(values or []):
+                self._set_row(r0 + i, c0, [_text(v) for v in row])
+        return {"updatedRows": len(values or [])}
+
+    def clear(self):
+        self._call("clear")
+        with self.spreadsheet.client.lock:
+            self._rows = []
+
+    def _set_row(self, r, c0, values):
+        while len(self._rows) <= r:
+            self._rows.append([])
+        row = self._rows[r]
+        if len(row) < c0 + len(values):
+            row.extend([""] * (c0 + len(values) - len(row)))
+        row[c0:c0 + len(values)] = values
+
+
+def _cell_text(cell):
+    value = cell.get("userEnteredValue", {})
+    for key in ("stringValue", "numberValue", "boolValue", "formulaValue"):
+        if key in value:
+            return _text(value[key])
+    return ""
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self._sheets = {}
+        self._ids = itertools.count(1)
+
+    def add_worksheet(self, title, rows=None, cols=None, values=None):
+        with self.client.lock:
+            ws = FakeWorksheet(self, title, next(self._ids), values)
+            self._sheets[title] = ws
+            return ws
+
+    def worksheets(self):
+        return list(self._sheets.values())
+
+    def worksheet(self, title):
+        self.client._call("worksheet")
+        ws = self._sheets.get(title)
+        if ws is None:
+            if not self.client.auto_create:
+                raise gspread.WorksheetNotFound(title)
+            ws = self.add_worksheet(title, values=[SHEET_COLUMNS[title]] if title in SHEET_COLUMNS else [])
+        return ws
+
+    def _by_id(self, sheet_id):
+        for ws in self._sheets.values():
+            if ws.id == sheet_id:
+                return ws
+        raise gspread.exceptions.APIError(f"No grid with id: {sheet_id}")
+
+    def batch_update(self, body):
+        self.client._call("batch_update")
+        with self.client.lock:
+            for req in body.get("requests", []):
+                if "updateCells" in req:
+                    rng = req["updateCells"]["range"]
+                    ws = self._by_id(rng["sheetId"])
+                    for i, row in enumerate(req["updateCells"]["rows"]):
+                        ws._set_row(rng["startRowIndex"] + i, rng["startColumnIndex"],
+                                    [_cell_text(c) for c in row["values"]])
+                elif "appendCells" in req:
+                    ws = self._by_id(req["appendCells"]["sheetId"])
+                    start = len(_trim(ws._rows))
+                    del ws._rows[start:]
+                    ws._rows.extend([_cell_text(c) for c in row["values"]] for row in req["appendCells"]["rows"])
+                elif "deleteDimension" in req:
+                    rng = req["deleteDimension"]["range"]
+                    ws = self._by_id(rng["sheetId"])
+                    if rng["dimension"] == "ROWS":
+                        del ws._rows[rng["startIndex"]:rng["endIndex"]]
+                    else:
+                        for r in ws._rows: del r[rng["startIndex"]:rng["endIndex"]]
+                else:
+                    raise NotImplementedError(f"fake batch_update 不支援: {list(req)}")
+        return {"spreadsheetId": self.id, "replies": [{} for _ in body.get("requests", [])]}
+
+    def values_batch_get(self, ranges, params=None):
+        self.client._call("values_batch_get")
+        columns = (params or {}).get("majorDimension") == "COLUMNS"
+        value_ranges = []
+        with self.client.lock:
+            for rng in ranges:
+                sheet, r0, c0, r1, c1 = _parse_range(rng)
+                rows = self._sheets[sheet]._get(r0, c0, r1, c1) if sheet in self._sheets else []
+                if columns:
+                    width = max((len(r) for r in rows), default=0)
+                    rows = _trim(zip(*[r + [""] * (width - len(r)) for r in rows]))
+                value_ranges.append({"range": rng, "majorDimension": "COLUMNS" if columns else "ROWS",
+                                     "values": rows})
+        return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+
+class FakeClient:
+    """
+    latency: 每次 API 呼叫的人工延遲 (秒)
+    auto_create: 開啟不存在的分頁時自動建立 (有 SHEET_COLUMNS 定義的帶入標題列)
+    """
+
+    def __init__(self, latency=0.0, auto_create=True):
+        self.latency = latency
+        self.auto_create = auto_create
+        self.lock = threading.RLock()
+        self.calls = collections.Counter()
+        self._spreadsheets = {}
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def open_by_key(self, key):
+        self._call("open_by_key")
+        with self.lock:
+            if key not in self._spreadsheets:
+                self._spreadsheets[key] = FakeSpreadsheet(self, key)
+            return self._spreadsheets[key]
+
+    def load(self, key, sheets):
+        """sheets: {分頁名稱: [[標題...], [值...], ...]}，直接放進指定的 spreadsheet (不計延遲)"""
+        with self.lock:
+            ss = self._spreadsheets.setdefault(key, FakeSpreadsheet(self, key))
+            for title, rows in sheets.items():
+                ss.add_worksheet(title, values=rows)
+            return ss
+
+    def load_csv_dir(self, key, folder):
+        sheets = {}
+        for fn in sorted(os.listdir(folder)):
+            if fn.endswith(".csv"):
+                with open(os.path.join(folder, fn), encoding="utf-8-sig", newline="") as f:
+                    sheets[fn[:-4]] = list(csv.reader(f))
+        return self.load(key, sheets)
@@ -0,0 +1,109 @@
+"""
+型別轉換 (typed ingest)
+
+試算表讀回來都是字串；各頁原本每次 rerun 都重新 to_datetime / to_numeric 同樣的欄位。
+這裡依 schema.SHEET_TYPES，在每次快取更新時轉一次，附加成 dt、qty 等型別欄位
+(由 SheetRepository.typed 呼叫，紀錄表只多了新列時只轉換新列)。
+志工名冊的退隊狀態 (retired) 與各組別在職 (<組別>_在職) 也在這裡整欄一次算好，不必逐列判斷。
+年齡 (age) 隨日期改變：SheetRepository 每天只重算一次 (refresh_ages)，資料沒變時整天共用同一份。
+"""
+from datetime import date
+
+import pandas as pd
+
+from shared.schema import SHEET_TYPES
+
+
+def _source(df, cols):
+    s = df[cols[0]].astype(str)
+    for c in cols[1:]:
+        s = s + " " + df[c].astype(str)
+    return s
+
+
+def _filled(df, col):
+    """欄位有填寫 (缺少的欄位視為空白)"""
+    if col not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df[col].astype(str).str.strip() != ""
+
+
+def _active(df, sources):
+    """sources: (加入日期, 退出日期)；有加入、沒退出"""
+    join_col, exit_col = sources
+    return _filled(df, join_col) & ~_filled(df, exit_col)
+
+
+def _retired(df, sources):
+    """
+    sources: (加入日期, 退出日期) 成對的欄位
+    有任一組別「有加入、沒退出」視為在職；完全沒填加入日期也視為在職 (可能是新人)；
+    只有「所有曾加入的組別」都填了退出日期才算退隊
+    """
+    joined_any = pd.Series(False, index=df.index)
+    active = pd.Series(False, index=df.index)
+    for join_col, exit_col in zip(sources[::2], sources[1::2]):
+        joined_any |= _filled(df, join_col)
+        active |= _active(df, (join_col, exit_col))
+    return joined_any & ~active
+
+
+def ages(birth, today=None):
+    """生日 (YYYY-MM-DD 字串) -> 足歲 (int Series)；空白或格式不符為 0，與原本各頁的 calculate_age 相同"""
+    today = today or date.today()
+    b = pd.to_datetime(birth.astype(str).str.strip(), format="%Y-%m-%d", errors="coerce")
+    before_birthday = (b.dt.month > today.month) | ((b.dt.month == today.month) & (b.dt.day > today.day))
+    return (today.year - b.dt.year - before_birthday).fillna(0).astype(int)
+
+
+def _age(df, col, today):
+    if col not in df.columns:
+        return pd.Series(0, index=df.index)
+    return ages(df[col], today)
+
+
+def _convert(kind, s):
+    if kind == "datetime":
+        return pd.to_datetime(s, errors="coerce")
+    values = pd.to_numeric(s.str.strip(), errors="coerce")
+    if kind == "number":
+        return values.fillna(0.0).astype(float)
+    if kind == "float":
+        return values.astype(float)
+    if kind == "int":
+        return values.where(values % 1 == 0).astype("Int64")
+    raise ValueError(f"未知的型別: {kind}")
+
+
+def add_types(sheet_name, df, today=None):
+    """回傳附加型別欄位的新 DataFrame (來源欄位不存在的型別欄位略過)；today: 計算年齡的基準日"""
+    typed = df.copy()
+    for col, (kind, *sources) in SHEET_TYPES.get(sheet_name, {}).items():
+        if kind == "age":
+            typed[col] = _age(df, sources[0], today)
+        elif kind == "active":
+            typed[col] = _active(df, sources)
+        elif kind == "retired":
+            typed[col] = _retired(df, sources)
+        elif all(c in df.columns for c in sources):
+            typed[col] = _convert(kind, _source(df, sources))
+    return typed
+
+
+def extend_types(sheet_name, typed, df, today=None):
+    """typed 是 df 前幾列轉換過的結果 (df 只在尾端多了新列)：只轉換新列再接上"""
+    if len(typed) == len(df):
+        return typed
+    tail = add_types(sheet_name, df.iloc[len(typed):], today)
+    return pd.concat([typed, tail], ignore_index=True)
+
+
+def refresh_ages(sheet_name, typed, today=None):
+    """換日後只重算年齡欄位 (其餘型別欄位不變)；沒有年齡欄位的分頁原樣回傳"""
+    cols = {col: sources[0] for col, (kind, *sources) in SHEET_TYPES.get(sheet_name, {}).items() if kind == "age"}
+    if not cols:
+        return typed
+    typed = typed.copy()
+    for col, source in cols.items():
+        typed[col] = _age(typed, source, today)
+    return typed
@@ -0,0 +1,90 @@
+"""
+志工打卡站的記憶體索引
+
+刷卡時原本每次都清快取、重新下載 members + logs，再線性搜尋身分證字號。
+這裡改為整個 process 共用一份索引：
+- 身分證字號 -> 名冊列 (members 快取換了一份才重建；列上已有 retired 在職狀態)
+- (身分證字號, 日期) -> 當天最後一個動作 (簽到/簽退)
+
+logs 的快取在 append 成功後會直接接上新列 (write-through，見 shared.sheets)，
+索引只要處理這些新列即可，所以一次刷卡只需要一次寫入。
+還在寫入佇列 (shared.write_queue) 中、尚未送到試算表的打卡也會納入判斷。
+"""
+import threading
+
+import pandas as pd
+import streamlit as st
+
+from shared.schema import VOL_MEM_COLS
+from shared.sheets import get_repository
+from shared.write_queue import pending_frame
+
+
+class KioskIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._members = pd.DataFrame(columns=VOL_MEM_COLS)
+        self._member_pos = {}
+        self._last_action = {}
+        self._logs_lineage = None
+        self._logs_rows = 0
+
+    def _index_members(self, members):
+        # 同一身分證字號出現多次時以第一筆為準 (與原本 person.iloc[0] 相同)
+        pids = members['身分證字號'].astype(str) if '身分證字號' in members.columns else pd.Series(dtype=str)
+        first = pids[~pids.duplicated()]
+        self._members = members
+        self._member_pos = dict(zip(first.to_numpy(), first.index))
+
+    def _index_logs(self, logs, lineage):
+        if not {'身分證字號', '日期', '動作'} <= set(logs.columns):
+            self._last_action, self._logs_lineage, self._logs_rows = {}, lineage, len(logs)
+            return
+        if lineage == self._logs_lineage and len(logs) >= self._logs_rows:
+            new = logs.iloc[self._logs_rows:]
+        else:
+            self._last_action = {}
+            new = logs
+        # 依試算表順序，同一人同一天只留最後一筆
+        last = new[['身分證字號', '日期', '動作']].astype(str).drop_duplicates(['身分證字號', '日期'], keep='last')
+        self._last_action.update(zip(zip(last['身分證字號'], last['日期']), last['動作']))
+        self._logs_lineage, self._logs_rows = lineage, len(logs)
+
+    def refresh(self):
+        """從共用快取取 members / logs (未過期不打 API)，只處理有變動的部分"""
+        repo = get_repository()
+        members = repo.typed("members")
+        logs, l_lineage = repo.snapshot("logs")
+        with self._lock:
+            if members is not self._members:
+                self._index_members(members)
+            if l_lineage != self._logs_lineage or len(logs) != self._logs_rows:
+                self._index_logs(logs, l_lineage)
+
+    @property
+    def member_count(self):
+        return len(self._member_pos)
+
+    def member(self, pid):
+        """名冊列 (pd.Series，補齊 VOL_MEM_COLS 欄位)；查無此人回傳 None"""
+        with self._lock:
+            pos = self._member_pos.get(pid)
+            if pos is None:
+                return None
+            row = self._members.loc[pos]
+        missing = [c for c in VOL_MEM_COLS if c not in row.index]
+        return row.reindex(list(row.index) + missing, fill_value="") if missing else row
+
+    def last_action(self, pid, day):
+        """day: 'YYYY-MM-DD'；當天沒有紀錄回傳 None"""
+        queued = pending_frame("logs")
+        queued = queued[(queued['身分證字號'] == pid) & (queued['日期'] == day)]
+        if not queued.empty:
+            return queued['動作'].iloc[-1]
+        with self._lock:
+            return self._last_action.get((pid, day))
+
+
+@st.cache_resource
+def get_kiosk_index():
+    return KioskIndex()
@@ -0,0 +1,195 @@
+"""
+效能分析 (需開啟設定 profiling = true 才會記錄)
+
+每次 rerun 記錄：
+- sheets: 每次 Google Sheets 呼叫 (分頁名稱 + 動作) 的耗時
+- cache: 快取命中 / 未命中 (分頁快取、st.cache_data 的統計；stale 表示先用舊資料、背景更新中)
+- section: 頁面各區段 (例如 page:checkin) 的耗時
+
+頁面開頭呼叫 start_run()，切換區段呼叫 section()，最後 render_panel()：
+側邊欄顯示分析面板 (需管理員密碼)，並把每次 rerun 以 JSON Lines 附加到 profiling_log 檔案。
+背景執行緒 (例如寫入佇列) 的呼叫沒有所屬的 rerun，記在 background_events()。
+"""
+import collections
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from shared import config
+
+LOG_PATH_DEFAULT = ".profiling.jsonl"
+KEEP_RUNS = 50  # 面板保留最近幾次 rerun
+
+_local = threading.local()
+_background = collections.deque(maxlen=1000)
+
+
+class _Run:
+    def __init__(self, page):
+        self.page = page
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.t0 = time.perf_counter()
+        self.events = []
+        self.section = None
+        self.section_t0 = None
+        self.misses = set()
+
+    def close_section(self):
+        if self.section is not None:
+            self.events.append({"kind": "section", "name": self.section,
+                                "ms": (time.perf_counter() - self.section_t0) * 1000})
+            self.section = None
+
+
+def enabled():
+    return config.flag("profiling")
+
+
+def _current():
+    return getattr(_local, "run", None)
+
+
+def start_run(page):
+    """頁面開頭呼叫：開始記錄這次 rerun (未開啟設定時什麼都不做)"""
+    _local.run = _Run(page) if enabled() else None
+    section("setup")
+
+
+def section(name):
+    """結束目前區段並開始新的區段"""
+    run = _current()
+    if run is None:
+        return
+    run.close_section()
+    run.section, run.section_t0 = name, time.perf_counter()
+
+
+def record(kind, name, ms, **extra):
+    run = _current()
+    event = {"kind": kind, "name": name, "ms": ms, **extra}
+    if run is not None:
+        event["section"] = run.section
+        run.events.append(event)
+    elif enabled():
+        event["at"] = datetime.now().isoformat(timespec="seconds")
+        _background.append(event)
+
+
+@contextmanager
+def timed(kind, name, **extra):
+    if _current() is None and not enabled():
+        yield
+        return
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        record(kind, name, (time.perf_counter() - t0) * 1000, ok=ok, **extra)
+
+
+def sheets_call(sheet, op):
+    """包住一次 Google Sheets 呼叫：with profiling.sheets_call("logs", "append_rows"): ..."""
+    return timed("sheets", sheet, op=op)
+
+
+def cache_hit(name, stale=False):
+    record("cache", name, 0.0, hit=True, stale=stale)
+
+
+def cache_miss(name):
+    record("cache", name, 0.0, hit=False)
+
+
+def mark_miss(name):
+    """放在 st.cache_data 函式內：只有真的重算時才會執行到"""
+    run = _current()
+    if run is not None:
+        run.misses.add(name)
+
+
+@contextmanager
+def cache_lookup(name):
+    """包住呼叫 st.cache_data 函式的地方，依函式內是否呼叫 mark_miss 判斷命中與否"""
+    run = _current()
+    if run is None:
+        yield
+        return
+    run.misses.discard(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record("cache", name, (time.perf_counter() - t0) * 1000, hit=name not in run.misses)
+
+
+def background_events():
+    return list(_background)
+
+
+def _summary(run):
+    total = (time.perf_counter() - run.t0) * 1000
+    return {"page": run.page, "started_at": run.started_at, "total_ms": round(total, 1),
+            "events": [{k: (round(v, 2) if isinstance(v, float) else v) for k, v in e.items()} for e in run.events]}
+
+
+def _export(line):
+    path = config.get("profiling_log", LOG_PATH_DEFAULT)
+    if not path:
+        return
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    except OSError:
+        pass
+
+
+def render_panel():
+    """頁面最後呼叫：結算這次 rerun、寫出 JSON Lines，並在側邊欄顯示 (管理員限定)"""
+    run = _current()
+    if run is None:
+        return
+    run.close_section()
+    result = _summary(run)
+    _local.run = None
+    _export(result)
+    runs = st.session_state.setdefault("profiling_runs", [])
+    runs.append(result)
+    del runs[:-KEEP_RUNS]
+
+    with st.sidebar.expander("⏱️ 效能分析", expanded=False):
+        if not st.session_state.get("profiling_admin"):
+            pwd = st.text_input("管理員密碼", type="password", key="profiling_pwd")
+            if pwd:
+                if pwd == st.secrets["admin_password"]:
+                    st.session_state.profiling_admin = True
+                    st.rerun()
+                st.error("密碼錯誤")
+            return
+
+        events = pd.DataFrame(result["events"], columns=["kind", "name", "op", "section", "ms", "hit", "stale", "ok"])
+        sheets = events[events["kind"] == "sheets"]
+        cache = events[events["kind"] == "cache"]
+        c1, c2, c3 = st.columns(3)
+        c1.metric("本次 rerun", f"{result['total_ms']:.0f} ms")
+        c2.metric("Sheets 呼叫", f"{len(sheets)} 次", f"{sheets['ms'].sum():.0f} ms", delta_color="off")
+        c3.metric("快取命中", f"{int((cache['hit'] == True).sum())}/{len(cache)}")
+
+        st.caption("區段耗時 (含其中的 Sheets 呼叫)")
+        st.dataframe(events[events["kind"] == "section"][["name", "ms"]], hide_index=True, use_container_width=True)
+        if not sheets.empty:
+            st.caption("Sheets 呼叫")
+            st.dataframe(sheets[["section", "name", "op", "ms", "ok"]], hide_index=True, use_container_width=True)
+        if not cache.empty:
+            st.caption("快取")
+            st.dataframe(cache[["section", "name", "hit", "stale", "ms"]], hide_index=True, use_container_width=True)
+
+        lines = runs + [{"page": "(background)", "events": background_events()}]
+        st.download_button("⬇️ 匯出最近紀錄 (JSONL)", "\n".join(json.dumps(r, ensure_ascii=False) for r in lines),
+                           file_name="profiling.jsonl", mime="application/jsonl")
@@ -0,0 +1,132 @@
+"""
+Google Sheets API 配額控管
+
+Google 對每個服務帳號有「每分鐘讀取/寫入次數」上限，超過會回 429。
+多台打卡站加上管理端同時使用時，這裡統一：
+1. 讀取 / 寫入各一個 token bucket，平均分散請求，不要一口氣用完配額
+2. 429 與 5xx 依 Retry-After 或「指數退避 + 隨機抖動」自動重試；
+   寫入只重試 429 (確定沒有寫進去)，5xx 或逾時可能已經寫入，重送會多出一筆 append
+3. 請求有優先順序：打卡 (KIOSK) > 一般寫入 (WRITE) > 讀取 (READ)，
+   配額緊的時候先讓打卡寫入，首頁統計之類的讀取排後面
+
+用法：get_client() 以 http_client=QuotaHTTPClient 建立 gspread client，所有呼叫自動套用；
+需要提高優先順序的地方用 `with priority(KIOSK): ...` 包起來。
+"""
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from gspread.http_client import HTTPClient
+
+READ_PER_MINUTE = 60
+WRITE_PER_MINUTE = 60
+BURST = 10  # 可以連續送出的請求數 (之後依每分鐘配額平均補充)
+
+# 優先順序 (數字越小越優先)
+KIOSK, WRITE, READ = 0, 1, 2
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 1   # 秒
+BACKOFF_MAX = 32   # 秒
+RETRY_STATUS = {429, 500, 502, 503, 504}
+WRITE_RETRY_STATUS = {429}  # 寫入被拒絕、確定沒有套用的狀態
+
+_priority = contextvars.ContextVar("sheets_priority", default=None)
+
+
+@contextmanager
+def priority(level):
+    """這個區塊內的 Sheets 請求使用指定的優先順序"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """每秒補充 rate 個 token，最多存 capacity 個；有人排隊時依優先順序先到先拿"""
+
+    def __init__(self, per_minute, capacity=BURST):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters = []   # heap: (優先順序, 排隊序號)
+        self._seq = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, level=READ):
+        with self._cond:
+            ticket = (level, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == ticket and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        return
+                    # 等到下一個 token 補上 (或前面的人拿完) 再檢查
+                    self._cond.wait(max(0.01, (1 - self._tokens) / self.rate))
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                raise
+            finally:
+                self._cond.notify_all()
+
+
+_buckets = {"read": TokenBucket(READ_PER_MINUTE), "write": TokenBucket(WRITE_PER_MINUTE)}
+
+
+def _retry_delay(error, attempt, kind="read"):
+    """可重試的錯誤回傳等待秒數，否則回傳 None
+
+    寫入 (append 等) 不是冪等的：5xx 或連線中斷時伺服器可能已經套用，
+    所以只有 429 才重送，其餘交給呼叫端 (寫入佇列會先比對試算表再重送)。
+    """
+    if attempt >= MAX_RETRIES:
+        return None
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        if kind != "read" or not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return None
+    elif status not in (RETRY_STATUS if kind == "read" else WRITE_RETRY_STATUS):
+        return None
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if retry_after and str(retry_after).isdigit():
+        return float(retry_after)
+    # full jitter：在 0 ~ 上限之間隨機等待，避免多台同時重試又撞在一起
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class QuotaHTTPClient(HTTPClient):
+    """gspread 的 HTTP client：每個請求先拿 token，讀取遇 429/5xx、寫入遇 429 自動重試"""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        kind = "read" if method.lower() == "get" else "write"
+        level = _priority.get()
+        if level is None:
+            level = READ if kind == "read" else WRITE
+        for attempt in itertools.count():
+            _buckets[kind].acquire(level)
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except Exception as e:
+                wait = _retry_delay(e, attempt, kind)
+                if wait is None:
+                    raise
+                time.sleep(wait)
@@ -0,0 +1,198 @@
+"""
+志工報表的每日彙總 (rollup cube)
+
+數據報表頁原本每次 rerun (換日期區間、換活動、換志工) 都把區間內的打卡重新配對。
+這裡把 logs 依 (日期, 活動內容, 姓名) 彙總成每天一列：打卡筆數、服務次數、秒數、第一次簽到、最後簽退，
+另記錄每天 (以及每天每個活動) 的團隊不重疊秒數；任何日期區間的統計只要把區間內的列加總。
+
+配對方式與原本報表相同：
+- 依活動查詢 (單一活動)：先篩選活動再配對 -> 以 (姓名, 活動內容) 配對
+- 全部活動 / 依志工查詢：以 姓名 配對 (服務算在簽到那筆的活動)
+每段服務都在同一天內 (配對以日為單位)，各天的彙總互不影響：
+logs 只在尾端多了新打卡 (同一個 lineage) 時只重算新打卡所在的日期；
+封存年度 (shared.archive) 的彙總算一次後留在記憶體。
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from shared.archive import get_archive
+from shared.sessions import log_datetimes, pair_sessions, coverage_seconds
+from shared.sheets import get_repository
+
+STAT_COLS = ['筆數', '次數', '秒數', '首次簽到', '最後簽退']
+ACT_KEYS = ['日期', '活動內容', '姓名']
+PERSON_KEYS = ['日期', '姓名']
+
+
+def _empty(keys, values):
+    df = pd.DataFrame({k: pd.Series(dtype=object) for k in keys + values})
+    df['日期'] = df['日期'].astype('datetime64[ns]')
+    return df
+
+
+def _summarize(logs, day, sessions, keys):
+    """每個 keys 組合的打卡筆數 + 配對後的服務次數、秒數、第一次簽到、最後簽退"""
+    counts = pd.Series(1, index=logs.index).groupby([day] + [logs[k].astype(str) for k in keys[1:]]).size()
+    counts.index.names = keys
+    stats = sessions.groupby(keys).agg(次數=('秒數', 'size'), 秒數=('秒數', 'sum'),
+                                       首次簽到=('開始', 'min'), 最後簽退=('結束', 'max'))
+    out = counts.to_frame('筆數').join(stats, how='outer')
+    out[['筆數', '次數']] = out[['筆數', '次數']].fillna(0).astype(int)
+    out['秒數'] = out['秒數'].fillna(0.0)
+    return out.reset_index()
+
+
+class ReportCube:
+    """
+    act:       日期, 活動內容, 姓名 -> 筆數, 次數, 秒數, 首次簽到, 最後簽退 (以 姓名+活動內容 配對)
+    person:    日期, 姓名 -> 同上 (以 姓名 配對)
+    act_cover: 日期, 活動內容 -> 團隊秒數；day_cover: 日期 -> 團隊秒數 (全部活動)
+    """
+
+    def __init__(self, act, person, act_cover, day_cover):
+        self.act, self.person = act, person
+        self.act_cover, self.day_cover = act_cover, day_cover
+
+    @classmethod
+    def empty(cls):
+        return cls(_empty(ACT_KEYS, STAT_COLS), _empty(PERSON_KEYS, STAT_COLS),
+                   _empty(['日期', '活動內容'], ['團隊秒數']), _empty(['日期'], ['團隊秒數']))
+
+    @classmethod
+    def build(cls, logs):
+        """logs (需有 姓名/日期/時間/動作/活動內容，有 dt 欄位更快) -> ReportCube"""
+        dt = log_datetimes(logs)
+        logs = logs[dt.notna()]
+        if logs.empty:
+            return cls.empty()
+        day = dt[dt.notna()].dt.floor('D').astype('datetime64[ns]').rename('日期')
+        by_act = pair_sessions(logs.assign(_配對=logs['姓名'].astype(str) + "\x1f" + logs['活動內容'].astype(str)),
+                               person_col='_配對')
+        by_person = pair_sessions(logs)
+        act_cover = coverage_seconds(by_act, by=['日期', '活動內容']).rename('團隊秒數').reset_index()
+        day_cover = coverage_seconds(by_person, by='日期').rename('團隊秒數').reset_index()
+        return cls(_summarize(logs, day, by_act, ACT_KEYS), _summarize(logs, day, by_person, PERSON_KEYS),
+                   act_cover, day_cover)
+
+    def _frames(self):
+        return self.act, self.person, self.act_cover, self.day_cover
+
+    @classmethod
+    def concat(cls, cubes):
+        cubes = list(cubes)
+        if len(cubes) == 1:
+            return cubes[0]
+        return cls(*[pd.concat(parts, ignore_index=True) for parts in zip(*(c._frames() for c in cubes))])
+
+    def _select(self, keep):
+        return ReportCube(*[df[keep(df['日期'])] for df in self._frames()])
+
+    def between(self, date_from=None, date_to=None):
+        """只留 date_from ~ date_to (含頭尾) 的列"""
+        if date_from is None and date_to is None:
+            return self
+        lo = pd.Timestamp(date_from) if date_from is not None else pd.Timestamp.min
+        hi = pd.Timestamp(date_to) if date_to is not None else pd.Timestamp.max
+        return self._select(lambda d: (d >= lo) & (d <= hi))
+
+    def without_days(self, days):
+        return self._select(lambda d: ~d.isin(days))
+
+    # --- 報表查詢 ---
+    def activities(self):
+        return sorted(self.act['活動內容'].unique().tolist())
+
+    def names(self):
+        return sorted(self.person['姓名'].unique().tolist())
+
+    def activity_summary(self, activity=None):
+        """
+        activity: None 表示全部活動
+        回傳 (總人次, 團隊不重疊秒數, 各人 DataFrame[次數, 秒數]，index 為有打卡的姓名 (排序))
+        """
+        if activity is None:
+            rows, cover = self.person, self.day_cover
+        else:
+            rows = self.act[self.act['活動內容'] == activity]
+            cover = self.act_cover[self.act_cover['活動內容'] == activity]
+        per_person = rows.groupby('姓名')[['次數', '秒數']].sum().sort_index()
+        return int(rows['次數'].sum()), float(cover['團隊秒數'].sum()), per_person
+
+    def person_summary(self, name):
+        """回傳 (服務次數, 秒數)"""
+        rows = self.person[self.person['姓名'] == name]
+        return int(rows['次數'].sum()), float(rows['秒數'].sum())
+
+    def row_count(self, activity=None, name=None):
+        """區間內的原始打卡筆數 (可只算某活動/某志工)，讀取明細前先判斷是否太多"""
+        rows = self.act
+        if activity is not None: rows = rows[rows['活動內容'] == activity]
+        if name is not None: rows = rows[rows['姓名'] == name]
+        return int(rows['筆數'].sum())
+
+
+class RollupTable:
+    """logs 快取的 ReportCube，依 lineage 增量更新 (做法同 shared.volunteer_hours.HoursTable)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lineage = None
+        self._rows = 0
+        self._days = np.empty(0, dtype='datetime64[ns]')  # 已處理各列的日期 (無法解析為 NaT)
+        self._cube = ReportCube.empty()
+        self._archived = {}  # 年度 -> (封存分頁 DataFrame, ReportCube)
+
+    @staticmethod
+    def _row_days(logs):
+        return log_datetimes(logs).dt.floor('D').to_numpy(dtype='datetime64[ns]')
+
+    def refresh(self, logs, lineage):
+        """logs: 快取中的完整 logs (唯讀)；回傳目前的 ReportCube"""
+        with self._lock:
+            if lineage != self._lineage or len(logs) < self._rows:
+                self._days = self._row_days(logs)
+                self._cube = ReportCube.build(logs)
+            elif len(logs) > self._rows:
+                new_days = self._row_days(logs.iloc[self._rows:])
+                self._days = np.concatenate([self._days, new_days])
+                touched = np.unique(new_days[~np.isnat(new_days)])
+                if len(touched):
+                    # 只重算新打卡所在的日期 (通常只有今天)
+                    fresh = ReportCube.build(logs.iloc[np.nonzero(np.isin(self._days, touched))[0]])
+                    self._cube = ReportCube.concat([self._cube.without_days(touched), fresh])
+            self._lineage, self._rows = lineage, len(logs)
+            return self._cube
+
+    def archived(self, year, partition):
+        """封存年度的 ReportCube (封存分頁換了一份才重算)"""
+        with self._lock:
+            cached = self._archived.get(year)
+            if cached is not None and cached[0] is partition:
+                return cached[1]
+        cube = ReportCube.build(partition)
+        with self._lock:
+            self._archived[year] = (partition, cube)
+        return cube
+
+
+@st.cache_resource
+def get_rollup_table():
+    return RollupTable()
+
+
+def report_rollup(date_from=None, date_to=None):
+    """
+    目前 logs 的 ReportCube，只留 date_from ~ date_to；
+    區間涵蓋已封存的年度時一併納入 (與 archive.load_range 相同)
+    """
+    logs, lineage = get_repository().snapshot("logs", typed=True)
+    table = get_rollup_table()
+    cubes = [table.refresh(logs, lineage)]
+    if date_from is not None and date_to is not None:
+        archive = get_archive()
+        cubes += [table.archived(y, archive.partition("logs", y)) for y in archive.years("logs")
+                  if date_from.year <= y <= date_to.year]
+    return ReportCube.concat(cubes).between(date_from, date_to)
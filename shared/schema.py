@@ -0,0 +1,74 @@
+"""
+各分頁 (worksheet) 的固定欄位順序
+
+Append 時依照這裡的順序寫入，所以試算表上的欄位位置也與此一致；
+首頁只抓部分欄位 (batch get) 時也靠它換算欄位字母。
+SHEET_TYPES 定義載入時一次轉好的型別欄位 (見 shared.ingest)。
+"""
+
+# --- 志工系統 ---
+VOL_MEM_COLS = ["姓名", "身分證字號", "性別", "電話", "志工分類", "生日", "地址", "備註",
+                "祥和_加入日期", "祥和_退出日期", "據點週二_加入日期", "據點週二_退出日期",
+                "據點週三_加入日期", "據點週三_退出日期", "環保_加入日期", "環保_退出日期"]
+VOL_LOG_COLS = ['姓名', '身分證字號', '電話', '志工分類', '動作', '時間', '日期', '活動內容']
+# 四個組別的 (加入日期, 退出日期) 欄位
+TENURE_GROUPS = {
+    "祥和": ("祥和_加入日期", "祥和_退出日期"),
+    "據點週二": ("據點週二_加入日期", "據點週二_退出日期"),
+    "據點週三": ("據點週三_加入日期", "據點週三_退出日期"),
+    "環保": ("環保_加入日期", "環保_退出日期"),
+}
+
+# --- 長輩關懷系統 ---
+ELDER_MEM_COLS = ["姓名", "身分證字號", "性別", "出生年月日", "電話", "地址", "備註", "加入日期"]
+ELDER_LOG_COLS = ["姓名", "身分證字號", "日期", "時間", "課程分類", "課程名稱", "收縮壓", "舒張壓", "脈搏"]
+
+# --- 關懷戶系統 (健康評估 care_health 題項較多，定義在 pages/3_care.py) ---
+CARE_MEM_COLS = ["姓名", "身分證字號", "性別", "生日", "地址", "電話", "緊急聯絡人", "緊急聯絡人電話", "身分別",
+                 "18歲以下子女", "成人數量", "65歲以上長者", "拒絕物資", "人際關係"]
+CARE_INV_COLS = ["捐贈者", "物資類型", "物資內容", "總數量", "捐贈日期"]
+CARE_LOG_COLS = ["志工", "發放日期", "關懷戶姓名", "物資內容", "發放數量", "訪視紀錄"]
+
+# --- 志工 App 帳號 (點數由 App 端維護，同步時只更新其餘欄位) ---
+APP_USER_COLS = ["手機", "密碼", "姓名", "環保點數", "樂活點數", "志工時數", "志工等級"]
+
+# --- 紀錄表年度封存 (shared.archive) ---
+# 紀錄表依哪個日期欄位分年；舊年度搬到 <分頁名稱>_<年度> 分頁 (欄位與原分頁相同)
+ARCHIVE_DATE_COLS = {"logs": "日期", "elderly_logs": "日期", "care_logs": "發放日期"}
+# 已封存年度的統計：例如 (logs, 2024, 志工秒數, 身分證字號, 秒數)
+ROLLUP_SHEET = "log_rollups"
+ROLLUP_COLS = ["分頁", "年度", "項目", "鍵", "數值"]
+
+SHEET_COLUMNS = {
+    "members": VOL_MEM_COLS,
+    "logs": VOL_LOG_COLS,
+    "elderly_members": ELDER_MEM_COLS,
+    "elderly_logs": ELDER_LOG_COLS,
+    "care_members": CARE_MEM_COLS,
+    "care_inventory": CARE_INV_COLS,
+    "care_logs": CARE_LOG_COLS,
+    "App_Users": APP_USER_COLS,
+    ROLLUP_SHEET: ROLLUP_COLS,
+}
+
+# 載入時一次轉好的型別欄位 {分頁名稱: {新欄位: (型別, 來源欄位...)}}
+# 原本的字串欄位保持不變 (編輯、差異寫入都以字串比對)，型別欄位另外附加：
+#   datetime: 來源欄位以空白串接後轉 datetime64 (無法解析為 NaT)
+#   number:   轉 float，空白/無法解析為 0 (數量加總用)
+#   float:    轉 float，空白/無法解析為 NaN (量測值，不可當 0)
+#   int:      轉 Int64，空白/非整數為 <NA>
+#   active:   (加入日期, 退出日期) 一組：有加入日期、沒有退出日期 (該組別在職)
+#   retired:  (加入日期, 退出日期) 成對：曾加入任一組別，且加入過的組別都已退出 (缺少的欄位視為空白)
+#   age:      生日 (YYYY-MM-DD) 到今天的足歲，無法解析為 0 (每天重算一次，見 ingest.refresh_ages)
+SHEET_TYPES = {
+    "members": {"retired": ("retired", *[c for pair in TENURE_GROUPS.values() for c in pair]),
+                **{f"{g}_在職": ("active", *pair) for g, pair in TENURE_GROUPS.items()},
+                "age": ("age", "生日")},
+    "logs": {"dt": ("datetime", "日期", "時間")},
+    "elderly_members": {"age": ("age", "出生年月日")},
+    "elderly_logs": {"dt": ("datetime", "日期"), "sbp": ("float", "收縮壓"),
+                     "dbp": ("float", "舒張壓"), "pulse": ("float", "脈搏")},
+    "care_members": {"kids": ("int", "18歲以下子女"), "age": ("age", "生日")},
+    "care_inventory": {"qty": ("number", "總數量"), "dt": ("datetime", "捐贈日期")},
+    "care_logs": {"dt": ("datetime", "發放日期"), "qty": ("number", "發放數量")},
+}
@@ -0,0 +1,135 @@
+"""
+志工簽到/簽退配對引擎 (向量化)
+
+配對規則 (與原本三個迴圈版本一致)：
+同一人、同一天依時間排序後，一個「簽到」與其後第一個「簽退」配成一段服務；
+已簽到尚未簽退時重複的簽到忽略，沒有簽到的簽退也忽略。
+
+作法：每個「簽退」之後切一段 (segment)，每段內最早的簽到 + 段尾的簽退 = 一段服務。
+"""
+import numpy as np
+import pandas as pd
+
+SESSION_COLS = ['姓名', '身分證字號', '日期', '活動內容', '開始', '結束', '秒數']
+
+
+def log_datetimes(logs):
+    """logs 的 日期 + 時間 -> datetime64 (已有 dt 欄位則直接使用)"""
+    if 'dt' in logs.columns:
+        return pd.to_datetime(logs['dt'], errors='coerce')
+    return pd.to_datetime(logs['日期'].astype(str) + ' ' + logs['時間'].astype(str), errors='coerce')
+
+
+def empty_sessions():
+    return pd.DataFrame({
+        '姓名': pd.Series(dtype=object), '身分證字號': pd.Series(dtype=object),
+        '日期': pd.Series(dtype='datetime64[ns]'), '活動內容': pd.Series(dtype=object),
+        '開始': pd.Series(dtype='datetime64[ns]'), '結束': pd.Series(dtype='datetime64[ns]'),
+        '秒數': pd.Series(dtype=float),
+    })
+
+
+def pair_sessions(logs, person_col='姓名'):
+    """
+    logs: 打卡紀錄 (需有 姓名/日期/時間/動作，可選 身分證字號/活動內容/dt)
+    person_col: 用來區分「同一人」的欄位 (預設 姓名，同步 App 時用 身分證字號)
+    回傳每段服務一列：姓名, 身分證字號, 日期, 活動內容, 開始, 結束, 秒數
+    """
+    if logs is None or logs.empty:
+        return empty_sessions()
+
+    dt = log_datetimes(logs).to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(dt)
+    if not valid.any():
+        return empty_sessions()
+
+    n = len(logs)
+    def col(name):
+        if name in logs.columns:
+            return logs[name].astype(str).to_numpy(dtype=object)
+        return np.full(n, "", dtype=object)
+
+    person = col(person_col)[valid]
+    names, pids, acts = col('姓名')[valid], col('身分證字號')[valid], col('活動內容')[valid]
+    action = col('動作')[valid]
+    dt = dt[valid]
+    day = dt.astype('datetime64[D]')
+
+    # 依 人 -> 時間 排序 (同時間維持原本順序)；同一天的紀錄會排在一起
+    person_codes = pd.factorize(person)[0]
+    order = np.lexsort((np.arange(len(dt)), dt, person_codes))
+    person_codes, dt, day, action = person_codes[order], dt[order], day[order], action[order]
+    names, pids, acts = names[order], pids[order], acts[order]
+
+    is_in = action == '簽到'
+    is_out = action == '簽退'
+
+    # 換人、換日、或上一列是簽退 -> 新的一段
+    new_seg = np.ones(len(dt), dtype=bool)
+    new_seg[1:] = (person_codes[1:] != person_codes[:-1]) | (day[1:] != day[:-1]) | is_out[:-1]
+    seg = np.cumsum(new_seg) - 1
+
+    # 每段第一個簽到 (已排序，第一次出現即最早)
+    in_idx = np.nonzero(is_in)[0]
+    in_seg, first = np.unique(seg[in_idx], return_index=True)
+    first_in = np.full(seg[-1] + 1, -1)
+    first_in[in_seg] = in_idx[first]
+
+    # 段尾的簽退 (每段最多一個)
+    out_idx = np.nonzero(is_out)[0]
+    start_idx = first_in[seg[out_idx]]
+    paired = start_idx >= 0
+    start_idx, end_idx = start_idx[paired], out_idx[paired]
+    if not len(end_idx):
+        return empty_sessions()
+
+    start, end = dt[start_idx], dt[end_idx]
+    return pd.DataFrame({
+        '姓名': names[start_idx], '身分證字號': pids[start_idx],
+        '日期': day[start_idx].astype('datetime64[ns]'), '活動內容': acts[start_idx],
+        '開始': start, '結束': end,
+        '秒數': (end - start) / np.timedelta64(1, 's'),
+    })
+
+
+# =========================================================
+# 團隊服務時數：重疊時段只算一次 (區間聯集)
+# =========================================================
+def _union_ns(codes, starts, ends, n_groups):
+    """
+    codes: 每個區間所屬的組別 (0..n_groups-1)；starts/ends: int64 奈秒
+    依 (組別, 開始) 排序後做「累計最大結束時間」掃描：
+    開始時間 >= 前面區間的最晚結束 -> 新的一段聯集。回傳每組聯集長度 (奈秒)。
+    """
+    order = np.lexsort((starts, codes))
+    codes, starts, ends = codes[order], starts[order], ends[order]
+    run_max = pd.Series(ends).groupby(codes).cummax().to_numpy()
+    new_block = np.ones(len(starts), dtype=bool)
+    new_block[1:] = (codes[1:] != codes[:-1]) | (starts[1:] >= run_max[:-1])
+    idx = np.nonzero(new_block)[0]
+    block_len = np.maximum.reduceat(ends, idx) - starts[idx]
+    return np.bincount(codes[idx], weights=block_len, minlength=n_groups)
+
+
+def coverage_seconds(sessions, by=None, date_from=None, date_to=None):
+    """
+    sessions: pair_sessions() 的結果
+    by: None -> 回傳總秒數；欄位名稱或清單 (如 '活動內容'、['活動內容', '日期']) -> 回傳各組秒數 (Series)
+    date_from / date_to: 只計算此日期區間 (含頭尾) 的服務
+    """
+    s = sessions[sessions['秒數'] > 0]
+    if date_from is not None: s = s[s['日期'] >= pd.Timestamp(date_from)]
+    if date_to is not None: s = s[s['日期'] <= pd.Timestamp(date_to)]
+
+    starts = s['開始'].to_numpy(dtype='datetime64[ns]').view('i8')
+    ends = s['結束'].to_numpy(dtype='datetime64[ns]').view('i8')
+    if by is None:
+        if not len(s): return 0.0
+        return float(_union_ns(np.zeros(len(s), dtype=np.int64), starts, ends, 1)[0] / 1e9)
+
+    grouped = s.groupby(by, sort=True)
+    index = grouped.size().index
+    if not len(s):
+        return pd.Series(dtype=float, index=index)
+    totals = _union_ns(grouped.ngroup().to_numpy(), starts, ends, len(index))
+    return pd.Series(totals / 1e9, index=index)
@@ -0,0 +1,105 @@
+"""
+列層級差異比對：比較「編輯後的 DataFrame」與「快取中的原始資料」，
+只產生有變動的儲存格、新增列、刪除列，一次 batch_update 送出。
+
+列的對應方式：沿用 load_data 讀進來時的 index (第 i 列 = 試算表第 i+2 列)。
+- index 在原始資料中找得到 -> 既有列，逐格比對
+- index 找不到 (DataEditor 新增、ignore_index 的 concat) -> 新增列
+- 原始資料的 index 不在編輯後資料中 -> 刪除列
+"""
+import numpy as np
+
+
+class DiffPlan:
+    __slots__ = ("updates", "appends", "deletes")
+
+    def __init__(self, updates, appends, deletes):
+        self.updates = updates    # [(列位置, 起始欄位置, [值...])]，位置皆為原始資料中的 0 起算位置
+        self.appends = appends    # [[值...]]
+        self.deletes = deletes    # [列位置...] (遞增)
+
+    def is_empty(self):
+        return not (self.updates or self.appends or self.deletes)
+
+    def __repr__(self):
+        return f"DiffPlan(updates={len(self.updates)}, appends={len(self.appends)}, deletes={len(self.deletes)})"
+
+
+def _runs(sorted_ints):
+    """把遞增整數切成連續區段：[1,2,3,7,8] -> [(1,4), (7,9)]"""
+    runs = []
+    for x in sorted_ints:
+        if runs and runs[-1][1] == x: runs[-1][1] = x + 1
+        else: runs.append([x, x + 1])
+    return [(a, b) for a, b in runs]
+
+
+def diff_frames(base, edited):
+    """
+    base: 快取中的原始 DataFrame (全為字串，RangeIndex)
+    edited: 編輯後、已轉成字串的 DataFrame，欄位須與 base 相同
+    """
+    cols = list(base.columns)
+    base_vals = base.to_numpy(dtype=object)
+    edit_vals = edited[cols].to_numpy(dtype=object)
+
+    pos = base.index.get_indexer(edited.index)
+    # 重複的 index 只有第一筆視為原本那一列，其餘當作新增
+    pos = np.where(edited.index.duplicated(), -1, pos)
+    matched = pos >= 0
+
+    updates = []
+    m_pos = pos[matched]
+    if len(m_pos):
+        changed = base_vals[m_pos] != edit_vals[matched]
+        m_vals = edit_vals[matched]
+        for i in np.nonzero(changed.any(axis=1))[0]:
+            for c0, c1 in _runs(np.nonzero(changed[i])[0].tolist()):
+                updates.append((int(m_pos[i]), c0, m_vals[i, c0:c1].tolist()))
+
+    appends = edit_vals[~matched].tolist()
+    keep = np.zeros(len(base), dtype=bool)
+    keep[m_pos] = True
+    deletes = np.nonzero(~keep)[0].tolist()
+    return DiffPlan(updates, appends, deletes)
+
+
+def _cell(value, as_number=False):
+    if as_number:
+        try:
+            return {"userEnteredValue": {"numberValue": float(value)}}
+        except (TypeError, ValueError):
+            pass
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+def _cells(values, c0=0, number_cols=()):
+    return {"values": [_cell(v, c0 + i in number_cols) for i, v in enumerate(values)]}
+
+
+def build_requests(plan, sheet_id, number_cols=()):
+    """
+    轉成 spreadsheets.batchUpdate 的 requests。
+    順序：先改既有儲存格 -> 再追加新列 -> 最後由下往上刪列 (避免列號位移)。
+    原始資料第 p 列在試算表上的 0 起算列號為 p + 1 (第 0 列是標題)。
+    number_cols: 以數字 (而非文字) 寫入的欄位位置，例如 App_Users 的時數/點數
+    """
+    requests = []
+    for row_pos, c0, values in plan.updates:
+        requests.append({"updateCells": {
+            "range": {"sheetId": sheet_id, "startRowIndex": row_pos + 1, "endRowIndex": row_pos + 2,
+                      "startColumnIndex": c0, "endColumnIndex": c0 + len(values)},
+            "rows": [_cells(values, c0, number_cols)],
+            "fields": "userEnteredValue",
+        }})
+    if plan.appends:
+        requests.append({"appendCells": {
+            "sheetId": sheet_id,
+            "rows": [_cells(r, 0, number_cols) for r in plan.appends],
+            "fields": "userEnteredValue",
+        }})
+    for start, end in reversed(_runs(plan.deletes)):
+        requests.append({"deleteDimension": {
+            "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start + 1, "endIndex": end + 1},
+        }})
+    return requests
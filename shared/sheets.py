@@ -0,0 +1,854 @@
+"""
+Google Sheet 共用資料存取層
+
+首頁與三個子系統共用同一個 Spreadsheet。SheetRepository (整個 process 一份) 快取連線物件與
+各分頁的 DataFrame，負責增量讀取、差異寫入與背景更新；頁面透過 load_data / load_typed / save_data /
+append_data 等函式使用。各項做法的細節寫在對應的方法上。
+"""
+import itertools
+import re
+import threading
+import time
+from datetime import date
+
+import gspread
+import pandas as pd
+import streamlit as st
+
+from shared import config, profiling
+from shared.fake_sheets import FakeClient
+from shared.ingest import add_types, extend_types, refresh_ages
+from shared.quota import QuotaHTTPClient
+from shared.schema import SHEET_COLUMNS
+from shared.snapshots import SnapshotStore
+from shared.sheet_diff import diff_frames, build_requests
+
+SHEET_ID = "1A3-VwCBYjnWdcEiL6VwbV5-UECcgX7TqKH94sKe8P90"
+CACHE_TTL = 60  # 秒
+
+# 只透過 append_row(s) 新增資料的紀錄表：過期時只抓「上次讀到的列數」之後的新列
+APPEND_ONLY_SHEETS = {"logs", "elderly_logs", "care_logs"}
+# 增量讀取看不到「在試算表上直接修改/刪除舊列」，每隔一段時間仍做一次完整重讀校正
+FULL_RELOAD_INTERVAL = 600  # 秒
+# 本機快照資料夾 (設定 snapshot_dir = "" 可關閉)
+SNAPSHOT_DIR_DEFAULT = ".sheet_cache"
+# 背景更新：TTL 到期前幾秒開始重讀；分頁多久沒人讀取就停止更新；失敗後隔多久重試
+REFRESH_AHEAD = 10  # 秒
+REFRESH_IDLE = 600  # 秒
+REFRESH_RETRY = 15  # 秒
+# 重讀期間快取被寫入端換掉時改從新的快取重讀，最多讀幾次
+REFRESH_RACE_RETRY = 3
+# 資料超過這個秒數沒更新 (背景一直讀取失敗)，畫面改以警告顯示
+STALE_WARN = 5 * CACHE_TTL
+
+
+def col_letter(n):
+    """第 n 欄 (1 起算) 的欄位字母，例如 1 -> A、27 -> AA"""
+    return gspread.utils.rowcol_to_a1(1, n).rstrip("0123456789")
+
+
+@st.cache_resource
+def get_client():
+    # 離線測試/量測：sheets_backend = "fake" 改用記憶體中的假試算表 (見 shared.fake_sheets)
+    if config.get("sheets_backend") == "fake":
+        client = FakeClient(latency=float(config.get("fake_latency", 0) or 0))
+        folder = config.get("fake_data")
+        if folder: client.load_csv_dir(SHEET_ID, folder)
+        return client
+    # 所有請求經過配額控管 (節流、429 重試、優先順序)，見 shared.quota
+    return gspread.service_account_from_dict(st.secrets["gcp_service_account"], http_client=QuotaHTTPClient)
+
+
+_versions = itertools.count(1)
+
+
+class _CacheEntry:
+    __slots__ = ("df", "fetched_at", "read_at", "full_at", "row_count", "version", "lineage", "last_error")
+
+    def __init__(self, df, fetched_at, full_at=None, row_count=None, lineage=None, read_at=None):
+        self.df = df
+        # fetched_at 決定是否過期 (invalidate 會改成 -inf)；read_at 是內容實際從試算表讀取的時間
+        self.fetched_at = fetched_at
+        self.read_at = fetched_at if read_at is None else read_at
+        self.full_at = fetched_at if full_at is None else full_at
+        # 試算表上已讀到的列數 (含標題列)
+        self.row_count = len(df) + 1 if row_count is None else row_count
+        # 內容每變一次就換一個版本號，讓衍生的統計快取可以只在相關分頁變動時重算
+        self.version = next(_versions)
+        # 只在尾端追加新列時沿用同一個 lineage；舊列被修改/刪除就換新的，
+        # 衍生資料 (如志工時數表) 可據此判斷能否只處理新增的列
+        self.lineage = next(_versions) if lineage is None else lineage
+        # 背景重讀 / 寫本機快照失敗的原因 (仍沿用這份資料)；由 render_data_age 顯示
+        self.last_error = None
+
+
+def _same_row(values, expected):
+    """讀回的一列 (API 省略尾端空白格) 與快取中的一列是否相同"""
+    expected = [str(v) for v in expected]
+    values = [str(v) for v in values]
+    return values + [""] * (len(expected) - len(values)) == expected
+
+
+class SheetChangedError(RuntimeError):
+    """試算表的列位置與快取不同 (例如封存刪掉了前面的列)，不能再依快取的列位置寫入"""
+
+
+def _extends(old_df, new_df):
+    """new_df 是否只是在 old_df 後面多了幾列 (舊列內容完全相同)"""
+    return (
+        len(new_df) >= len(old_df)
+        and new_df.columns.equals(old_df.columns)
+        and new_df.iloc[:len(old_df)].reset_index(drop=True).equals(old_df.reset_index(drop=True))
+    )
+
+
+class _Flight:
+    """進行中的一次讀取：其他執行緒等待 done 後共用 result (或 error)"""
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _appended_start_row(response):
+    """從 values.append 的回應 (updatedRange，如 'logs'!A101:H102) 取出寫入的起始列號"""
+    try:
+        m = re.search(r"!\$?[A-Z]+\$?(\d+)", response["updates"]["updatedRange"])
+        return int(m.group(1))
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+class SheetRepository:
+    """
+    整個 process 共用一份 (由 st.cache_resource 保存)，所有使用者與頁面共享快取。
+    快取內的 DataFrame 一律視為唯讀，交給頁面前都會 copy()。
+    """
+
+    def __init__(self, client_factory, sheet_id=SHEET_ID, ttl=CACHE_TTL, snapshot_dir=None, background=True):
+        self._client_factory = client_factory
+        self.sheet_id = sheet_id
+        self.ttl = ttl
+        # False：不開背景更新執行緒，過期時由讀取端自己重讀 (量測/腳本用)
+        self.background = background
+        self._snapshots = SnapshotStore(snapshot_dir) if snapshot_dir else None
+        self._persisting = set()
+        self._refreshers = set()  # 有背景更新執行緒的分頁
+        self._accessed = {}       # 分頁名稱 -> 最後一次被讀取的時間
+        self._inflight = {}       # key -> _Flight (進行中的讀取)
+        self._lock = threading.RLock()
+        self._spreadsheet = None
+        self._worksheets = {}
+        self._frames = {}
+        self._typed = {}  # 分頁名稱 -> (lineage, 來源 DataFrame, 計算年齡的日期, 附加型別欄位的 DataFrame)
+
+    # --- 連線物件快取 ---
+    def spreadsheet(self):
+        # 不在鎖內等待 API，避免背景重讀時擋住其他只需要讀快取的執行緒
+        if self._spreadsheet is None:
+            with profiling.sheets_call("(spreadsheet)", "open_by_key"):
+                ss = self._client_factory().open_by_key(self.sheet_id)
+            with self._lock:
+                if self._spreadsheet is None:
+                    self._spreadsheet = ss
+        return self._spreadsheet
+
+    def worksheet(self, sheet_name):
+        with self._lock:
+            ws = self._worksheets.get(sheet_name)
+        if ws is None:
+            ss = self.spreadsheet()
+            with profiling.sheets_call(sheet_name, "worksheet"):
+                ws = ss.worksheet(sheet_name)
+            with self._lock:
+                self._worksheets[sheet_name] = ws
+        return ws
+
+    def forget_worksheet(self, sheet_name):
+        """分頁被刪除/改名後，丟掉舊的 worksheet 物件，下次重新取得"""
+        with self._lock:
+            self._worksheets.pop(sheet_name, None)
+
+    # --- 讀取 ---
+    def _fetch(self, sheet_name):
+        ws = self.worksheet(sheet_name)
+        with profiling.sheets_call(sheet_name, "get_all_values"):
+            data = ws.get_all_values()
+        if not data:
+            return pd.DataFrame()
+        headers = data.pop(0)
+        return pd.DataFrame(data, columns=headers)
+
+    def _fetch_tail(self, sheet_name, entry):
+        """
+        只讀取 entry.row_count 之後新增的列，接在快取的 DataFrame 後面。
+        從快取的最後一列開始讀：那一列已不在原位 (例如封存刪掉了前面的列) 就回傳 None，改為完整重讀。
+        """
+        cols = list(entry.df.columns)
+        ws = self.worksheet(sheet_name)
+        with profiling.sheets_call(sheet_name, "get_tail"):
+            rows = ws.get(f"A{entry.row_count}:{col_letter(len(cols))}")
+        last = entry.df.iloc[-1].tolist() if len(entry.df) else cols
+        if not _same_row(rows[0] if rows else [], last):
+            return None
+        rows = rows[1:]
+        if not rows:
+            return entry.df, entry.row_count
+        # API 會省略每列尾端的空白格，補齊成相同欄數
+        rows = [list(r) + [""] * (len(cols) - len(r)) for r in rows]
+        new_df = pd.DataFrame(rows, columns=cols)
+        return pd.concat([entry.df, new_df], ignore_index=True), entry.row_count + len(rows)
+
+    def _can_read_tail(self, sheet_name, entry, now):
+        return (
+            sheet_name in APPEND_ONLY_SHEETS
+            and entry is not None
+            and len(entry.df.columns) > 0
+            and now - entry.full_at < FULL_RELOAD_INTERVAL
+        )
+
+    def _entry(self, sheet_name, allow_stale=True):
+        """
+        取得分頁的快取項目：沒有快取先試本機快照；過期時先回傳舊資料，由背景執行緒重讀 (stale-while-revalidate)；
+        需要重讀但讀取失敗 (例如配額用完) 時，有舊資料就先沿用，不讓畫面變成一片 0
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._frames.get(sheet_name)
+            self._accessed[sheet_name] = now
+        if entry is None and allow_stale:
+            entry = self._restore(sheet_name)
+        if entry is not None:
+            stale = now - entry.fetched_at >= self.ttl
+            # 過期但沒有被標記失效 (invalidate)：先回傳舊資料，交給背景執行緒重讀
+            if not stale or (allow_stale and self.background and entry.fetched_at > float("-inf")):
+                profiling.cache_hit(sheet_name, stale=stale)
+                self._ensure_refresher(sheet_name)
+                return entry
+        profiling.cache_miss(sheet_name)
+        try:
+            # allow_stale=False (寫入前的重讀) 需要這一刻之後的資料，不加入已在進行中的讀取
+            new_entry = self._refresh(sheet_name, entry, now, join=allow_stale)
+            self._ensure_refresher(sheet_name)
+            return new_entry
+        except Exception:
+            self.forget_worksheet(sheet_name)
+            if entry is None or not allow_stale:
+                raise
+            # 有舊資料就先沿用 (維持過期狀態，下次再重試)
+            return entry
+
+    def _single_flight(self, key, fn, join=True):
+        """
+        同一個 key 同時只執行一次 fn：第一個執行緒去讀，其他執行緒等它完成後共用結果 (失敗則一起收到例外)。
+        join=False 時不等別人的結果，自己讀一次 (結果仍分享給之後加入的執行緒)。
+        """
+        with self._lock:
+            flight = self._inflight.get(key) if join else None
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            with profiling.timed("sheets", str(key[1]), op="wait_inflight"):
+                flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+            flight.done.set()
+
+    def _refresh(self, sheet_name, entry, now, join=True):
+        return self._single_flight(("sheet", sheet_name), lambda: self._do_refresh(sheet_name, entry, now), join)
+
+    def _read(self, sheet_name, entry, now):
+        """從試算表讀取 (能增量就增量)，回傳新的 _CacheEntry (尚未放進快取)"""
+        tail = self._fetch_tail(sheet_name, entry) if self._can_read_tail(sheet_name, entry, now) else None
+        if tail is not None:
+            df, row_count = tail
+            return _CacheEntry(df, now, full_at=entry.full_at, row_count=row_count, lineage=entry.lineage)
+        df = self._fetch(sheet_name)
+        # 紀錄表定期完整重讀時，舊列沒變就沿用 lineage
+        same = (sheet_name in APPEND_ONLY_SHEETS and entry is not None
+                and _extends(entry.df, df))
+        return _CacheEntry(df, now, lineage=entry.lineage if same else None)
+
+    def _do_refresh(self, sheet_name, entry, now):
+        """
+        重讀並更新快取、寫入本機快照。
+        讀取期間快取可能已被寫入端換掉 (_patch_append / _patch_saved / drop)：讀到的結果不一定包含剛寫入的列，
+        不能蓋掉，改從目前的快取再讀一次；一直被換掉就標記過期，交給下一次讀取。
+        """
+        for _ in range(REFRESH_RACE_RETRY):
+            new_entry = self._read(sheet_name, entry, now)
+            with self._lock:
+                current = self._frames.get(sheet_name)
+                if current is entry:
+                    self._frames[sheet_name] = new_entry
+                    break
+            entry = current
+        else:
+            if entry is None:
+                return new_entry
+            entry.fetched_at = float("-inf")
+            return entry
+        if entry is None or new_entry.df is not entry.df:
+            self._persist_async(sheet_name, new_entry)
+        return new_entry
+
+    # --- 背景更新 ---
+    def _ensure_refresher(self, sheet_name):
+        if not self.background:
+            return
+        with self._lock:
+            if sheet_name in self._refreshers:
+                return
+            self._refreshers.add(sheet_name)
+        threading.Thread(target=self._refresh_loop, args=(sheet_name,), daemon=True,
+                         name=f"sheet-refresh-{sheet_name}").start()
+
+    def _refresh_loop(self, sheet_name):
+        """每個分頁一條：TTL 到期前 REFRESH_AHEAD 秒重讀並替換快取；REFRESH_IDLE 秒沒人讀取就結束"""
+        while True:
+            now = time.time()
+            with self._lock:
+                if now - self._accessed.get(sheet_name, 0) > REFRESH_IDLE:
+                    self._refreshers.discard(sheet_name)
+                    return
+                entry = self._frames.get(sheet_name)
+            due = now if entry is None else entry.fetched_at + self.ttl - REFRESH_AHEAD
+            if due > now:
+                time.sleep(due - now)
+                continue
+            try:
+                self._refresh(sheet_name, entry, now)
+            except Exception as e:
+                # 失敗就繼續沿用舊資料，稍後再試
+                self.forget_worksheet(sheet_name)
+                self._record_error(sheet_name, entry, "背景更新失敗", e)
+                time.sleep(REFRESH_RETRY)
+
+    def _record_error(self, sheet_name, entry, what, error):
+        """背景執行緒的錯誤記在快取項目上 (頁面用 errors / render_data_age 顯示)，並交給 profiling"""
+        if entry is not None:
+            entry.last_error = f"{what}：{error}"
+        profiling.record("error", sheet_name, 0.0, op=what, error=str(error))
+
+    # --- 本機快照 ---
+    def _restore(self, sheet_name):
+        """
+        從本機快照建立快取 (保留快照的讀取時間，過期就照常由背景重讀)。
+        快照可能落後試算表很多 (甚至中間刪過列)，第一次重讀一律完整重讀。
+        """
+        if self._snapshots is None:
+            return None
+        loaded = self._snapshots.load(sheet_name)
+        if loaded is None:
+            return None
+        df, typed, meta = loaded
+        entry = _CacheEntry(df, meta["fetched_at"], full_at=float("-inf"), row_count=meta["row_count"])
+        with self._lock:
+            if sheet_name in self._frames:  # 其他執行緒已先讀到
+                return self._frames[sheet_name]
+            self._frames[sheet_name] = entry
+            # 快照的年齡欄位可能是之前某天算的：第一次取用時重算 (day=None)
+            self._typed[sheet_name] = (entry.lineage, df, None, typed)
+        return entry
+
+    def _persist_async(self, sheet_name, entry):
+        if self._snapshots is None:
+            return
+        with self._lock:
+            if sheet_name in self._persisting:
+                return  # 上一次還沒寫完，下次更新時再寫
+            self._persisting.add(sheet_name)
+        threading.Thread(target=self._persist, args=(sheet_name, entry), daemon=True).start()
+
+    def _persist(self, sheet_name, entry):
+        try:
+            typed = self._typed_frame(sheet_name, entry)
+            self._snapshots.save(sheet_name, typed, entry.df.columns, entry.row_count, entry.fetched_at)
+        except Exception as e:
+            # 例如標題列有重複欄名 (Parquet 不支援)：只是少了快照，不影響讀取
+            self._record_error(sheet_name, entry, "本機快照寫入失敗", e)
+        finally:
+            with self._lock:
+                self._persisting.discard(sheet_name)
+
+    def frame(self, sheet_name):
+        """回傳快取中的 DataFrame (唯讀，不 copy)；過期或尚未讀取才打 API"""
+        return self._entry(sheet_name).df
+
+    def snapshot(self, sheet_name, typed=False):
+        """(DataFrame, lineage)：lineage 不變代表只在尾端多了新列；typed=True 時附加型別欄位"""
+        entry = self._entry(sheet_name)
+        return (self._typed_frame(sheet_name, entry) if typed else entry.df), entry.lineage
+
+    def typed(self, sheet_name):
+        """快取中的 DataFrame 加上 SHEET_TYPES 定義的型別欄位 (唯讀，不 copy)"""
+        return self._typed_frame(sheet_name, self._entry(sheet_name))
+
+    def frame_and_typed(self, sheet_name):
+        """同一份快取的 (原始 DataFrame, 附加型別欄位的 DataFrame)，列的順序與 index 相同 (唯讀)"""
+        entry = self._entry(sheet_name)
+        return entry.df, self._typed_frame(sheet_name, entry)
+
+    def _typed_frame(self, sheet_name, entry):
+        today = date.today()
+        with self._lock:
+            lineage, source, day, typed = self._typed.get(sheet_name, (None, None, None, None))
+        if source is entry.df and day == today:
+            return typed
+        if source is not entry.df:
+            if lineage == entry.lineage and len(source) <= len(entry.df):
+                typed = extend_types(sheet_name, typed, entry.df, today)
+            else:
+                typed, day = add_types(sheet_name, entry.df, today), today
+        if day != today:
+            typed = refresh_ages(sheet_name, typed, today)
+        with self._lock:
+            self._typed[sheet_name] = (entry.lineage, entry.df, today, typed)
+        return typed
+
+    def peek(self, sheet_name):
+        """快取中的資料 (不論是否過期，不打 API)；尚未讀取過則回傳 None"""
+        with self._lock:
+            entry = self._frames.get(sheet_name)
+            return None if entry is None else entry.df
+
+    def cached_version(self, sheet_name):
+        """快取可直接使用時 (過期也算，背景會更新) 回傳版本號；尚未讀取或已標記失效為 None (不打 API)"""
+        with self._lock:
+            entry = self._frames.get(sheet_name)
+            if entry is not None and entry.fetched_at > float("-inf"):
+                return entry.version
+            return None
+
+    def age(self, sheet_names):
+        """這些分頁中最舊的資料是幾秒前從試算表讀取的 (只看最近有人讀取、背景仍在更新的分頁)；沒有則為 None"""
+        now = time.time()
+        with self._lock:
+            read = [self._frames[n].read_at for n in sheet_names
+                    if n in self._frames and now - self._accessed.get(n, 0) <= REFRESH_IDLE]
+        return now - min(read) if read else None
+
+    def errors(self, sheet_names):
+        """{分頁名稱: 目前快取項目上記錄的背景錯誤}，沒有錯誤的分頁不列出"""
+        with self._lock:
+            entries = {n: self._frames.get(n) for n in sheet_names}
+        return {n: e.last_error for n, e in entries.items() if e is not None and e.last_error}
+
+    def batch_columns(self, wanted):
+        """
+        wanted: {分頁名稱: [欄位, ...]}，回傳 {分頁名稱: 只含這些欄位的 DataFrame}
+        已有快取的分頁直接取用；其餘分頁的指定欄位合併成「一次」values_batch_get，
+        並在背景讀取完整分頁，之後就由快取 (與背景更新) 供應。
+        欄位位置依 SHEET_COLUMNS 換算，標題列對不上時該分頁改為整張讀取。
+        """
+        result, ranges, slots = {}, [], []
+        for name, cols in wanted.items():
+            layout = SHEET_COLUMNS.get(name, [])
+            if self.peek(name) is None:
+                self._restore(name)
+            if self.cached_version(name) is not None or not all(c in layout for c in cols):
+                result[name] = None
+                continue
+            for c in cols:
+                letter = col_letter(layout.index(c) + 1)
+                ranges.append(f"'{name}'!{letter}:{letter}")
+                slots.append((name, c))
+
+        columns = {}
+        if ranges:
+            def batch_get():
+                ss = self.spreadsheet()
+                with profiling.sheets_call(",".join(n for n in wanted if n not in result), "values_batch_get"):
+                    return ss.values_batch_get(ranges, params={"majorDimension": "COLUMNS"})
+            resp = self._single_flight(("batch", ",".join(ranges)), batch_get)
+            for (name, c), vr in zip(slots, resp.get("valueRanges", [])):
+                values = (vr.get("values") or [[]])[0]
+                if not values or values[0] != c:
+                    result[name] = None
+                    continue
+                columns.setdefault(name, {})[c] = values[1:]
+
+        for name, cols in wanted.items():
+            if name in result:
+                df = self.frame(name)
+                result[name] = df[[c for c in cols if c in df.columns]]
+                continue
+            # 各欄尾端的空白會被 API 省略，補齊到同樣長度
+            got = columns.get(name, {})
+            n = max((len(v) for v in got.values()), default=0)
+            result[name] = pd.DataFrame({c: got[c] + [""] * (n - len(got[c])) for c in cols})
+            with self._lock:
+                self._accessed[name] = time.time()
+            self._ensure_refresher(name)
+        return result
+
+    def versions(self, sheet_names):
+        """各分頁的快取版本號 (未讀取或已失效為 None)，可當作衍生統計快取的 key"""
+        return tuple(self.cached_version(name) for name in sheet_names)
+
+    def load(self, sheet_name, target_cols=None, typed=False):
+        df = (self.typed(sheet_name) if typed else self.frame(sheet_name)).copy()
+        # 補齊可能缺少的欄位
+        for c in target_cols or []:
+            if c not in df.columns: df[c] = ""
+        return df
+
+    def reload(self, sheet_name):
+        """不論快取狀態，立刻重讀一次並回傳 (寫入前取得試算表最新內容用，唯讀)"""
+        self.invalidate(sheet_name)
+        return self._entry(sheet_name, allow_stale=False).df
+
+    def invalidate(self, sheet_name=None):
+        """
+        標記為過期，下次讀取時重新抓取。
+        紀錄表仍保留已讀到的內容，下次只需增量讀取新列。
+        """
+        with self._lock:
+            names = list(self._frames) if sheet_name is None else [sheet_name]
+            for name in names:
+                entry = self._frames.get(name)
+                if entry is not None: entry.fetched_at = float("-inf")
+
+    def drop(self, sheet_name):
+        """整張表內容已改變 (例如整表覆寫)，丟掉快取，下次完整重讀"""
+        with self._lock:
+            self._frames.pop(sheet_name, None)
+
+    # --- 寫入 ---
+    def append_rows(self, sheet_name, values_list, value_input_option="RAW"):
+        ws = self.worksheet(sheet_name)
+        # USER_ENTERED 會被試算表轉換格式 (如日期)，請 API 回傳實際存入的值再寫進快取
+        echo = value_input_option != "RAW"
+        with profiling.sheets_call(sheet_name, "append_rows"):
+            if len(values_list) == 1:
+                resp = ws.append_row(values_list[0], value_input_option=value_input_option,
+                                     insert_data_option="INSERT_ROWS", include_values_in_response=echo)
+            else:
+                resp = ws.append_rows(values_list, value_input_option=value_input_option,
+                                      insert_data_option="INSERT_ROWS", include_values_in_response=echo)
+        if echo:
+            values_list = (resp.get("updates", {}).get("updatedData", {}).get("values") or values_list)
+        self._patch_append(sheet_name, values_list, _appended_start_row(resp))
+
+    def _patch_append(self, sheet_name, values_list, start_row):
+        """
+        把剛追加的列接到快取後面；若中間夾著別人新增、尚未讀到的列，改為標記過期。
+        寫入位置在快取的列數以內，表示試算表的列變少了 (例如封存)：丟掉快取，下次完整重讀。
+        """
+        with self._lock:
+            entry = self._frames.get(sheet_name)
+            if entry is None:
+                return
+            if start_row is not None and start_row <= entry.row_count:
+                del self._frames[sheet_name]
+                return
+            width = len(entry.df.columns)
+            if not width or start_row != entry.row_count + 1:
+                entry.fetched_at = float("-inf")
+                return
+            rows = [(list(r) + [""] * width)[:width] for r in values_list]
+            df = pd.concat([entry.df, pd.DataFrame(rows, columns=entry.df.columns)], ignore_index=True)
+            self._frames[sheet_name] = _CacheEntry(df, entry.fetched_at, full_at=entry.full_at,
+                                                   row_count=entry.row_count + len(rows),
+                                                   lineage=entry.lineage, read_at=entry.read_at)
+
+    def _patch_saved(self, sheet_name, base, df, plan):
+        """差異寫入後 (僅修改/刪除列) 直接更新快取；有新增列時位置無法確定，整份重讀"""
+        with self._lock:
+            entry = self._frames.get(sheet_name)
+            if entry is None or entry.df is not base or plan.appends:
+                self._frames.pop(sheet_name, None)
+                return
+            kept = base.index.delete(plan.deletes)
+            new_df = df.loc[kept, list(base.columns)].reset_index(drop=True)
+            self._frames[sheet_name] = _CacheEntry(new_df, entry.fetched_at, full_at=entry.full_at,
+                                                   row_count=entry.row_count - len(plan.deletes),
+                                                   read_at=entry.read_at)
+
+    def save_frame(self, sheet_name, df, base=None, window=None):
+        """
+        把編輯後的 df 寫回試算表：與快取中的原始資料比對，
+        只送出變動的儲存格、新增列與刪除列 (一次 batch_update)。
+        欄位結構不同時 (新增/刪除欄位) 改為整表覆寫，但不先 clear()。
+        base: df 是從哪一份資料編輯來的 (預設為目前快取)；比對期間快取被追加了新列也不會誤刪。
+        window: df 只是 base 中這些 index 的列編輯後的結果 (見 load_window)；其餘列視為不變。
+        回傳 DiffPlan (整表覆寫時為 None)。
+        """
+        if base is None:
+            base = self.peek(sheet_name)
+        if base is None:
+            base = self.frame(sheet_name)
+        else:
+            base = self._sheet_base(sheet_name, base)
+        if window is not None:
+            df = pd.concat([base.drop(index=window), df])
+        ws = self.worksheet(sheet_name)
+        same_cols = (
+            len(base.columns) > 0
+            and not base.columns.duplicated().any()
+            and set(df.columns) == set(base.columns)
+        )
+        if not same_cols:
+            self._overwrite(ws, df, base)
+            self.drop(sheet_name)
+            return None
+
+        plan = diff_frames(base, df)
+        if plan.updates or plan.deletes:
+            self._check_positions(sheet_name, ws, base)
+        if not plan.is_empty():
+            with profiling.sheets_call(sheet_name, "batch_update"):
+                self.spreadsheet().batch_update({"requests": build_requests(plan, ws.id)})
+            self._patch_saved(sheet_name, base, df, plan)
+        return plan
+
+    def _sheet_base(self, sheet_name, base):
+        """
+        base 可能是 load() 的複本 (多了補上的空白欄位)：只留試算表上的欄位、依快取的欄位順序；
+        內容與快取相同時直接用快取那一份，寫入後才能就地更新快取 (_patch_saved)
+        """
+        with self._lock:
+            entry = self._frames.get(sheet_name)
+        if entry is None or base is entry.df:
+            return base
+        cols = list(entry.df.columns)
+        if entry.df.columns.duplicated().any() or not set(cols) <= set(base.columns):
+            return base
+        base = base[cols]
+        return entry.df if base.equals(entry.df) else base
+
+    def _check_positions(self, sheet_name, ws, base):
+        """
+        修改/刪除是以 base 的列位置送出：先確認 base 的最後一列還在原本那一列
+        (前面的列被其他程式刪除或插入時會對不上，例如另一個 process 執行了封存)。
+        對不上就丟掉快取並拒絕寫入，避免改到/刪到別的列。
+        """
+        if base.empty:
+            return
+        n = len(base) + 1
+        with profiling.sheets_call(sheet_name, "get_row"):
+            rows = ws.get(f"A{n}:{col_letter(len(base.columns))}{n}")
+        if not _same_row(rows[0] if rows else [], base.iloc[-1].tolist()):
+            self.drop(sheet_name)
+            raise SheetChangedError(f"{sheet_name} 的內容已被其他程式變更 (列數或列位置不同)，請重新整理後再修改")
+
+    def upsert_frame(self, sheet_name, df, key, delete_missing=False, defaults=None):
+        """
+        依 key 欄位 (例如 手機) 把 df 合併進試算表，一次 batch_update：
+        - key 已存在 -> 只改 df 有的欄位中值不同的儲存格 (df 沒有的欄位保持原值)
+        - key 不存在 -> 新增一列，df 沒有的欄位填 defaults
+        - delete_missing=True 時刪除 df 中沒有的 key (讓試算表與 df 一致)
+        數值欄位以數字寫入。每次都先重讀一次試算表，避免覆蓋到其他程式 (如 App) 剛改的內容。
+        回傳 DiffPlan (標題列不符、改為整表覆寫時為 None)。
+        """
+        defaults = defaults or {}
+        base = self.reload(sheet_name)
+        ws = self.worksheet(sheet_name)
+        cols = list(df.columns) + [c for c in defaults if c not in df.columns]
+        layout = SHEET_COLUMNS.get(sheet_name, [])
+        if set(cols) <= set(layout):
+            cols = [c for c in layout if c in cols]
+        if key not in base.columns or base.columns.duplicated().any() or not set(cols) <= set(base.columns):
+            full = df.assign(**{c: v for c, v in defaults.items() if c not in df.columns})[cols]
+            self._overwrite(ws, full, base)
+            self.drop(sheet_name)
+            return None
+
+        df = df.drop_duplicates(subset=key, keep="first")
+        text = df.astype(object).where(df.notna(), "").map(_number_text)
+        base_keys = base[key].astype(str).str.strip()
+        first = base_keys[~base_keys.duplicated()]
+        pos = pd.Index(first.to_numpy()).get_indexer(text[key].str.strip())
+        matched = pos >= 0
+        labels = first.index[pos[matched]]
+
+        edited = base.copy()
+        edited.loc[labels, list(df.columns)] = text[matched].to_numpy()
+        if delete_missing:
+            edited = edited.loc[labels.sort_values()]
+        new_rows = text[~matched].assign(**{c: _number_text(v) for c, v in defaults.items() if c not in df.columns})
+        new_rows = new_rows.reindex(columns=base.columns, fill_value="")
+        new_rows.index = pd.RangeIndex(len(base), len(base) + len(new_rows))
+        edited = pd.concat([edited, new_rows])
+
+        numeric = {c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])}
+        numeric |= {c for c, v in defaults.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+        number_cols = {i for i, c in enumerate(base.columns) if c in numeric}
+
+        plan = diff_frames(base, edited)
+        if not plan.is_empty():
+            with profiling.sheets_call(sheet_name, "batch_update"):
+                self.spreadsheet().batch_update({"requests": build_requests(plan, ws.id, number_cols)})
+            self._patch_saved(sheet_name, base, edited, plan)
+        return plan
+
+    def _overwrite(self, ws, df, base):
+        """整表覆寫：用空字串蓋掉舊資料多出來的列/欄，一次 update 完成"""
+        n_rows = max(len(df), len(base)) + 1
+        n_cols = max(len(df.columns), len(base.columns))
+        values = [list(df.columns)] + df.values.tolist()
+        values = [list(r) + [""] * (n_cols - len(r)) for r in values]
+        values += [[""] * n_cols for _ in range(n_rows - len(values))]
+        with profiling.sheets_call(ws.title, "update"):
+            ws.update(values=values, range_name="A1")
+
+
+@st.cache_resource
+def get_repository():
+    # 假試算表每次啟動都是新的資料，不使用本機快照
+    snapshot_dir = None if config.get("sheets_backend") == "fake" else config.get("snapshot_dir", SNAPSHOT_DIR_DEFAULT)
+    return SheetRepository(get_client, snapshot_dir=snapshot_dir)
+
+
+# =========================================================
+# 頁面用的簡易介面 (沿用原本各頁的函式名稱與回傳習慣)
+# =========================================================
+def load_data(sheet_name, target_cols=None):
+    try:
+        return get_repository().load(sheet_name, target_cols)
+    except Exception:
+        return pd.DataFrame(columns=target_cols or [])
+
+
+def load_typed(sheet_name, target_cols=None):
+    """同 load_data，另附型別欄位 (見 schema.SHEET_TYPES)；只供顯示/統計，不要拿去 save_data"""
+    try:
+        return get_repository().load(sheet_name, target_cols, typed=True)
+    except Exception:
+        return pd.DataFrame(columns=target_cols or [])
+
+
+def load_with_types(sheet_name, target_cols=None):
+    """
+    (load_data, load_typed) 取自同一份快取，列的順序與 index 相同：
+    前者可編輯後交給 save_data，後者提供年齡等型別欄位給畫面使用
+    """
+    try:
+        base, typed = get_repository().frame_and_typed(sheet_name)
+    except Exception:
+        df = pd.DataFrame(columns=target_cols or [])
+        return df, add_types(sheet_name, df)
+    df, typed = base.copy(), typed.copy()
+    for c in target_cols or []:
+        if c not in df.columns: df[c] = ""
+        if c not in typed.columns: typed[c] = ""
+    return df, typed
+
+
+def clean_frame(df):
+    """轉成字串並清掉 nan / None，避免寫入時 JSON 錯誤"""
+    return df.fillna("").astype(str).replace(['nan', 'NaN', 'nan.0', 'None', '<NA>', 'NaT'], "")
+
+
+def _number_text(v):
+    """數字轉成試算表顯示的樣子 (12.0 -> '12')，用來和讀回的字串比對"""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+
+def row_values(row_dict, col_order):
+    return [str(row_dict.get(c, "")).strip() for c in col_order]
+
+
+# 修改資料 (DataEditor、封存、更新單一欄位)：只寫回差異
+# base: df 是從哪一次 load_data 的結果編輯來的 (未修改的原始 DataFrame)；
+#       載入之後才寫入的列 (例如打卡佇列剛送出的報到) 不在 base 裡，不會被當成已刪除
+def save_data(df, sheet_name, base=None):
+    try:
+        get_repository().save_frame(sheet_name, clean_frame(df), base=base)
+        return True
+    except Exception as e:
+        st.error(f"寫入失敗：{e}"); return False
+
+
+# 只編輯部分列 (例如某幾天的打卡紀錄)：不必把整張表送到瀏覽器，儲存時只寫回有變動的列
+ROW_NUMBER_COL = "列號"
+
+
+def load_window(sheet_name, select):
+    """
+    select(typed) -> 布林 Series，typed 為附加型別欄位的整張表 (可用 dt 等欄位篩選)
+    回傳 (editor_df, base)：editor_df 為選到的列，第一欄是試算表列號 (第 i 列 = 第 i+2 列)、
+    index 重新從 0 起算 (給 data_editor)；base 是快取中的原始 DataFrame (唯讀)，儲存時交給 save_window，
+    寫入後才能直接更新快取而不必整張重讀
+    """
+    base, typed = get_repository().frame_and_typed(sheet_name)
+    window = base[select(typed)]
+    editor_df = window.reset_index(names=ROW_NUMBER_COL)
+    editor_df[ROW_NUMBER_COL] += 2
+    return editor_df, base
+
+
+def save_window(sheet_name, original, edited, base):
+    """
+    original: load_window 的 editor_df；edited: data_editor 編輯後的結果
+    有列號的列 -> 修改原列；沒有列號 (新增) -> 追加；original 有但 edited 沒有的列號 -> 刪除
+    回傳 DiffPlan (失敗為 None)
+    """
+    try:
+        rows = pd.to_numeric(edited[ROW_NUMBER_COL], errors="coerce") - 2
+        is_old = rows.isin(original[ROW_NUMBER_COL] - 2)
+        old, new = edited[is_old].copy(), edited[~is_old].copy()
+        old.index = rows[is_old].astype(int)
+        new.index = pd.RangeIndex(len(base), len(base) + len(new))
+        df = clean_frame(pd.concat([old, new]).drop(columns=[ROW_NUMBER_COL]))
+        return get_repository().save_frame(sheet_name, df, base=base, window=original[ROW_NUMBER_COL] - 2)
+    except Exception as e:
+        st.error(f"寫入失敗：{e}"); return None
+
+
+# 單筆追加 (用於打卡、新增名冊)
+def append_data(sheet_name, row_dict, col_order, value_input_option="RAW"):
+    try:
+        get_repository().append_rows(sheet_name, [row_values(row_dict, col_order)], value_input_option)
+        return True
+    except Exception as e:
+        st.error(f"新增失敗：{e}"); return False
+
+
+# 批次追加 (用於補登)
+def batch_append_data(sheet_name, rows_list, col_order, value_input_option="RAW"):
+    try:
+        values_list = [row_values(r, col_order) for r in rows_list]
+        if values_list:
+            get_repository().append_rows(sheet_name, values_list, value_input_option)
+        return True
+    except Exception as e:
+        st.error(f"批次失敗：{e}"); return False
+
+
+def invalidate(sheet_name=None):
+    get_repository().invalidate(sheet_name)
+
+
+def sheet_versions(*sheet_names):
+    return get_repository().versions(sheet_names)
+
+
+def render_data_age(*sheet_names):
+    """顯示這些分頁的資料是多久以前讀取的，以及背景更新的錯誤 (放在側邊欄)"""
+    repo = get_repository()
+    age = repo.age(sheet_names)
+    if age is not None:
+        text = f"{int(age)} 秒前" if age < 60 else f"{int(age // 60)} 分鐘前"
+        if age > STALE_WARN:
+            st.warning(f"⚠️ 資料更新於 {text}，目前無法連線試算表，顯示的是舊資料")
+        else:
+            st.caption(f"🕒 資料更新於 {text}")
+    for name, error in repo.errors(sheet_names).items():
+        st.caption(f"⚠️ {name}：{error}")
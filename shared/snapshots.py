@@ -0,0 +1,52 @@
+"""
+分頁快照 (本機 Parquet)
+
+重新啟動/部署後記憶體快取是空的，第一個使用者要等每張表完整下載。
+SheetRepository 每次從試算表讀到新資料後，把該分頁 (含型別欄位) 寫成 <分頁名稱>.parquet，
+旁邊的 <分頁名稱>.json 記錄原始欄位、列數與讀取時間；啟動後先用快照回應，再在背景重新讀取試算表。
+
+Parquet 需要 pyarrow (streamlit 本身就依賴它)；沒有安裝或讀寫失敗時，當作沒有快照。
+"""
+import json
+import os
+import re
+
+import pandas as pd
+
+
+def _safe_name(sheet_name):
+    return re.sub(r'[\\/:*?"<>|]', "_", sheet_name)
+
+
+class SnapshotStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _paths(self, sheet_name):
+        base = os.path.join(self.directory, _safe_name(sheet_name))
+        return base + ".parquet", base + ".json"
+
+    def save(self, sheet_name, typed, columns, row_count, fetched_at):
+        """typed: 附加型別欄位的 DataFrame；columns: 其中屬於試算表的原始欄位"""
+        data_path, meta_path = self._paths(sheet_name)
+        os.makedirs(self.directory, exist_ok=True)
+        # 先寫暫存檔再換名，讀取端不會讀到寫一半的檔案
+        typed.to_parquet(data_path + ".tmp", index=False)
+        os.replace(data_path + ".tmp", data_path)
+        meta = {"columns": list(columns), "row_count": row_count, "fetched_at": fetched_at}
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def load(self, sheet_name):
+        """回傳 (原始欄位 DataFrame, 含型別欄位 DataFrame, meta)；沒有快照回傳 None"""
+        data_path, meta_path = self._paths(sheet_name)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            typed = pd.read_parquet(data_path)
+        except (OSError, ValueError, ImportError):
+            return None
+        if not set(meta["columns"]) <= set(typed.columns):
+            return None
+        return typed[meta["columns"]], typed, meta
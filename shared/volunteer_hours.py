@@ -0,0 +1,117 @@
+"""
+志工累計服務時數表 (依身分證字號)
+
+同步 App 時原本對每位志工各自篩選 logs、重算一次時數 (名冊人數 × 紀錄筆數)。
+這裡改為：
+1. 第一次建表時把全部 logs 一次配對 (shared.sessions)，依 (身分證字號, 日期) 算出當天不重疊秒數
+2. 之後 logs 只是尾端多了新打卡 (同一個 lineage)，只重算新列涉及的 (人, 日)
+3. 舊紀錄被修改/刪除 (lineage 改變) 才整表重建
+4. 已封存的年度 (shared.archive) 不在 logs 裡，改加上 log_rollups 的每人歷年秒數
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from shared.archive import archived_totals
+from shared.sessions import log_datetimes, pair_sessions, coverage_seconds
+from shared.sheets import get_repository
+
+PERSON_COL = '身分證字號'
+
+# 志工等級門檻 (時數由高到低)
+BADGES = [(100, "🥇 金牌志工"), (50, "🥈 銀牌志工"), (20, "🥉 銅牌志工")]
+DEFAULT_BADGE = "🌱 新手志工"
+
+
+def badge_for(hours):
+    """hours: 時數 Series -> 志工等級 Series"""
+    hours = pd.Series(hours)
+    return pd.Series(
+        np.select([hours >= h for h, _ in BADGES], [b for _, b in BADGES], default=DEFAULT_BADGE),
+        index=hours.index,
+    )
+
+
+def _daily_seconds(logs):
+    """logs -> 以 (身分證字號, 日期) 為 index 的當天不重疊服務秒數"""
+    sessions = pair_sessions(logs, person_col=PERSON_COL)
+    return coverage_seconds(sessions, by=[PERSON_COL, '日期'])
+
+
+class HoursTable:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lineage = None
+        self._rows = 0
+        self._pids = np.empty(0, dtype=object)          # 已處理各列的 身分證字號
+        self._days = np.empty(0, dtype='datetime64[ns]')  # 已處理各列的日期 (無法解析為 NaT)
+        self._daily = pd.Series(dtype=float)
+        self._totals = pd.Series(dtype=float)
+
+    @staticmethod
+    def _keys(logs):
+        pids = logs[PERSON_COL].astype(str).to_numpy(dtype=object)
+        days = log_datetimes(logs).dt.floor('D').to_numpy(dtype='datetime64[ns]')
+        return pids, days
+
+    def _rebuild(self, logs):
+        self._pids, self._days = self._keys(logs)
+        self._daily = _daily_seconds(logs)
+        self._totals = self._daily.groupby(level=0).sum()
+
+    def _extend(self, logs):
+        new = logs.iloc[self._rows:]
+        new_pids, new_days = self._keys(new)
+        self._pids = np.concatenate([self._pids, new_pids])
+        self._days = np.concatenate([self._days, new_days])
+
+        ok = ~np.isnat(new_days)
+        if not ok.any():
+            return
+        touched = pd.MultiIndex.from_arrays([new_pids[ok], new_days[ok]]).unique()
+        # 先用日期縮小範圍 (通常只有今天)，再比對 (人, 日)
+        cand = np.nonzero(np.isin(self._days, np.unique(new_days[ok])))[0]
+        in_touched = pd.MultiIndex.from_arrays([self._pids[cand], self._days[cand]]).isin(touched)
+        subset = logs.iloc[cand[in_touched]]
+
+        old = self._daily[self._daily.index.isin(touched)]
+        fresh = _daily_seconds(subset)
+        self._daily = pd.concat([self._daily.drop(old.index), fresh])
+        self._totals = (self._totals
+                        .sub(old.groupby(level=0).sum(), fill_value=0)
+                        .add(fresh.groupby(level=0).sum(), fill_value=0))
+
+    def refresh(self, logs, lineage, archived=None):
+        """
+        logs: 快取中的完整 logs (唯讀)；lineage: 見 SheetRepository.snapshot
+        archived: 已封存年度的每人秒數 (以身分證字號為 index)，直接加進總數
+        回傳以身分證字號為 index 的 志工時數 / 志工等級
+        """
+        with self._lock:
+            if PERSON_COL not in logs.columns:
+                self._lineage, self._rows = None, 0
+                return pd.DataFrame(columns=['志工時數', '志工等級'])
+            if lineage != self._lineage or len(logs) < self._rows:
+                self._rebuild(logs)
+            elif len(logs) > self._rows:
+                self._extend(logs)
+            self._lineage, self._rows = lineage, len(logs)
+
+            totals = self._totals if archived is None or archived.empty else self._totals.add(archived, fill_value=0)
+            # 與原本 round(秒數 / 3600, 1) 相同的進位方式
+            hours = (totals / 3600).map(lambda h: round(h, 1))
+            return pd.DataFrame({'志工時數': hours, '志工等級': badge_for(hours)})
+
+
+@st.cache_resource
+def get_hours_table():
+    return HoursTable()
+
+
+def volunteer_hours():
+    """目前 logs 的每人累計時數與等級 (只處理上次之後新增的打卡)"""
+    # 附帶載入時轉好的 dt 欄位，配對時不必重新解析日期時間
+    logs, lineage = get_repository().snapshot("logs", typed=True)
+    return get_hours_table().refresh(logs, lineage, archived_totals("logs", "志工秒數"))
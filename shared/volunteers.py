@@ -0,0 +1,141 @@
+"""
+志工系統的計算邏輯 (首頁與志工頁共用，也讓 benchmarks 可以直接量測)
+"""
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+import streamlit as st
+
+from shared.ingest import add_types
+from shared.schema import TENURE_GROUPS
+from shared.sessions import log_datetimes, pair_sessions, coverage_seconds
+from shared.sheets import get_repository
+
+TW_TZ = timezone(timedelta(hours=8))
+TENURE_COLS = ['身分證字號', '組別', '加入日期', '退出日期', '在職']
+# 志工分類 -> TENURE_GROUPS 的組別 (臨時志工沒有加入/退出日期)
+CATEGORY_GROUPS = {"祥和志工": "祥和", "關懷據點週二志工": "據點週二", "關懷據點週三志工": "據點週三", "環保志工": "環保"}
+
+
+def retired_mask(members):
+    """
+    整份名冊是否已退隊 (布林 Series)：四個組別中曾加入的都已填退出日期 (規則見 ingest._retired)；
+    load_typed 讀入的名冊已有 retired 欄位
+    """
+    if 'retired' not in members.columns:
+        members = add_types("members", members)
+    return members['retired'].astype(bool)
+
+
+def in_group(members, category):
+    """
+    目前在該分類服務的志工 (布林 Series)，members 為 load_typed 讀入的名冊 (有 <組別>_在職 欄位)：
+    有填該組別加入日期的依 <組別>_在職 (退出該組別就不算)；沒填的 (新人) 依志工分類且未退隊
+    """
+    listed = members['志工分類'].astype(str).str.contains(category, na=False) & ~retired_mask(members)
+    group = CATEGORY_GROUPS.get(category)
+    if group is None:
+        return listed
+    join_col = TENURE_GROUPS[group][0]
+    joined = members[join_col].astype(str).str.strip() != "" if join_col in members.columns else False
+    return members[f"{group}_在職"].astype(bool) | (listed & ~joined)
+
+
+def tenure_table(members):
+    """
+    名冊攤平成每人每組別一列：身分證字號, 組別, 加入日期, 退出日期 (datetime64), 在職
+    只列出有加入日期的組別
+    """
+    parts = []
+    for group, (join_col, exit_col) in TENURE_GROUPS.items():
+        if join_col not in members.columns: continue
+        joined = members[join_col].astype(str).str.strip()
+        exited = members[exit_col].astype(str).str.strip() if exit_col in members.columns else pd.Series("", index=members.index)
+        has = joined != ""
+        parts.append(pd.DataFrame({
+            '身分證字號': members.loc[has, '身分證字號'].astype(str), '組別': group,
+            '加入日期': pd.to_datetime(joined[has], errors='coerce'),
+            '退出日期': pd.to_datetime(exited[has], errors='coerce'),
+            '在職': exited[has] == "",
+        }))
+    if not parts: return pd.DataFrame(columns=TENURE_COLS)
+    return pd.concat(parts, ignore_index=True)[TENURE_COLS]
+
+
+def tenure_summary(tenure, today=None):
+    """
+    tenure_table -> 每人一列 (index 為身分證字號)：
+    在職組別 (以「、」串接)、年資 (最早加入日到今天；已全部退出則到最後退出日，單位年)
+    """
+    if tenure.empty:
+        return pd.DataFrame(columns=['在職組別', '年資'])
+    today = pd.Timestamp(today or date.today())
+    by = tenure.groupby('身分證字號')
+    groups = tenure[tenure['在職']].groupby('身分證字號')['組別'].agg("、".join)
+    end = by['退出日期'].max().where(~by['在職'].any(), today).fillna(today)
+    years = ((end - by['加入日期'].min()).dt.days / 365.25).round(1)
+    return pd.DataFrame({'在職組別': groups.reindex(years.index, fill_value=""), '年資': years})
+
+
+class TenureTable:
+    """名冊的 tenure_summary：同一份快取 (typed 為同一個物件) 只計算一次"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source = None
+        self._summary = None
+
+    def refresh(self, typed):
+        """typed: SheetRepository.typed("members") 的快取物件 (唯讀；換日時會換成新物件)"""
+        with self._lock:
+            if typed is not self._source:
+                self._summary = tenure_summary(tenure_table(typed))
+                self._source = typed
+            return self._summary
+
+
+@st.cache_resource
+def get_tenure_table():
+    return TenureTable()
+
+
+def member_tenure():
+    """目前名冊的每人在職組別與年資 (index 為身分證字號)"""
+    return get_tenure_table().refresh(get_repository().typed("members"))
+
+
+def calculate_coverage_seconds(df_in):
+    """
+    通用版：計算傳入 DataFrame 的「不重疊」服務總秒數
+    適用於：首頁年度統計、報表活動統計
+    """
+    if df_in.empty: return 0
+
+    # 簽到/簽退配對與區間聯集見 shared.sessions
+    return coverage_seconds(pair_sessions(df_in))
+
+
+def calculate_year_hours(logs_df, year=None):
+    """計算當年度志工總時數"""
+    try:
+        sessions = pair_sessions(logs_df)
+        year_sessions = sessions[sessions['開始'].dt.year == (year or datetime.now().year)]
+        return int(year_sessions['秒數'].sum() // 3600)
+    except: return 0
+
+
+def get_present_volunteers(logs_df, now=None):
+    """今天最後一個動作是「簽到」的人 (目前在場)"""
+    if logs_df.empty: return pd.DataFrame()
+    today = now or datetime.now(TW_TZ)
+    today_str_dash = today.strftime("%Y-%m-%d")
+    today_str_slash = today.strftime("%Y/%m/%d")
+    today_logs = logs_df[(logs_df['日期'] == today_str_dash) | (logs_df['日期'] == today_str_slash)].copy()
+    if today_logs.empty: return pd.DataFrame()
+    today_logs['dt'] = log_datetimes(today_logs)
+    today_logs = today_logs.dropna(subset=['dt'])
+    today_logs = today_logs.sort_values('dt')
+    latest_status = today_logs.groupby('身分證字號').last().reset_index()
+    present = latest_status[latest_status['動作'] == '簽到']
+    return present[['姓名', '時間', '活動內容']]
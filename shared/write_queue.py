@@ -0,0 +1,257 @@
+"""
+打卡寫入佇列 (write-behind)
+
+據點開始時一次湧入很多人報到，每次刷卡都同步等 append_row 回應 (約 1 秒)。
+這裡改為：
+1. 刷卡資料先寫進本機的 journal 檔 (每筆一行 JSON，寫完 fsync)，馬上回覆操作人員
+2. 背景執行緒把累積的資料依分頁合併成一次 append_rows 送出
+3. 送出成功才在 journal 記下 ack；失敗就等一下再重試，直到寫入成功
+4. 程式重啟時重讀 journal，沒有 ack 的資料會再送一次
+5. 送出結果不確定 (逾時、5xx、重啟前可能已送出) 的資料，重送前先讀試算表最後幾列，
+   已經寫進去的直接 ack，不會重複新增
+6. 被試算表明確拒絕 (4xx、分頁不存在) 的資料改為逐筆送出，同一筆被拒絕 MAX_REJECTS 次
+   就移到 dead-letter 檔，不再擋住同一分頁後面的打卡；頁面上用 render_queue_status() 顯示
+
+尚未送出的資料可用 pending_frame() 取得，讓「目前在場」與打卡判斷也看得到。
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+import gspread
+import pandas as pd
+import streamlit as st
+
+from shared.quota import KIOSK, priority
+from shared.schema import SHEET_COLUMNS
+from shared.sheets import get_repository, row_values
+
+JOURNAL_PATH = os.environ.get(
+    "FUDE_WRITE_JOURNAL",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".write_journal.jsonl"),
+)
+BATCH_WINDOW = 0.5   # 秒：收集同一波刷卡再一起送出
+RETRY_MIN = 1        # 秒：送出失敗後的等待時間，每次失敗加倍
+RETRY_MAX = 60
+MAX_REJECTS = 3      # 同一筆被試算表拒絕幾次後移到 dead-letter 檔
+DEDUPE_TAIL = 2000   # 重送前比對試算表最後幾列
+
+
+def _dead_path(path):
+    return os.path.splitext(path)[0] + ".dead.jsonl"
+
+
+def _rejected(error):
+    """試算表明確拒絕 (資料沒有寫入，重送也不會成功)；429 與 5xx 屬於暫時性錯誤"""
+    if isinstance(error, gspread.exceptions.WorksheetNotFound):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def _row_key(values):
+    """比對用：轉成字串並去掉尾端空白格 (API 讀回時會省略)"""
+    values = [str(v) for v in values]
+    while values and values[-1] == "":
+        values.pop()
+    return tuple(values)
+
+
+class WriteQueue:
+    def __init__(self, repo, path=JOURNAL_PATH, batch_window=BATCH_WINDOW):
+        self._repo = repo
+        self._path = path
+        self._batch_window = batch_window
+        self._cond = threading.Condition()
+        self._pending = []   # [(id, 分頁, value_input_option, [值...])]，依寫入順序
+        self._worker = None
+        self.last_error = None
+        self._unsure = set()    # 可能已經寫入試算表的 id：重送前先比對
+        self._rejects = {}      # id -> 被拒絕次數；有紀錄的改為逐筆送出
+        self.dead_path = _dead_path(path)
+        self._replay()
+        if self._pending:
+            self._start_worker()
+
+    # --- journal ---
+    def _write(self, records, mode="a"):
+        with open(self._path, mode, encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay(self):
+        """讀回上次未送出的資料，並把 journal 壓縮成只剩這些資料"""
+        if not os.path.exists(self._path):
+            return
+        entries = {}
+        with open(self._path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # 寫到一半就中斷的最後一行
+                if "ack" in rec:
+                    for i in rec["ack"]: entries.pop(i, None)
+                else:
+                    entries[rec["id"]] = rec
+        self._pending = [(r["id"], r["sheet"], r["vio"], r["values"]) for r in entries.values()]
+        # 上次可能送出後、還沒記下 ack 就中斷了
+        self._unsure = set(entries)
+        self._write(list(entries.values()), mode="w")
+
+    # --- 對外介面 ---
+    def enqueue(self, sheet_name, values, value_input_option="RAW"):
+        rec = {"id": uuid.uuid4().hex, "sheet": sheet_name, "vio": value_input_option, "values": values}
+        with self._cond:
+            self._write([rec])
+            self._pending.append((rec["id"], sheet_name, value_input_option, values))
+            self._start_worker()
+            self._cond.notify()
+
+    def pending(self, sheet_name=None):
+        """尚未確認寫入的資料列 (依寫入順序)"""
+        with self._cond:
+            return [v for _, s, _, v in self._pending if sheet_name is None or s == sheet_name]
+
+    # --- 背景送出 ---
+    def _start_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="sheet-write-queue", daemon=True)
+            self._worker.start()
+
+    def _ack(self, ids):
+        with self._cond:
+            done = set(ids)
+            self._pending = [p for p in self._pending if p[0] not in done]
+            self._unsure -= done
+            for i in done: self._rejects.pop(i, None)
+            # 全部送完就清空 journal，避免檔案一直變大
+            if self._pending: self._write([{"ack": list(ids)}])
+            else: self._write([], mode="w")
+
+    def _unsent(self, sheet, items):
+        """去掉已經出現在試算表最後幾列的資料 (並 ack)，回傳還需要送出的部分"""
+        tail = self._repo.reload(sheet).tail(DEDUPE_TAIL)
+        seen = {}
+        for row in tail.itertuples(index=False):
+            key = _row_key(row)
+            seen[key] = seen.get(key, 0) + 1
+        done, rest = [], []
+        for pid, values in items:
+            key = _row_key(values)
+            if pid in self._unsure and seen.get(key):
+                seen[key] -= 1
+                done.append(pid)
+            else:
+                rest.append((pid, values))
+        if done: self._ack(done)
+        return rest
+
+    def _reject(self, sheet, vio, items, error):
+        """被拒絕的資料累計次數；達 MAX_REJECTS 次移到 dead-letter 檔"""
+        dead = []
+        for pid, values in items:
+            self._rejects[pid] = self._rejects.get(pid, 0) + 1
+            if self._rejects[pid] >= MAX_REJECTS:
+                dead.append({"id": pid, "sheet": sheet, "vio": vio, "values": values,
+                             "error": str(error), "at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        if dead:
+            with self._cond:
+                with open(self.dead_path, "a", encoding="utf-8") as f:
+                    for r in dead:
+                        f.write(json.dumps(r, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._ack([r["id"] for r in dead])
+
+    def dead_letters(self):
+        """移到 dead-letter 檔、需要人工處理的資料"""
+        if not os.path.exists(self.dead_path):
+            return []
+        with open(self.dead_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def flush(self):
+        """把目前累積的資料依 (分頁, 輸入方式) 合併送出；回傳是否全部成功"""
+        with self._cond:
+            batch = list(self._pending)
+        groups = {}
+        for pid, sheet, vio, values in batch:
+            # 被拒絕過的資料逐筆送出，找出是哪一筆有問題
+            key = (sheet, vio, pid) if pid in self._rejects else (sheet, vio)
+            groups.setdefault(key, []).append((pid, values))
+        ok = True
+        for (sheet, vio, *_), items in groups.items():
+            try:
+                if any(pid in self._unsure for pid, _ in items):
+                    items = self._unsent(sheet, items)
+                    if not items: continue
+                self._repo.append_rows(sheet, [v for _, v in items], vio)
+            except Exception as e:
+                self.last_error = e
+                ok = False
+                if _rejected(e): self._reject(sheet, vio, items, e)
+                else: self._unsure.update(pid for pid, _ in items)
+                continue
+            self._ack([i for i, _ in items])
+        if ok: self.last_error = None
+        return ok
+
+    def _run(self):
+        delay = RETRY_MIN
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self._batch_window)
+            # 打卡資料優先於其他讀寫使用 API 配額 (見 shared.quota)
+            with priority(KIOSK):
+                ok = self.flush()
+            if ok:
+                delay = RETRY_MIN
+            else:
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX)
+
+
+@st.cache_resource
+def get_write_queue():
+    return WriteQueue(get_repository())
+
+
+# 打卡用：先記在本機 journal，背景再寫入試算表
+def queue_append(sheet_name, row_dict, col_order, value_input_option="RAW"):
+    try:
+        get_write_queue().enqueue(sheet_name, row_values(row_dict, col_order), value_input_option)
+        return True
+    except Exception as e:
+        st.error(f"新增失敗：{e}"); return False
+
+
+def render_queue_status():
+    """打卡佇列送不出去或有資料被拒絕時，在頁面上顯示"""
+    q = get_write_queue()
+    dead = q.dead_letters()
+    if dead:
+        st.error(f"❌ 有 {len(dead)} 筆打卡資料被試算表拒絕，未寫入 (請管理員查看 {q.dead_path})")
+    if q.last_error is not None and q.pending():
+        st.warning(f"⚠️ 打卡資料暫時無法上傳，會自動重試：{q.last_error}")
+
+
+def pending_frame(sheet_name):
+    """尚未寫入試算表的資料 (欄位依 SHEET_COLUMNS)"""
+    cols = SHEET_COLUMNS.get(sheet_name, [])
+    rows = [(list(v) + [""] * len(cols))[:len(cols)] for v in get_write_queue().pending(sheet_name)]
+    return pd.DataFrame(rows, columns=cols)
+
+
+def with_pending(df, sheet_name):
+    """df 後面接上尚未寫入的資料，讓畫面馬上看得到剛打的卡"""
+    pending = pending_frame(sheet_name)
+    if pending.empty:
+        return df
+    return pd.concat([df, pending.reindex(columns=df.columns, fill_value="")], ignore_index=True)
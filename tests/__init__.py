@@ -0,0 +1,7 @@
+"""
+單元測試 (pytest)
+
+全部使用記憶體中的假試算表 (shared.fake_sheets)，不需要 Google 帳號：
+
+    python -m pytest tests
+"""
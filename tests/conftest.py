@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from shared.fake_sheets import FakeClient
+from shared.schema import VOL_LOG_COLS
+from shared.sheets import SheetRepository
+
+
+def log_row(name, action, day, time, activity="環保清潔"):
+    return {"姓名": name, "身分證字號": f"ID-{name}", "電話": "", "志工分類": "環保志工",
+            "動作": action, "時間": time, "日期": day, "活動內容": activity}
+
+
+def log_frame(rows):
+    return pd.DataFrame(rows, columns=VOL_LOG_COLS).astype(str)
+
+
+def sheet_rows(df):
+    """DataFrame -> 假試算表的內容 (標題列 + 各列)"""
+    return [list(df.columns)] + df.values.tolist()
+
+
+@pytest.fixture
+def client():
+    return FakeClient()
+
+
+@pytest.fixture
+def repo(client):
+    # 不開背景更新執行緒、不寫本機快照：讀寫時機完全由測試控制
+    return SheetRepository(lambda: client, background=False)
+
+
+@pytest.fixture
+def logs():
+    return log_frame([
+        log_row("王小明", "簽到", "2025-03-01", "09:00:00"),
+        log_row("王小明", "簽退", "2025-03-01", "11:30:00"),
+        log_row("陳美玲", "簽到", "2025-03-01", "10:00:00", "關懷據點週二活動"),
+        log_row("陳美玲", "簽退", "2025-03-01", "12:00:00", "關懷據點週二活動"),
+    ])
@@ -0,0 +1,120 @@
+import pandas as pd
+import pytest
+import requests
+
+from shared import archive as archive_module
+from shared.archive import Archive, archive_name, archived_frame
+from shared.care import received_totals, suggest_recipients
+from shared.fake_sheets import FakeClient
+from shared.schema import CARE_LOG_COLS
+from shared.sheets import SHEET_ID, SheetChangedError, SheetRepository, row_values
+from tests.conftest import log_frame, log_row, sheet_rows
+
+
+@pytest.fixture
+def logs():
+    return log_frame([
+        log_row("甲", "簽到", "2024-05-01", "09:00:00"),
+        log_row("甲", "簽退", "2024-05-01", "10:00:00"),
+        log_row("乙", "簽到", "2025-03-01", "09:00:00"),
+        log_row("乙", "簽退", "2025-03-01", "11:00:00"),
+    ])
+
+
+@pytest.fixture
+def rolled(client, repo, logs):
+    """app (repo) 已讀過 logs 後，另一個 process (封存腳本) 把 2024 年搬走"""
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    repo.frame("logs")
+    cli = SheetRepository(lambda: client, background=False)
+    Archive(cli, lambda: client).rollover("logs", 2025, log=lambda *_: None)
+    return client.open_by_key(SHEET_ID)
+
+
+def test_rollover_moves_closed_years_and_writes_rollups(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    archive = Archive(repo, lambda: client)
+    assert archive.rollover("logs", 2025, log=lambda *_: None) == {2024: 2}
+    book = client.open_by_key(SHEET_ID)
+    assert book.worksheet("logs").get_all_values()[1:] == logs.iloc[2:].values.tolist()
+    assert book.worksheet(archive_name("logs", 2024)).get_all_values()[1:] == logs.iloc[:2].values.tolist()
+    assert archive.years("logs") == [2024]
+    rollups = archive.rollups()
+    assert rollups.loc[rollups["項目"] == "團隊秒數", "數值"].tolist() == ["3600"]
+    # 重跑不會重複搬移
+    assert archive.rollover("logs", 2025, log=lambda *_: None) == {}
+    assert len(book.worksheet(archive_name("logs", 2024)).get_all_values()) == 3
+
+
+def test_tail_read_after_rollover_rereads_everything(repo, rolled):
+    repo.invalidate("logs")
+    assert repo.frame("logs").values.tolist() == rolled.worksheet("logs").get_all_values()[1:]
+
+
+def test_append_after_rollover_drops_cache(repo, rolled, logs):
+    repo.append_rows("logs", [row_values(log_row("丙", "簽到", "2025-03-02", "08:00:00"), list(logs.columns))])
+    assert repo.peek("logs") is None
+    assert repo.frame("logs")["姓名"].tolist() == ["乙", "乙", "丙"]
+
+
+def test_save_frame_refuses_positions_from_before_rollover(repo, rolled):
+    base = repo.frame("logs")
+    edited = base.copy()
+    edited.loc[3, "時間"] = "11:30:00"
+    before = rolled.worksheet("logs").get_all_values()
+    with pytest.raises(SheetChangedError):
+        repo.save_frame("logs", edited, base=base)
+    assert rolled.worksheet("logs").get_all_values() == before
+    # 重新讀取後即可照常修改
+    base = repo.frame("logs")
+    edited = base.copy()
+    edited.loc[1, "時間"] = "11:30:00"
+    repo.save_frame("logs", edited, base=base)
+    assert rolled.worksheet("logs").get_all_values()[2][5] == "11:30:00"
+
+
+def test_save_frame_allows_rows_appended_after_base(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    base = repo.frame("logs")
+    client.open_by_key(SHEET_ID).worksheet("logs").append_row(
+        row_values(log_row("丙", "簽到", "2025-03-02", "08:00:00"), list(logs.columns)))
+    edited = base.drop(index=[0])
+    repo.save_frame("logs", edited, base=base)
+    assert [r[0] for r in client.open_by_key(SHEET_ID).worksheet("logs").get_all_values()[1:]] == ["甲", "乙", "乙", "丙"]
+
+
+def test_missing_rollup_sheet_is_not_asked_again():
+    client = FakeClient(auto_create=False)
+    repo = SheetRepository(lambda: client, background=False)
+    archive = Archive(repo, lambda: client)
+    assert archive.rollups().empty and archive.years("logs") == []
+    asked = client.calls["worksheet"]
+    assert archive.rollups().empty
+    assert client.calls["worksheet"] == asked
+
+
+def test_rollup_read_error_degrades_to_empty(client, repo, monkeypatch):
+    reads = []
+
+    def unreachable(sheet_name):
+        reads.append(sheet_name)
+        raise requests.ConnectionError("down")
+    monkeypatch.setattr(repo, "frame", unreachable)
+    archive = Archive(repo, lambda: client)
+    assert archive.rollups().empty
+    assert archive.years("logs") == []
+    # 失敗後一段時間內不再重試；原因留給頁面顯示
+    assert len(reads) == 1 and isinstance(archive.read_error, requests.ConnectionError)
+
+
+def test_suggestions_skip_households_served_in_archived_years(client, repo, monkeypatch):
+    client.load(SHEET_ID, {"care_logs": [CARE_LOG_COLS,
+                                         ["志工", "2024-12-20", "甲", "白米 (農會)", "1", ""],
+                                         ["志工", "2025-01-05", "丙", "白米 (農會)", "1", ""]]})
+    archive = Archive(repo, lambda: client)
+    archive.rollover("care_logs", 2025, log=lambda *_: None)
+    monkeypatch.setattr(archive_module, "get_archive", lambda: archive)
+    mems = pd.DataFrame({"姓名": ["甲", "乙", "丙"], "身分別": ["獨居", "低收", "身障"], "拒絕物資": ""})
+    archived = received_totals(archived_frame("care_logs"))
+    names = [s["姓名"] for s in suggest_recipients(mems, repo.frame("care_logs"), "白米 (農會)", archived)]
+    assert names == ["乙"]
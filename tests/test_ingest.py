@@ -0,0 +1,66 @@
+from datetime import date
+
+import pandas as pd
+
+from shared.ingest import add_types, ages, extend_types
+from shared.schema import VOL_MEM_COLS
+from shared.volunteers import TenureTable, in_group, retired_mask, tenure_summary, tenure_table
+
+
+def _members(rows):
+    return pd.DataFrame([{**dict.fromkeys(VOL_MEM_COLS, ""), **r} for r in rows], columns=VOL_MEM_COLS)
+
+
+def test_retired_only_when_every_joined_group_has_exited():
+    members = _members([
+        {"姓名": "新人"},
+        {"姓名": "在職", "祥和_加入日期": "2023-01-01"},
+        {"姓名": "部分退出", "祥和_加入日期": "2023-01-01", "祥和_退出日期": "2024-01-01", "環保_加入日期": "2024-02-01"},
+        {"姓名": "退隊", "祥和_加入日期": "2023-01-01", "祥和_退出日期": "2024-01-01",
+         "環保_加入日期": "2024-02-01", "環保_退出日期": " 2024-06-01 "},
+        {"姓名": "只填退出", "環保_退出日期": "2024-06-01"},
+    ])
+    assert retired_mask(members).tolist() == [False, False, False, True, False]
+
+
+def test_retired_with_missing_exit_column():
+    members = _members([{"祥和_加入日期": "2023-01-01", "祥和_退出日期": "2024-01-01"}]).drop(columns=["環保_退出日期"])
+    assert retired_mask(members).tolist() == [True]
+
+
+def test_ages_and_incremental_types():
+    birth = pd.Series(["1950-06-15", "1950-06-16", "", "1950/06/15"])
+    assert ages(birth, date(2025, 6, 15)).tolist() == [75, 74, 0, 0]
+
+    members = _members([{"生日": "1950-06-15"}, {"生日": "1960-01-01", "祥和_加入日期": "2023-01-01"}])
+    typed = add_types("members", members.iloc[:1], date(2025, 6, 15))
+    extended = extend_types("members", typed, members, date(2025, 6, 15))
+    pd.testing.assert_frame_equal(extended, add_types("members", members, date(2025, 6, 15)))
+
+
+def test_group_tenure_columns_and_summary():
+    members = _members([
+        {"身分證字號": "A", "志工分類": "祥和志工,環保志工", "祥和_加入日期": "2020-01-01",
+         "環保_加入日期": "2021-01-01", "環保_退出日期": "2022-01-01"},
+        {"身分證字號": "B", "志工分類": "環保志工"},
+        {"身分證字號": "C", "志工分類": "環保志工", "環保_加入日期": "2019-01-01", "環保_退出日期": "2021-01-01"},
+    ])
+    typed = add_types("members", members)
+    assert typed["祥和_在職"].tolist() == [True, False, False]
+    assert typed["環保_在職"].tolist() == [False, False, False]
+    # 退出環保的 A 不算環保；沒填日期的新人 B 依志工分類
+    assert in_group(typed, "環保志工").tolist() == [False, True, False]
+    assert in_group(typed, "祥和志工").tolist() == [True, False, False]
+
+    summary = tenure_summary(tenure_table(members), date(2025, 1, 1))
+    assert summary.loc["A", "在職組別"] == "祥和" and summary.loc["C", "在職組別"] == ""
+    assert summary.loc["A", "年資"] == 5.0 and summary.loc["C", "年資"] == 2.0
+    assert "B" not in summary.index
+
+
+def test_tenure_is_recomputed_only_for_a_new_cache_fill():
+    typed = add_types("members", _members([{"身分證字號": "A", "祥和_加入日期": "2020-01-01"}]))
+    table = TenureTable()
+    summary = table.refresh(typed)
+    assert table.refresh(typed) is summary
+    assert table.refresh(typed.copy()) is not summary
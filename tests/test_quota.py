@@ -0,0 +1,60 @@
+import pytest
+import requests
+from gspread.http_client import HTTPClient
+
+from shared import quota
+from shared.quota import QuotaHTTPClient
+
+
+class _Status(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.response = type("R", (), {"status_code": status, "headers": {}})()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """假的 Sheets 端點：append 一律先寫入，再依 errors 的順序丟出錯誤 (模擬回應遺失)"""
+    state = {"rows": [], "calls": 0, "errors": []}
+
+    def request(self, method, endpoint, *args, **kwargs):
+        state["calls"] += 1
+        if method.lower() == "post":
+            state["rows"].append(kwargs.get("json"))
+        if state["errors"]:
+            raise state["errors"].pop(0)
+        return "ok"
+
+    monkeypatch.setattr(HTTPClient, "request", request)
+    monkeypatch.setattr(quota.time, "sleep", lambda s: None)
+    return state
+
+
+def _client():
+    return QuotaHTTPClient.__new__(QuotaHTTPClient)
+
+
+def test_timed_out_append_is_not_applied_twice(server):
+    server["errors"] = [requests.Timeout("read timed out")]
+    with pytest.raises(requests.Timeout):
+        _client().request("post", "values/logs:append", json=["甲"])
+    assert server["rows"] == [["甲"]] and server["calls"] == 1
+
+
+def test_append_is_not_retried_on_server_error(server):
+    server["errors"] = [_Status(503)]
+    with pytest.raises(_Status):
+        _client().request("post", "values/logs:append", json=["甲"])
+    assert server["rows"] == [["甲"]]
+
+
+def test_write_rejected_by_quota_is_retried(server):
+    server["errors"] = [_Status(429)]
+    assert _client().request("put", "values/logs!A2") == "ok"
+    assert server["calls"] == 2
+
+
+def test_read_is_retried_on_timeout(server):
+    server["errors"] = [requests.Timeout("read timed out"), _Status(503)]
+    assert _client().request("get", "values/logs") == "ok"
+    assert server["calls"] == 3
@@ -0,0 +1,73 @@
+import pandas as pd
+
+from shared.report_rollup import ReportCube, RollupTable
+from shared.sessions import coverage_seconds, pair_sessions
+from tests.conftest import log_frame, log_row
+
+
+def _logs():
+    return log_frame([
+        log_row("甲", "簽到", "2025-03-01", "09:00:00", "環保清潔"),
+        log_row("甲", "簽退", "2025-03-01", "10:00:00", "環保清潔"),
+        log_row("乙", "簽到", "2025-03-01", "09:30:00", "環保清潔"),
+        log_row("乙", "簽退", "2025-03-01", "11:00:00", "環保清潔"),
+        log_row("甲", "簽到", "2025-03-02", "14:00:00", "關懷據點週二活動"),
+        log_row("甲", "簽退", "2025-03-02", "16:00:00", "關懷據點週二活動"),
+        log_row("乙", "簽到", "2025-03-03", "08:00:00", "環保清潔"),  # 未簽退
+    ])
+
+
+def _same(a, b):
+    for x, y in zip(a._frames(), b._frames()):
+        key = [c for c in x.columns if c in ("日期", "活動內容", "姓名")]
+        pd.testing.assert_frame_equal(x.sort_values(key).reset_index(drop=True),
+                                      y.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+
+def test_activity_and_person_summaries():
+    cube = ReportCube.build(_logs())
+    assert cube.activities() == ["環保清潔", "關懷據點週二活動"]
+    assert cube.names() == sorted(["甲", "乙"])
+
+    count, team, per_person = cube.activity_summary("環保清潔")
+    assert count == 2 and team == 2 * 3600
+    assert per_person.loc["乙", "秒數"] == 5400
+
+    count, team, _ = cube.activity_summary()
+    logs = _logs()
+    assert count == len(pair_sessions(logs)) == 3
+    assert team == coverage_seconds(pair_sessions(logs))
+    assert cube.person_summary("甲") == (2, 3 * 3600)
+
+
+def test_row_count_matches_raw_logs():
+    cube, logs = ReportCube.build(_logs()), _logs()
+    assert cube.row_count() == len(logs)
+    assert cube.row_count(activity="環保清潔") == (logs["活動內容"] == "環保清潔").sum()
+    assert cube.row_count(name="乙") == 3
+    assert cube.between(pd.Timestamp("2025-03-02"), pd.Timestamp("2025-03-03")).row_count(name="甲") == 2
+
+
+def test_between_keeps_inclusive_date_range():
+    cube = ReportCube.build(_logs()).between(pd.Timestamp("2025-03-02"), pd.Timestamp("2025-03-03"))
+    assert cube.person_summary("甲") == (1, 2 * 3600)
+    assert cube.person['筆數'].sum() == 3
+
+
+def test_incremental_refresh_matches_full_build():
+    logs = _logs()
+    table = RollupTable()
+    table.refresh(logs.iloc[:5], lineage=1)
+    more = pd.concat([logs, log_frame([log_row("乙", "簽退", "2025-03-03", "09:00:00", "環保清潔")])],
+                     ignore_index=True)
+    cube = table.refresh(more, lineage=1)
+    _same(cube, ReportCube.build(more))
+    assert cube.person_summary("乙") == (2, 5400 + 3600)
+
+
+def test_new_lineage_rebuilds():
+    logs = _logs()
+    table = RollupTable()
+    table.refresh(logs, lineage=1)
+    edited = logs.drop(index=[0, 1]).reset_index(drop=True)
+    _same(table.refresh(edited, lineage=2), ReportCube.build(edited))
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from shared.sessions import coverage_seconds, pair_sessions
+from tests.conftest import log_frame, log_row
+
+
+def test_pairs_first_sign_in_with_next_sign_out():
+    logs = log_frame([
+        log_row("甲", "簽到", "2025-03-01", "09:00:00"),
+        log_row("甲", "簽到", "2025-03-01", "09:10:00"),   # 尚未簽退的重複簽到忽略
+        log_row("甲", "簽退", "2025-03-01", "10:00:00"),
+        log_row("甲", "簽退", "2025-03-01", "10:30:00"),   # 沒有簽到的簽退忽略
+        log_row("甲", "簽到", "2025-03-01", "13:00:00"),
+        log_row("甲", "簽退", "2025-03-01", "14:00:00"),
+    ])
+    s = pair_sessions(logs)
+    assert s["開始"].dt.strftime("%H:%M").tolist() == ["09:00", "13:00"]
+    assert s["秒數"].tolist() == [3600.0, 3600.0]
+
+
+def test_does_not_pair_across_days_or_people_and_ignores_row_order():
+    logs = log_frame([
+        log_row("乙", "簽退", "2025-03-01", "12:00:00"),
+        log_row("甲", "簽退", "2025-03-02", "08:00:00"),   # 隔天的簽退不能配前一天的簽到
+        log_row("甲", "簽到", "2025-03-01", "22:00:00"),
+        log_row("乙", "簽到", "2025-03-01", "11:00:00"),
+        log_row("丙", "簽到", "", "11:00:00"),             # 無法解析的日期略過
+    ])
+    s = pair_sessions(logs)
+    assert s["姓名"].tolist() == ["乙"]
+    assert s["日期"].tolist() == [pd.Timestamp("2025-03-01")]
+    assert s["身分證字號"].tolist() == ["ID-乙"]
+
+
+def test_person_col_and_empty_input():
+    logs = log_frame([
+        log_row("甲", "簽到", "2025-03-01", "09:00:00"),
+        log_row("甲", "簽退", "2025-03-01", "10:00:00"),
+    ])
+    logs.loc[1, "身分證字號"] = "ID-別人"
+    assert pair_sessions(logs, person_col="身分證字號").empty
+    assert len(pair_sessions(logs)) == 1
+    assert pair_sessions(logs.iloc[:0]).empty
+
+
+def test_coverage_counts_overlap_once(logs):
+    # 王小明 09:00-11:30、陳美玲 10:00-12:00 -> 聯集 09:00-12:00
+    assert coverage_seconds(pair_sessions(logs)) == 3 * 3600
@@ -0,0 +1,62 @@
+import pandas as pd
+
+from shared.sheet_diff import build_requests, diff_frames
+
+
+def _base():
+    return pd.DataFrame({"姓名": ["甲", "乙", "丙", "丁"], "電話": ["1", "2", "3", "4"], "備註": ["", "", "", ""]})
+
+
+def test_no_changes():
+    base = _base()
+    assert diff_frames(base, base.copy()).is_empty()
+
+
+def test_updates_only_changed_cells_in_runs():
+    base = _base()
+    edited = base.copy()
+    edited.loc[1, ["電話", "備註"]] = ["22", "新"]
+    edited.loc[3, "姓名"] = "戊"
+    plan = diff_frames(base, edited)
+    assert plan.updates == [(1, 1, ["22", "新"]), (3, 0, ["戊"])]
+    assert plan.appends == [] and plan.deletes == []
+
+
+def test_unknown_labels_are_appends_and_missing_labels_are_deletes():
+    base = _base()
+    edited = pd.concat([base.drop(index=[0, 2]),
+                        pd.DataFrame({"姓名": ["新"], "電話": ["9"], "備註": [""]}, index=[99])])
+    plan = diff_frames(base, edited)
+    assert plan.updates == []
+    assert plan.appends == [["新", "9", ""]]
+    assert plan.deletes == [0, 2]
+
+
+def test_duplicated_label_only_first_is_the_original_row():
+    base = _base()
+    edited = pd.concat([base, base.loc[[1]]])
+    plan = diff_frames(base, edited)
+    assert plan.appends == [["乙", "2", ""]] and plan.deletes == []
+
+
+def test_columns_are_matched_by_name():
+    base = _base()
+    plan = diff_frames(base, base[["備註", "電話", "姓名"]])
+    assert plan.is_empty()
+
+
+def test_build_requests_order_and_row_offsets():
+    base = _base()
+    edited = base.drop(index=[0, 1, 3])
+    edited.loc[2, "電話"] = "33"
+    edited.loc[10] = ["新", "9", ""]
+    plan = diff_frames(base, edited)
+    reqs = build_requests(plan, sheet_id=7, number_cols={1})
+    kinds = [next(iter(r)) for r in reqs]
+    # 先改儲存格、再追加，最後由下往上刪列
+    assert kinds == ["updateCells", "appendCells", "deleteDimension", "deleteDimension"]
+    cell = reqs[0]["updateCells"]
+    assert cell["range"]["startRowIndex"] == 3 and cell["range"]["startColumnIndex"] == 1
+    assert cell["rows"][0]["values"][0] == {"userEnteredValue": {"numberValue": 33.0}}
+    assert [(r["deleteDimension"]["range"]["startIndex"], r["deleteDimension"]["range"]["endIndex"])
+            for r in reqs[2:]] == [(4, 5), (1, 3)]
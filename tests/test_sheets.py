@@ -0,0 +1,205 @@
+import threading
+import time
+
+import pandas as pd
+
+from shared import sheets
+from shared.schema import APP_USER_COLS, CARE_MEM_COLS
+from shared.sheets import SHEET_ID, SheetRepository, row_values
+from tests.conftest import log_frame, log_row, sheet_rows
+
+
+def _ws(client, name):
+    return client.open_by_key(SHEET_ID).worksheet(name)
+
+
+# --- 增量讀取 ---
+def test_expired_log_sheet_reads_only_new_rows(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    _, lineage = repo.snapshot("logs")
+    # 其他程式 (另一個 process) 追加兩列
+    _ws(client, "logs").append_rows([row_values(log_row("林志明", a, "2025-03-02", t), list(logs.columns))
+                                     for a, t in [("簽到", "08:00:00"), ("簽退", "09:00:00")]])
+    repo.invalidate("logs")
+    df, new_lineage = repo.snapshot("logs")
+    assert len(df) == 6 and df["姓名"].iloc[-1] == "林志明"
+    assert client.calls["get_all_values"] == 1 and client.calls["get"] == 1
+    assert new_lineage == lineage
+
+
+def test_tail_read_pads_trailing_blank_cells(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    repo.frame("logs")
+    _ws(client, "logs").append_row(["林志明", "ID-林志明"])
+    repo.invalidate("logs")
+    assert repo.frame("logs").iloc[-1].tolist() == ["林志明", "ID-林志明"] + [""] * 6
+
+
+def test_non_log_sheet_is_fully_reread(client, repo):
+    client.load(SHEET_ID, {"members": [["姓名", "電話"], ["甲", "1"]]})
+    repo.frame("members")
+    repo.invalidate("members")
+    repo.frame("members")
+    assert client.calls["get_all_values"] == 2 and client.calls["get"] == 0
+
+
+def _pause_after(ws, method):
+    """ws.<method> 讀完後先停住，直到測試放行；回傳 (已讀取, 放行) 兩個 Event"""
+    done, go = threading.Event(), threading.Event()
+    original = getattr(ws, method)
+
+    def paused(*args, **kwargs):
+        result = original(*args, **kwargs)
+        done.set()
+        go.wait(5)
+        return result
+    setattr(ws, method, paused)
+    return done, go
+
+
+def test_refresh_does_not_overwrite_append_made_during_read(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    _, lineage = repo.snapshot("logs")
+    done, go = _pause_after(_ws(client, "logs"), "get")
+    repo.invalidate("logs")
+    reader = threading.Thread(target=repo.frame, args=("logs",))
+    reader.start()
+    done.wait(5)
+    # 增量讀取已讀完 (沒有新列) 但還沒放進快取時，打卡寫入並更新了快取
+    repo.append_rows("logs", [row_values(log_row("林志明", "簽到", "2025-03-02", "08:00:00"), list(logs.columns))])
+    go.set()
+    reader.join(5)
+    df, new_lineage = repo.snapshot("logs")
+    assert df["姓名"].tolist()[-1] == "林志明" and len(df) == 5
+    assert new_lineage == lineage
+
+
+def test_refresh_does_not_resurrect_dropped_cache(client, repo):
+    client.load(SHEET_ID, {"members": [["姓名", "電話"], ["甲", "1"]]})
+    repo.frame("members")
+    done, go = _pause_after(_ws(client, "members"), "get_all_values")
+    repo.invalidate("members")
+    reader = threading.Thread(target=repo.frame, args=("members",))
+    reader.start()
+    done.wait(5)
+    repo.save_frame("members", pd.DataFrame({"姓名": ["甲"], "電話": ["1"], "備註": ["新欄位"]}))
+    go.set()
+    reader.join(5)
+    assert repo.frame("members").columns.tolist() == ["姓名", "電話", "備註"]
+
+
+# --- 寫入後直接更新快取 (write-through) ---
+def test_append_rows_patches_cache_without_reading(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    _, lineage = repo.snapshot("logs")
+    repo.append_rows("logs", [row_values(log_row("林志明", "簽到", "2025-03-02", "08:00:00"), list(logs.columns))])
+    df, new_lineage = repo.snapshot("logs")
+    assert len(df) == 5 and df["姓名"].iloc[-1] == "林志明"
+    assert new_lineage == lineage
+    assert client.calls["get_all_values"] == 1 and client.calls["get"] == 0
+
+
+def test_append_after_unseen_rows_marks_cache_stale(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    repo.frame("logs")
+    _ws(client, "logs").append_row(row_values(log_row("別人", "簽到", "2025-03-02", "07:00:00"), list(logs.columns)))
+    repo.append_rows("logs", [row_values(log_row("林志明", "簽到", "2025-03-02", "08:00:00"), list(logs.columns))])
+    assert repo.cached_version("logs") is None
+    assert repo.frame("logs")["姓名"].tolist()[-2:] == ["別人", "林志明"]
+
+
+def test_save_frame_writes_only_changes_and_patches_cache(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    base = repo.frame("logs")
+    edited = base.drop(index=[1]).copy()
+    edited.loc[2, "時間"] = "10:15:00"
+    plan = repo.save_frame("logs", edited, base=base)
+    assert len(plan.updates) == 1 and plan.deletes == [1] and not plan.appends
+    assert client.calls["batch_update"] == 1
+    expected = edited.reset_index(drop=True)
+    assert repo.frame("logs").equals(expected)
+    assert client.calls["get_all_values"] == 1
+    assert _ws(client, "logs").get_all_values()[1:] == expected.values.tolist()
+
+
+def test_save_frame_with_new_rows_rereads(client, repo, logs):
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    base = repo.frame("logs")
+    edited = pd.concat([base, log_frame([log_row("林志明", "簽到", "2025-03-02", "08:00:00")])], ignore_index=True)
+    repo.save_frame("logs", edited, base=base)
+    assert repo.frame("logs").equals(edited)
+    assert client.calls["get_all_values"] == 2
+
+
+# --- 依 key 合併 ---
+def _app_users():
+    return pd.DataFrame({"手機": ["0911", "0922"], "密碼": ["1111", "2222"], "姓名": ["甲", "乙"],
+                         "志工時數": [12.5, 3.0], "志工等級": ["銅", "銅"]})
+
+
+def test_upsert_frame_is_idempotent(client, repo):
+    client.load(SHEET_ID, {"App_Users": [APP_USER_COLS, ["0911", "1111", "甲", "7", "2", "1", "銅"]]})
+    kwargs = dict(key="手機", delete_missing=True, defaults={"環保點數": 0, "樂活點數": 0})
+    first = repo.upsert_frame("App_Users", _app_users(), **kwargs)
+    assert {r for r, _, _ in first.updates} == {0} and len(first.appends) == 1
+    sheet = _ws(client, "App_Users").get_all_values()
+    # 既有帳號的點數保留，新帳號點數從 0 開始
+    assert sheet[1] == ["0911", "1111", "甲", "7", "2", "12.5", "銅"]
+    assert sheet[2] == ["0922", "2222", "乙", "0", "0", "3", "銅"]
+
+    second = repo.upsert_frame("App_Users", _app_users(), **kwargs)
+    assert second.is_empty()
+    assert _ws(client, "App_Users").get_all_values() == sheet
+    assert client.calls["batch_update"] == 1
+
+
+def test_upsert_frame_deletes_missing_keys(client, repo):
+    client.load(SHEET_ID, {"App_Users": [APP_USER_COLS, ["0933", "3333", "丙", "1", "1", "1", "銅"]]})
+    plan = repo.upsert_frame("App_Users", _app_users(), key="手機", delete_missing=True,
+                             defaults={"環保點數": 0, "樂活點數": 0})
+    assert plan.deletes == [0]
+    assert [r[0] for r in _ws(client, "App_Users").get_all_values()[1:]] == ["0911", "0922"]
+
+
+# --- 只編輯部分列 ---
+def test_windowed_save_patches_cache_in_place(client, repo, monkeypatch, logs):
+    monkeypatch.setattr(sheets, "get_repository", lambda: repo)
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    editor_df, base = sheets.load_window("logs", lambda t: t["姓名"] == "陳美玲")
+    assert base is repo.frame("logs")
+    assert editor_df[sheets.ROW_NUMBER_COL].tolist() == [4, 5]
+    edited = editor_df.copy()
+    edited.loc[0, "時間"] = "10:05:00"
+    edited = edited.drop(index=[1])
+    plan = sheets.save_window("logs", editor_df, edited, base)
+    assert len(plan.updates) == 1 and plan.deletes == [3] and not plan.appends
+    assert client.calls["get_all_values"] == 1
+    assert repo.frame("logs").values.tolist() == _ws(client, "logs").get_all_values()[1:]
+    assert repo.frame("logs")["時間"].tolist() == ["09:00:00", "11:30:00", "10:05:00"]
+
+
+def test_load_with_types_aligns_editable_and_typed_frames(client, repo, monkeypatch):
+    monkeypatch.setattr(sheets, "get_repository", lambda: repo)
+    rows = [row_values({"姓名": n, "生日": b}, CARE_MEM_COLS) for n, b in [("甲", "1950-01-01"), ("乙", "")]]
+    client.load(SHEET_ID, {"care_members": [CARE_MEM_COLS] + rows})
+    df, typed = sheets.load_with_types("care_members", CARE_MEM_COLS)
+    assert df.index.equals(typed.index) and "age" not in df.columns
+    assert typed["age"].iloc[0] > 70 and typed["age"].iloc[1] == 0
+
+
+def test_snapshot_error_is_kept_on_the_cache_entry(client, logs, tmp_path, monkeypatch):
+    repo = SheetRepository(lambda: client, snapshot_dir=str(tmp_path), background=False)
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+
+    def fail(*args):
+        raise ValueError("duplicate column names")
+    monkeypatch.setattr(repo._snapshots, "save", fail)
+    repo.frame("logs")
+    for _ in range(100):  # 快照在背景執行緒寫入
+        if repo.errors(["logs"]): break
+        time.sleep(0.02)
+    assert repo.errors(["logs", "members"]) == {"logs": "本機快照寫入失敗：duplicate column names"}
+    # 重讀成功後換成新的快取項目，錯誤跟著清掉
+    monkeypatch.setattr(repo._snapshots, "save", lambda *args: None)
+    repo.reload("logs")
+    assert repo.errors(["logs"]) == {}
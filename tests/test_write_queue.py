@@ -0,0 +1,142 @@
+import pytest
+
+from shared import sheets
+from shared.fake_sheets import FakeClient
+from shared.schema import VOL_LOG_COLS
+from shared.sheets import SHEET_ID, SheetRepository, row_values
+from shared.write_queue import WriteQueue
+from tests.conftest import log_row, sheet_rows
+
+# 測試中不讓背景執行緒自己送出，一律由測試呼叫 flush()
+HOLD = 3600
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "journal.jsonl")
+
+
+def _row(name, time):
+    return row_values(log_row(name, "簽到", "2025-03-01", time), VOL_LOG_COLS)
+
+
+def test_unsent_rows_are_replayed_after_restart(client, repo, journal):
+    client.load(SHEET_ID, {"logs": [VOL_LOG_COLS]})
+    q = WriteQueue(repo, path=journal, batch_window=HOLD)
+    q.enqueue("logs", _row("甲", "09:00:00"))
+    q.enqueue("logs", _row("乙", "09:01:00"))
+    # 寫到一半就中斷的最後一行
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write('{"id": "x", "sheet"')
+
+    restarted = WriteQueue(repo, path=journal, batch_window=HOLD)
+    assert restarted.pending("logs") == [_row("甲", "09:00:00"), _row("乙", "09:01:00")]
+    assert restarted.flush()
+    assert [r[0] for r in client.open_by_key(SHEET_ID).worksheet("logs").get_all_values()[1:]] == ["甲", "乙"]
+    assert client.calls["append_rows"] == 1
+    assert WriteQueue(repo, path=journal, batch_window=HOLD).pending() == []
+
+
+def test_only_unacknowledged_rows_are_replayed(journal):
+    client = FakeClient(auto_create=False)
+    client.load(SHEET_ID, {"logs": [VOL_LOG_COLS]})
+    repo = SheetRepository(lambda: client, background=False)
+    q = WriteQueue(repo, path=journal, batch_window=HOLD)
+    q.enqueue("logs", _row("甲", "09:00:00"))
+    q.enqueue("missing_sheet", ["x"])
+    assert not q.flush()
+    assert q.pending() == [["x"]]
+
+    restarted = WriteQueue(repo, path=journal, batch_window=HOLD)
+    assert restarted.pending() == [["x"]]
+    assert len(client.open_by_key(SHEET_ID).worksheet("logs").get_all_values()) == 2
+
+
+def test_rows_flushed_while_editing_survive_save_data(client, repo, journal, monkeypatch, logs):
+    monkeypatch.setattr(sheets, "get_repository", lambda: repo)
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    loaded = sheets.load_data("logs", VOL_LOG_COLS)
+    # 管理者編輯名單的同時，打卡佇列送出了一筆報到
+    q = WriteQueue(repo, path=journal, batch_window=HOLD)
+    q.enqueue("logs", _row("丙", "12:00:00"))
+    assert q.flush()
+    edited = loaded.drop(index=[3]).copy()
+    edited.loc[0, "時間"] = "08:30:00"
+    assert sheets.save_data(edited, "logs", base=loaded)
+    sheet = client.open_by_key(SHEET_ID).worksheet("logs").get_all_values()[1:]
+    assert [r[0] for r in sheet] == ["王小明", "王小明", "陳美玲", "丙"]
+    assert sheet[0][5] == "08:30:00"
+    assert repo.frame("logs").values.tolist() == sheet
+
+
+def test_save_data_with_unchanged_base_patches_cache(client, repo, monkeypatch, logs):
+    monkeypatch.setattr(sheets, "get_repository", lambda: repo)
+    client.load(SHEET_ID, {"logs": sheet_rows(logs)})
+    loaded = sheets.load_data("logs", VOL_LOG_COLS + ["備註"])
+    edited = loaded.copy()
+    edited.loc[1, "時間"] = "11:45:00"
+    assert sheets.save_data(edited.drop(columns=["備註"]), "logs", base=loaded)
+    assert repo.frame("logs").loc[1, "時間"] == "11:45:00"
+    assert client.calls["get_all_values"] == 1
+
+
+class _Status(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.response = type("R", (), {"status_code": status, "headers": {}})()
+
+
+def test_rows_sent_before_a_crash_are_not_appended_again(client, repo, journal):
+    client.load(SHEET_ID, {"logs": [VOL_LOG_COLS]})
+    q = WriteQueue(repo, path=journal, batch_window=HOLD)
+    q.enqueue("logs", _row("甲", "09:00:00"))
+    q.enqueue("logs", _row("乙", "09:01:00"))
+    # 送出成功，但還沒記下 ack 程式就中斷了
+    repo.append_rows("logs", [_row("甲", "09:00:00")])
+
+    restarted = WriteQueue(repo, path=journal, batch_window=HOLD)
+    assert restarted.flush()
+    assert [r[0] for r in client.open_by_key(SHEET_ID).worksheet("logs").get_all_values()[1:]] == ["甲", "乙"]
+    assert restarted.pending() == []
+
+
+def test_timed_out_append_is_checked_before_resending(client, repo, journal, monkeypatch):
+    client.load(SHEET_ID, {"logs": [VOL_LOG_COLS]})
+    q = WriteQueue(repo, path=journal, batch_window=HOLD)
+    q.enqueue("logs", _row("甲", "09:00:00"))
+    append = repo.append_rows
+
+    def applied_then_timed_out(*args, **kwargs):
+        append(*args, **kwargs)
+        raise TimeoutError("read timed out")
+
+    monkeypatch.setattr(repo, "append_rows", applied_then_timed_out)
+    assert not q.flush()
+    monkeypatch.setattr(repo, "append_rows", append)
+    assert q.flush()
+    assert len(client.open_by_key(SHEET_ID).worksheet("logs").get_all_values()) == 2
+
+
+def test_rejected_row_moves_to_dead_letter_without_blocking_others(client, repo, journal, monkeypatch):
+    client.load(SHEET_ID, {"logs": [VOL_LOG_COLS]})
+    append = repo.append_rows
+
+    def reject_bad(sheet_name, values_list, value_input_option="RAW"):
+        if any(v[0] == "壞" for v in values_list):
+            raise _Status(400)
+        append(sheet_name, values_list, value_input_option)
+
+    monkeypatch.setattr(repo, "append_rows", reject_bad)
+    q = WriteQueue(repo, path=journal, batch_window=HOLD)
+    q.enqueue("logs", _row("甲", "09:00:00"))
+    q.enqueue("logs", _row("壞", "09:01:00"))
+    q.enqueue("logs", _row("乙", "09:02:00"))
+    assert not q.flush()
+    # 被拒絕後逐筆送出：好的資料先寫入
+    assert not q.flush()
+    assert q.pending() == [_row("壞", "09:01:00")]
+    assert not q.flush()
+    assert q.pending() == []
+    assert [r["values"] for r in q.dead_letters()] == [_row("壞", "09:01:00")]
+    assert [r[0] for r in client.open_by_key(SHEET_ID).worksheet("logs").get_all_values()[1:]] == ["甲", "乙"]
+    assert WriteQueue(repo, path=journal, batch_window=HOLD).pending() == []